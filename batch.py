@@ -0,0 +1,184 @@
+import argparse
+import csv
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from centrality_improvement import compute_features, score_features
+from sweep import load_network, load_nodes
+import os
+
+NETWORK_SUFFIXES = ('.edgelist', '.graphml', '.pkl')
+SUMMARY_FIELDS = ['network', 'status', 'nodes', 'edges', 'load_seconds', 'features_seconds',
+                  'tuning_seconds', 'scoring_seconds', 'total_seconds', 'output']
+
+
+def read_manifest(source):
+    """读取待处理的网络列表
+
+    参数:
+        source: 目录(其中所有 .edgelist/.graphml/.pkl 文件，以文件名去掉后缀为网络名，同名时取
+                按文件名排序的第一个)，
+                或 JSON 清单文件 {网络名: 网络文件路径或 {'path', 'nodetype', 'key_nodes',
+                'non_key_nodes', 'base_scores', 'max_clique'}}，清单中的选项覆盖命令行参数
+
+    返回:
+        {网络名: 网络配置字典}
+    """
+    if os.path.isdir(source):
+        networks = {}
+        # 同名网络有多种格式时(如 .edgelist 与 .graphml)只取其一
+        for name in sorted(os.listdir(source)):
+            if name.endswith(NETWORK_SUFFIXES):
+                networks.setdefault(os.path.splitext(name)[0], {'path': os.path.join(source, name)})
+        return networks
+    with open(source, 'r') as f:
+        manifest = json.load(f)
+    return {name: {'path': spec} if isinstance(spec, str) else dict(spec) for name, spec in manifest.items()}
+
+
+def _run_network(name, G, spec, options, output_folder):
+    """在子进程中对单个网络执行特征计算、可选的调参和打分，并写出结果"""
+    timings = {'features_seconds': 0.0, 'tuning_seconds': 0.0, 'scoring_seconds': 0.0}
+    start = time.perf_counter()
+    features = compute_features(G, spec.get('base_scores', options['base_scores']),
+                                spec.get('max_clique', options['max_clique']), options['time_budget'],
+                                options['memory_budget'], options['sample_rate'])
+    timings['features_seconds'] = time.perf_counter() - start
+
+    # 标签文件中的节点按网络中节点标签的类型解析
+    nodetype = type(next(iter(G.nodes()))) if G.number_of_nodes() else str
+    key_nodes = load_nodes(spec.get('key_nodes', options['key_nodes']), nodetype)
+    non_key_nodes = load_nodes(spec.get('non_key_nodes', options['non_key_nodes']), nodetype)
+    rank_type = options['rank_type']
+    best_params = None
+    if key_nodes:
+        # 调参依赖optuna和sklearn，只打分时无需导入
+        from bayesian_optimization import optimize_features
+
+        start = time.perf_counter()
+        best_params, _ = optimize_features(features, key_nodes, non_key_nodes, rank_type=rank_type,
+                                           verbose=options['verbose'])
+        timings['tuning_seconds'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if rank_type == 'both' and best_params is not None:
+        # CDR与CSR各自使用最佳参数
+        cdr = score_features(features, best_params['cdr'])[0]
+        csr = score_features(features, best_params['csr'])[1]
+    else:
+        cdr, csr = score_features(features, best_params)
+    folder = os.path.join(output_folder, name)
+    os.makedirs(folder, exist_ok=True)
+    output_file_path = os.path.join(folder, 'output.txt')
+    with open(output_file_path, 'w') as f:
+        f.write(f"cdr: {features.core.to_dict(cdr)}\n")
+        f.write(f"csr: {features.core.to_dict(csr)}\n")
+        if best_params is not None:
+            f.write(f"params: {best_params}\n")
+    timings['scoring_seconds'] = time.perf_counter() - start
+    return dict(timings, nodes=G.number_of_nodes(), edges=G.number_of_edges(), output=output_file_path)
+
+
+def run_batch(networks, output_folder, options, workers=None, prefetch=1):
+    """用进程池批量处理多个网络，结果和耗时汇总在每个网络完成时写出
+
+    主进程依次加载网络并提交任务，同时最多有 workers + prefetch 个网络已加载、
+    等待或正在计算，因此加载下一个网络与计算当前网络相互重叠，内存占用也有上限。
+    单个网络出错不影响其他网络，错误信息记录在汇总表的status列中。
+
+    参数:
+        networks: read_manifest 的结果
+        output_folder: 输出文件夹，每个网络的结果写入 <output_folder>/<网络名>/output.txt，
+                       耗时汇总写入 <output_folder>/summary.csv
+        options: 公共选项字典，包含 base_scores、max_clique、rank_type、key_nodes、non_key_nodes、
+                 time_budget、memory_budget、sample_rate、verbose
+        workers: 进程数，None表示使用CPU核数
+        prefetch: 预先加载的网络个数
+
+    返回:
+        汇总表各行组成的列表
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    rows = []
+    batch_start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool, \
+            open(os.path.join(output_folder, 'summary.csv'), 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_FIELDS)
+        writer.writeheader()
+        pending = {}
+
+        def collect(done):
+            for future in done:
+                row = pending.pop(future)
+                try:
+                    row.update(future.result(), status='ok')
+                except Exception as e:
+                    row['status'] = f'error: {e}'
+                row['total_seconds'] = sum(row.get(key, 0.0) for key in
+                                           ('load_seconds', 'features_seconds', 'tuning_seconds',
+                                            'scoring_seconds'))
+                row = {key: round(value, 3) if isinstance(value, float) else value for key, value in row.items()}
+                writer.writerow(row)
+                f.flush()
+                rows.append(row)
+                if options['verbose']:
+                    print(f"{row['network']}: {row['status']} ({row['total_seconds']}s)")
+
+        for name, spec in networks.items():
+            while len(pending) >= workers + prefetch:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            start = time.perf_counter()
+            row = {'network': name}
+            try:
+                G = load_network(spec)
+            except Exception as e:
+                row.update(status=f'error: {e}', load_seconds=round(time.perf_counter() - start, 3))
+                writer.writerow(row)
+                rows.append(row)
+                continue
+            row['load_seconds'] = time.perf_counter() - start
+            pending[pool.submit(_run_network, name, G, spec, options, output_folder)] = row
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            collect(done)
+    if options['verbose']:
+        print(f"Processed {len(rows)} networks in {time.perf_counter() - batch_start:.1f}s")
+    return rows
+
+
+def parse_arguments():
+    """
+    解析命令行参数
+    """
+    parser = argparse.ArgumentParser(description="多网络批处理工具")
+    parser.add_argument('networks', type=str, help="网络文件所在的目录，或 JSON 格式的网络清单文件路径")
+    parser.add_argument('-b', '--base_scores', type=str, choices=['bc', 'cc', 'dc', 'ec', 'pr'], default='dc',
+                        help="基础中心性，默认为dc")
+    parser.add_argument('-o', '--output', type=str, help="输出文件夹路径", required=True)
+    parser.add_argument('-k', '--key_nodes', type=str, default=None,
+                        help="关键节点 txt 文件路径(所有网络共用，清单中可为每个网络单独指定)，提供时先调参再打分")
+    parser.add_argument('-n', '--non_key_nodes', type=str, default=None, help="非关键节点 txt 文件路径")
+    parser.add_argument('-m', '--max_clique', type=int, default=None, help="所考虑的最大团的大小")
+    parser.add_argument('-r', '--rank_type', type=str, choices=['cdr', 'csr', 'both'], default='csr',
+                        help="调参对象，默认为csr")
+    parser.add_argument('-w', '--workers', type=int, default=None, help="进程数，默认为CPU核数")
+    parser.add_argument('--prefetch', type=int, default=1, help="预先加载的网络个数，默认为1")
+    parser.add_argument('--time_budget', type=float, default=None, help="每个网络团计数的时间预算(秒)")
+    parser.add_argument('--memory_budget', type=float, default=None, help="每个网络团计数的内存预算(MB)")
+    parser.add_argument('--sample_rate', type=float, default=None, help="近似团计数的抽样比例，默认精确计数")
+    parser.add_argument('-v', '--verbose', type=lambda x: (str(x).lower() == 'true'), default=False,
+                        help="是否输出进度 (True 或 False)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    batch_options = {'base_scores': args.base_scores, 'max_clique': args.max_clique,
+                     'rank_type': args.rank_type, 'key_nodes': args.key_nodes,
+                     'non_key_nodes': args.non_key_nodes, 'time_budget': args.time_budget,
+                     'memory_budget': args.memory_budget * 2 ** 20 if args.memory_budget else None,
+                     'sample_rate': args.sample_rate, 'verbose': args.verbose}
+    results = run_batch(read_manifest(args.networks), args.output, batch_options, args.workers, args.prefetch)
+    print(f"已处理 {len(results)} 个网络，耗时汇总保存至 {os.path.join(args.output, 'summary.csv')}")
@@ -1,12 +1,17 @@
-import optuna
-import networkx as nx
-from sklearn.metrics import roc_auc_score, average_precision_score, f1_score
-from centrality_improvement import improved_centrality
-import os
+import threading
+import warnings
+from contextlib import contextmanager, nullcontext
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from centrality_improvement import compute_features, score_features, score_nodes, score_nodes_batch
+from gradient_fitting import fit_gradient
+from parameter_library import ParameterLibrary
+from population_optimization import fit_population
+import profiling
 
-# 设置工作路径为当前文件所在的目录
-current_file_dir = os.path.dirname(os.path.abspath(__file__))
-os.chdir(current_file_dir)
+# optuna的日志设置是进程级的：多个线程同时静默调参时(如server.py)由第一个关闭日志、最后一个恢复
+_quiet_lock = threading.Lock()
+_quiet_state = {'count': 0, 'verbosity': None}
 
 def evaluate_rank(rank_scores, key_nodes, non_key_nodes, all_nodes,
                   metric='ap', threshold=None):
@@ -39,6 +44,14 @@ def evaluate_rank(rank_scores, key_nodes, non_key_nodes, all_nodes,
         y_true.append(0)
         y_score.append(rank_scores.get(protein, 0))
 
+    return _evaluate_labels(y_true, y_score, metric, threshold)
+
+
+def _evaluate_labels(y_true, y_score, metric='ap', threshold=None):
+    """根据标签和得分计算评估指标，参数含义同evaluate_rank"""
+    # sklearn导入较慢，只在需要评估时导入
+    from sklearn.metrics import roc_auc_score, average_precision_score, f1_score
+
     # 检查是否有两类样本
     if len(set(y_true)) < 2:
         return 0.5 if metric == 'auc' else 0.0
@@ -65,60 +78,555 @@ def evaluate_rank(rank_scores, key_nodes, non_key_nodes, all_nodes,
     else:
         raise ValueError(f"Invalid metric '{metric}'. Choose from 'auc', 'ap', 'f1'")
 
+
+def build_label_matrix(all_nodes, label_sets):
+    """构建标签矩阵
+
+    参数:
+        all_nodes: 网络中所有节点列表，决定矩阵的列顺序
+        label_sets: 标签集列表 [(key_nodes, non_key_nodes), ...]，
+                    non_key_nodes为None时取all_nodes中除关键节点外的全部节点
+
+    返回:
+        形状为(标签集个数, 节点数)的int8矩阵，1为关键节点，0为非关键节点，-1为不参与评估
+    """
+    index = {node: i for i, node in enumerate(all_nodes)}
+    labels = np.full((len(label_sets), len(all_nodes)), -1, dtype=np.int8)
+    for row, (key_nodes, non_key_nodes) in enumerate(label_sets):
+        if non_key_nodes is None:
+            labels[row] = 0
+        else:
+            labels[row, [index[n] for n in set(non_key_nodes) if n in index]] = 0
+        labels[row, [index[n] for n in set(key_nodes) if n in index]] = 1
+    return labels
+
+
+def evaluate_rank_matrix(scores, label_matrix, metric='ap', threshold=None):
+    """一次性评估多组得分在多组标签下的指标
+
+    每个得分向量只排序一次，各标签集的AUC、AP和F1都由排序后的累计计数得到，
+    并列得分的处理与sklearn一致。
+
+    参数:
+        scores: 得分向量(节点数,)或得分矩阵(得分组数, 节点数)
+        label_matrix: build_label_matrix给出的标签矩阵(标签集个数, 节点数)
+        metric: 评估指标，可选 'auc', 'ap'(默认), 'f1'
+        threshold: 仅当metric='f1'时有效，分类阈值，None表示自动选择最佳阈值
+
+    返回:
+        形状为(得分组数, 标签集个数)的指标矩阵，scores为向量时为(标签集个数,)
+    """
+    if metric not in ('auc', 'ap', 'f1'):
+        raise ValueError(f"Invalid metric '{metric}'. Choose from 'auc', 'ap', 'f1'")
+    scores = np.asarray(scores, dtype=float)
+    single = scores.ndim == 1
+    scores = np.atleast_2d(scores)
+    label_matrix = np.atleast_2d(label_matrix)
+    pos = (label_matrix == 1).astype(float)
+    neg = (label_matrix == 0).astype(float)
+    n_pos = pos.sum(axis=1)
+    n_neg = neg.sum(axis=1)
+    results = np.empty((len(scores), len(label_matrix)))
+
+    for row, score in enumerate(scores):
+        if metric == 'f1' and threshold is not None:
+            predicted = score >= threshold
+            tp = pos[:, predicted].sum(axis=1)
+            fp = neg[:, predicted].sum(axis=1)
+            denominator = tp + fp + n_pos
+            results[row] = np.divide(2 * tp, denominator, out=np.zeros_like(tp), where=denominator > 0)
+            continue
+        # 按得分降序排列，并把并列得分划分为同一组
+        order = np.argsort(-score, kind='stable')
+        sorted_score = score[order]
+        starts = np.flatnonzero(np.r_[True, sorted_score[1:] != sorted_score[:-1]])
+        pos_group = np.add.reduceat(pos[:, order], starts, axis=1)
+        neg_group = np.add.reduceat(neg[:, order], starts, axis=1)
+        tp = np.cumsum(pos_group, axis=1)
+        fp = np.cumsum(neg_group, axis=1)
+        if metric == 'auc':
+            # Mann-Whitney U：每个关键节点计入得分更低的非关键节点数，并列计0.5
+            neg_below = n_neg[:, None] - fp
+            u = (pos_group * (neg_below + 0.5 * neg_group)).sum(axis=1)
+            results[row] = u / np.maximum(n_pos * n_neg, 1)
+        elif metric == 'ap':
+            precision = np.divide(tp, tp + fp, out=np.zeros_like(tp), where=(tp + fp) > 0)
+            results[row] = (pos_group * precision).sum(axis=1) / np.maximum(n_pos, 1)
+        else:
+            results[row] = np.max(2 * tp / (tp + fp + n_pos[:, None]), axis=1, initial=0)
+
+    # 只有一类样本时与evaluate_rank保持一致
+    degenerate = (n_pos == 0) | (n_neg == 0)
+    results[:, degenerate] = 0.5 if metric == 'auc' else 0.0
+    return results[0] if single else results
+
+
+def label_indices(features, key_nodes, non_key_nodes):
+    """将关键/非关键节点转换为特征数组中的下标与标签
+
+    参数:
+        features: HigherOrderFeatures对象
+        key_nodes: 关键节点列表
+        non_key_nodes: 非关键节点列表
+
+    返回:
+        idx: 参与评估的节点编号数组
+        y_true: 对应的标签数组(1为关键节点，0为非关键节点)
+    """
+    index = features.core.index
+    common_key = [index[n] for n in set(key_nodes) if n in index]
+    common_non_key = [index[n] for n in set(non_key_nodes) if n in index]
+    idx = np.array(common_key + common_non_key, dtype=np.int64)
+    y_true = np.array([1] * len(common_key) + [0] * len(common_non_key), dtype=np.int64)
+    return idx, y_true
+
+
+def make_evaluator(features, idx, y_true, rank_type='csr', metric='ap', threshold=None):
+    """构造以参数字典为输入的评估函数
+
+    参数:
+        features: HigherOrderFeatures对象
+        idx, y_true: label_indices给出的节点编号与标签
+        rank_type, metric, threshold: 同optimize_method
+
+    返回:
+        函数 evaluate(params, subset=None) -> 评估分数，
+        subset为idx中的位置数组，None表示在全部标注节点上评估
+    """
+    def evaluate(params, subset=None):
+        nodes = idx if subset is None else idx[subset]
+        labels = y_true if subset is None else y_true[subset]
+        if metric == 'f1' and threshold is not None:
+            # 固定阈值依赖于归一化后的得分
+            cdr, csr = score_features(features, params)
+            rank_scores = (csr if rank_type == 'csr' else cdr)[nodes]
+        else:
+            rank_scores = score_nodes(features, params, nodes, rank_type)
+        return _evaluate_labels(labels, rank_scores, metric, threshold)
+
+    return evaluate
+
+
+def make_nested_evaluator(features, idx, y_true, rank_type='csr', metric='ap', threshold=None):
+    """构造多保真度调参用的评估函数，同一组参数在逐级增大的嵌套子样本上共享已计算的得分
+
+    子样本相互嵌套(见stratified_subsamples)，每个节点的得分在同一组参数下只计算一次，
+    因此未被剪枝的试验在全部标注节点上评估时，总的打分工作量与一次完整评估相同。
+
+    参数:
+        features: HigherOrderFeatures对象
+        idx, y_true: label_indices给出的节点编号与标签
+        rank_type, metric, threshold: 同optimize_method
+
+    返回:
+        函数 evaluate(params, subset=None) -> (评估分数, 本次新计算得分的节点数)，
+        subset为idx中的位置数组，None表示全部标注节点；params与上一次调用不是同一对象时重新累积
+    """
+    scores = np.empty(len(idx))
+    scored = np.zeros(len(idx), dtype=bool)
+    current = [None]
+
+    def evaluate(params, subset=None):
+        if params is not current[0]:
+            current[0] = params
+            scored[:] = False
+        positions = np.arange(len(idx)) if subset is None else subset
+        new = positions[~scored[positions]]
+        if len(new):
+            if metric == 'f1' and threshold is not None:
+                # 固定阈值依赖于归一化后的得分，一次得到全部节点的得分
+                cdr, csr = score_features(features, params)
+                new = np.flatnonzero(~scored)
+                scores[new] = (csr if rank_type == 'csr' else cdr)[idx[new]]
+            else:
+                scores[new] = score_nodes(features, params, idx[new], rank_type)
+            scored[new] = True
+        return _evaluate_labels(y_true[positions], scores[positions], metric, threshold), len(new)
+
+    return evaluate
+
+
+def make_label_matrix_evaluator(features, label_matrix, rank_type='csr', metric='ap',
+                                threshold=None, aggregate='mean'):
+    """构造在多个标签集上同时评估的评估函数
+
+    参数:
+        features: HigherOrderFeatures对象
+        label_matrix: build_label_matrix给出的标签矩阵，列顺序与features.core.labels一致
+        rank_type, metric, threshold: 同optimize_method
+        aggregate: 多个标签集指标的汇总方式，可选 'mean'(默认) 或 'min'
+
+    返回:
+        函数 evaluate(params) -> 汇总后的评估分数
+    """
+    if aggregate not in ('mean', 'min'):
+        raise ValueError(f"Invalid aggregate '{aggregate}'. Choose from 'mean', 'min'")
+    reduce = np.mean if aggregate == 'mean' else np.min
+    # 只需计算至少在一个标签集中参与评估的节点
+    nodes = np.flatnonzero((label_matrix >= 0).any(axis=0))
+    labels = label_matrix[:, nodes]
+
+    def evaluate(params):
+        if metric == 'f1' and threshold is not None:
+            cdr, csr = score_features(features, params)
+            rank_scores = (csr if rank_type == 'csr' else cdr)[nodes]
+        else:
+            rank_scores = score_nodes(features, params, nodes, rank_type)
+        return float(reduce(evaluate_rank_matrix(rank_scores, labels, metric, threshold)))
+
+    return evaluate
+
+
+def make_batch_evaluator(features, idx, label_matrix, rank_type='csr', metric='ap',
+                         threshold=None, aggregate='mean'):
+    """构造对整批参数一次评估的函数
+
+    参数:
+        features: HigherOrderFeatures对象
+        idx: 参与评估的节点编号数组
+        label_matrix: 与idx对应的标签矩阵(标签集个数, len(idx))，单个标签集时可直接传入y_true
+        rank_type, metric, threshold: 同optimize_method
+        aggregate: 多个标签集指标的汇总方式，可选 'mean'(默认) 或 'min'
+
+    返回:
+        函数 evaluate(param_matrix) -> 每组参数的评估分数数组，
+        param_matrix每行为 [theta, lambda_3, ...]
+    """
+    label_matrix = np.atleast_2d(label_matrix)
+    reduce = np.mean if aggregate == 'mean' else np.min
+    normalize = metric == 'f1' and threshold is not None
+
+    def evaluate(param_matrix):
+        scores = score_nodes_batch(features, param_matrix, idx, rank_type, normalize)
+        return reduce(evaluate_rank_matrix(scores, label_matrix, metric, threshold), axis=1)
+
+    return evaluate
+
+
+def stratified_subsamples(y_true, fractions, seed=None):
+    """生成逐级增大且相互嵌套的分层子样本
+
+    参数:
+        y_true: 标签数组
+        fractions: 子样本占全部标注节点的比例列表，如 [0.1, 0.3]
+        seed: 随机种子
+
+    返回:
+        位置数组列表，每个子样本中关键与非关键节点的比例与全体一致
+    """
+    rng = np.random.default_rng(seed)
+    pos = rng.permutation(np.flatnonzero(y_true == 1))
+    neg = rng.permutation(np.flatnonzero(y_true == 0))
+    subsamples = []
+    for fraction in sorted(fractions):
+        n_pos = max(1, int(round(fraction * len(pos))))
+        n_neg = max(1, int(round(fraction * len(neg))))
+        subsamples.append(np.concatenate([pos[:n_pos], neg[:n_neg]]))
+    return subsamples
+
+
+def _tune_fold(features, train_key, train_non_key, options):
+    """在子进程中对单折的训练集调参"""
+    return optimize_features(features, train_key, train_non_key, verbose=False, **options)
+
+
+def _cross_validate(features, idx, y_true, evaluators, rank_types, cv_folds, n_jobs, options,
+                    verbose=True):
+    """分层交叉验证：各折并行调参，并在留出折上评估"""
+    from sklearn.model_selection import StratifiedKFold
+
+    labels = features.core.labels
+    splitter = StratifiedKFold(n_splits=cv_folds, shuffle=True, random_state=options['seed'])
+    splits = list(splitter.split(idx, y_true))
+    with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+        futures = []
+        for train, _ in splits:
+            train_key = [labels[i] for i in idx[train][y_true[train] == 1]]
+            train_non_key = [labels[i] for i in idx[train][y_true[train] == 0]]
+            futures.append(pool.submit(_tune_fold, features, train_key, train_non_key, options))
+        fold_results = [future.result() for future in futures]
+
+    fold_params, fold_values = [], []
+    for fold, ((_, test), (params, train_value)) in enumerate(zip(splits, fold_results)):
+        if options['rank_type'] == 'both':
+            test_value = {r: e(params[r], test) for r, e in zip(rank_types, evaluators)}
+        else:
+            test_value = evaluators[0](params, test)
+        fold_params.append(params)
+        fold_values.append(test_value)
+        if verbose:
+            print(f"Fold {fold}: train value: {train_value}, held-out value: {test_value}, "
+                  f"parameters: {params}")
+    return fold_params, fold_values
+
+
+def _expand_fixed(evaluate, names, free_names, fixed_params):
+    """把只含自由参数的批量评估函数扩展为完整参数矩阵上的评估"""
+    if not fixed_params:
+        return evaluate
+    free_columns = [names.index(name) for name in free_names]
+    template = np.array([fixed_params.get(name, 0.0) for name in names])
+
+    def expanded(param_matrix):
+        full = np.tile(template, (len(param_matrix), 1))
+        full[:, free_columns] = param_matrix
+        return evaluate(full)
+
+    return expanded
+
+
+@contextmanager
+def _quiet_optuna():
+    """在with块内关闭optuna的日志输出，退出时(包括异常时)恢复，可在多个线程中同时使用"""
+    import optuna
+
+    with _quiet_lock:
+        if _quiet_state['count'] == 0:
+            _quiet_state['verbosity'] = optuna.logging.get_verbosity()
+            optuna.logging.set_verbosity(optuna.logging.ERROR)
+            optuna.logging.disable_default_handler()
+            optuna.logging.disable_propagation()
+        _quiet_state['count'] += 1
+    try:
+        yield
+    finally:
+        with _quiet_lock:
+            _quiet_state['count'] -= 1
+            if _quiet_state['count'] == 0:
+                optuna.logging.set_verbosity(_quiet_state['verbosity'])
+                optuna.logging.enable_default_handler()
+                optuna.logging.enable_propagation()
+
+
+def _update_library(library, features, metric, best_params, best_values):
+    """把各排名类型的最佳结果写回参数库"""
+    if library is None:
+        return
+    for r, params in best_params.items():
+        library.add(features, features.base_name, r, metric, params, best_values[r])
+    library.save()
+
+
 def optimize_method(G, base_scores, key_nodes, non_key_nodes=None, max_clique=None,
                    n_trials=50, metric='ap', threshold=None, rank_type='csr',
-                   verbose=True):
+                   verbose=True, optimizer='tpe', n_restarts=10, seed=None,
+                   fidelity=None, pruner=None, aggregate='mean', cv_folds=None, n_jobs=None,
+                   library=None, fixed_params=None, time_budget=None, memory_budget=None,
+                   sample_rate=None):
     """使用贝叶斯优化方法
 
     参数:
         G: 网络对象
         base_scores: 基础中心性得分字典 {node: score}
-        key_nodes: 关键节点列表
-        non_key_nodes: 非关键节点列表，若为None则认为其是G中的节点去掉key_nodes的节点
+        key_nodes: 关键节点列表；也可以是 {标签集名: 关键节点列表} 字典，此时在所有标签集上
+                   同时评估，目标为各标签集指标按aggregate汇总后的值
+        non_key_nodes: 非关键节点列表，若为None则认为其是G中的节点去掉key_nodes的节点；
+                       key_nodes为字典时为 {标签集名: 非关键节点列表} 字典或None
         max_clique: 最大团大小，若为None则考虑网络中最大团的大小
         n_trials: 迭代次数
         metric: 评估指标，可选 'auc', 'ap'(默认), 'f1'
         threshold: 仅当metric='f1'时有效，分类阈值，None表示自动选择最佳阈值
-        rank_type: 排名类型，可选 'csr'(默认) 或 'cdr'
+        rank_type: 排名类型，可选 'csr'(默认)、'cdr' 或 'both'。'both'表示在同一个多目标
+                   研究中同时优化CDR和CSR，每个试验的两种得分共享同一份预计算特征
         verbose: 是否输出训练过程，默认为True
+        optimizer: 优化方法，可选 'tpe'(默认，Optuna贝叶斯优化)、'gradient'
+                   (以可微的成对排序代理指标为目标，使用带[0, 1]边界的L-BFGS-B多次重启优化)、
+                   'cmaes'或'de'(CMA-ES或差分进化，每一代的候选参数整批评估，
+                   此时n_trials为评估的参数组合总数)
+        n_restarts: 仅当optimizer='gradient'时有效，随机重启次数
+        seed: 随机种子(同时用于抽样计数和近似计数)，None表示不固定
+        fidelity: 多保真度调参的子样本比例列表，如 [0.1, 0.3]，None表示不启用。
+                  启用后每个试验先在逐级增大的分层子样本上报告中间结果，
+                  被剪枝的试验不再在全部标注节点上评估
+        pruner: Optuna剪枝器，仅当fidelity不为None时有效，None则使用MedianPruner
+        aggregate: 仅当key_nodes为字典时有效，多个标签集指标的汇总方式，可选 'mean'(默认) 或 'min'
+        cv_folds: 交叉验证折数，None表示不做交叉验证。启用后关键/非关键节点被分层划分为
+                  cv_folds折，每折在其余折上调参，并用共享的预计算特征在该折上评估
+        n_jobs: 仅当cv_folds不为None时有效，并行执行各折的进程数，None表示使用CPU核数
+        library: ParameterLibrary对象或参数库文件路径，None表示不使用。使用时先以库中同一网络的
+                 最佳参数及相似网络的参数作为初始试验，调参结束后把最佳结果写回参数库，
+                 不能与cv_folds同时使用
+        fixed_params: 固定取值、不参与搜索的参数字典，如landscape.shrink_search_space的结果
+        time_budget, memory_budget: 团计数的时间(秒)与内存(字节)预算，同compute_features
+        sample_rate: 近似团计数的抽样比例，None表示精确计数，同compute_features
 
     返回:
-        最佳参数和最佳得分
+        最佳参数和最佳得分；rank_type='both'时为两个字典
+        {'cdr': 参数, 'csr': 参数} 和 {'cdr': 得分, 'csr': 得分}；
+        cv_folds不为None时为两个列表：各折的最佳参数和各折留出集上的得分
     """
-    all_nodes = list(G.nodes())
-    if non_key_nodes is None:
-        non_key_nodes = list(set(all_nodes) - set(key_nodes))
+    # 与参数无关的特征只计算一次
+    features = compute_features(G, base_scores, max_clique, time_budget, memory_budget, sample_rate, seed)
+    return optimize_features(features, key_nodes, non_key_nodes, n_trials=n_trials, metric=metric,
+                             threshold=threshold, rank_type=rank_type, verbose=verbose,
+                             optimizer=optimizer, n_restarts=n_restarts, seed=seed,
+                             fidelity=fidelity, pruner=pruner, aggregate=aggregate,
+                             cv_folds=cv_folds, n_jobs=n_jobs, library=library,
+                             fixed_params=fixed_params)
 
-    if max_clique is None:
-        max_clique = max(len(c) for c in nx.find_cliques(G))
+
+def optimize_features(features, key_nodes, non_key_nodes=None, n_trials=50, metric='ap',
+                      threshold=None, rank_type='csr', verbose=True, optimizer='tpe',
+                      n_restarts=10, seed=None, fidelity=None, pruner=None, aggregate='mean',
+                      cv_folds=None, n_jobs=None, library=None, fixed_params=None):
+    """在预计算特征上调参，参数含义同optimize_method
+
+    参数:
+        features: compute_features给出的HigherOrderFeatures对象，其sizes决定需要调节的lambda
+        其余参数: 同optimize_method
+
+    返回:
+        同optimize_method
+    """
+    if rank_type == 'both':
+        if fidelity:
+            raise ValueError("fidelity is not supported for rank_type='both' (multi-objective studies cannot be pruned)")
+        rank_types = ['cdr', 'csr']
+    else:
+        rank_types = [rank_type]
+
+    if isinstance(key_nodes, dict):
+        # 多标签集：每个试验的得分只计算一次，在所有标签集上同时评估
+        if fidelity or optimizer == 'gradient':
+            raise ValueError("multiple label sets are not supported by optimizer='gradient' or fidelity")
+        non_key_nodes = non_key_nodes or {}
+        label_matrix = build_label_matrix(features.core.labels,
+                                          [(key_nodes[name], non_key_nodes.get(name)) for name in key_nodes])
+        evaluators = [make_label_matrix_evaluator(features, label_matrix, r, metric, threshold, aggregate)
+                      for r in rank_types]
+        idx = np.flatnonzero((label_matrix >= 0).any(axis=0))
+        label_matrix = label_matrix[:, idx]
+    else:
+        if non_key_nodes is None:
+            non_key_nodes = list(set(features.core.labels) - set(key_nodes))
+        idx, y_true = label_indices(features, key_nodes, non_key_nodes)
+        evaluators = [make_evaluator(features, idx, y_true, r, metric, threshold) for r in rank_types]
+        label_matrix = y_true
+    evaluate = evaluators[0]
+
+    if cv_folds:
+        if isinstance(key_nodes, dict):
+            raise ValueError("cv_folds is not supported for multiple label sets")
+        if library is not None:
+            # 各折只在部分标注节点上调参，其结果不应作为该网络的最佳参数写回参数库
+            raise ValueError("library is not supported with cv_folds")
+        options = dict(n_trials=n_trials, metric=metric, threshold=threshold, rank_type=rank_type,
+                       optimizer=optimizer, n_restarts=n_restarts, seed=seed, fidelity=fidelity,
+                       pruner=pruner, fixed_params=fixed_params)
+        return _cross_validate(features, idx, y_true, evaluators, rank_types, cv_folds, n_jobs,
+                               options, verbose)
+
+    if isinstance(library, str):
+        library = ParameterLibrary(library)
+    warm_starts = {}
+    if library is not None:
+        if isinstance(key_nodes, dict):
+            raise ValueError("library is not supported for multiple label sets")
+        warm_starts = {r: library.warm_start(features, features.base_name, r, metric) for r in rank_types}
+
+    names = ['theta'] + [f'lambda_{size}' for size in features.sizes]
+    fixed_params = dict(fixed_params or {})
+    free_names = [name for name in names if name not in fixed_params]
+
+    def complete(params):
+        # 补全被固定的参数，并按theta、lambda_3...的顺序排列
+        merged = dict(fixed_params, **params)
+        return {name: merged[name] for name in names}
+
+    if optimizer in ('gradient', 'cmaes', 'de'):
+        results = []
+        for r, e in zip(rank_types, evaluators):
+            with profiling.stage('tuning'):
+                if optimizer == 'gradient':
+                    params, value, _ = fit_gradient(features, idx, y_true, r, e, n_restarts=n_restarts,
+                                                    seed=seed, verbose=verbose, initial=warm_starts.get(r),
+                                                    fixed=fixed_params)
+                else:
+                    batch = make_batch_evaluator(features, idx, label_matrix, r, metric, threshold, aggregate)
+                    params, value = fit_population(_expand_fixed(batch, names, free_names, fixed_params),
+                                                   free_names, optimizer, n_trials=n_trials, seed=seed,
+                                                   verbose=verbose, initial=warm_starts.get(r))
+            results.append((complete(params), value))
+        best_params = {r: res[0] for r, res in zip(rank_types, results)}
+        best_values = {r: res[1] for r, res in zip(rank_types, results)}
+        _update_library(library, features, metric, best_params, best_values)
+        if rank_type == 'both':
+            return best_params, best_values
+        return results[0]
+    elif optimizer != 'tpe':
+        raise ValueError(f"Invalid optimizer '{optimizer}'. Choose from 'tpe', 'gradient', 'cmaes', 'de'")
+
+    subsamples = stratified_subsamples(y_true, fidelity, seed) if fidelity else []
+    nested = make_nested_evaluator(features, idx, y_true, rank_type, metric, threshold) if fidelity else None
+    evaluated = [0]
+
+    # optuna导入较慢，只在使用TPE调参时导入
+    import optuna
 
     def objective(trial):
-        # 动态生成参数
-        params = {}
-        params['theta'] = trial.suggest_float('theta', 0, 1.0)
-        for size in range(3, max_clique + 1):
-            params[f'lambda_{size}'] = trial.suggest_float(f'lambda_{size}', 0, 1.0)
-
-        cdr, csr = improved_centrality(G, base_scores, max_clique, params)
-        rank_scores = csr if rank_type == 'csr' else cdr
-        return evaluate_rank(rank_scores, key_nodes, non_key_nodes, all_nodes, metric, threshold)
-
-    # 保存当前日志级别
-    original_log_level = optuna.logging.get_verbosity()
-    
-    if not verbose:
-        # 完全禁用所有输出
-        optuna.logging.set_verbosity(optuna.logging.ERROR)
-        optuna.logging.disable_default_handler()
-        optuna.logging.disable_propagation()
-
-    study = optuna.create_study(direction='maximize')
-    study.optimize(objective, n_trials=n_trials, show_progress_bar=verbose)
-
-    if not verbose:
-        # 恢复日志设置
-        optuna.logging.set_verbosity(original_log_level)
-        optuna.logging.enable_default_handler()
-        optuna.logging.enable_propagation()
-
-    return study.best_params, study.best_value
\ No newline at end of file
+        # 动态生成参数，被固定的参数不参与搜索
+        params = dict(fixed_params)
+        for name in free_names:
+            params[name] = trial.suggest_float(name, 0, 1.0)
+
+        if fidelity:
+            # 先在嵌套子样本上评估，不佳的试验提前剪枝；已计算的得分在之后的评估中复用
+            for step, subset in enumerate(subsamples):
+                value, n_scored = nested(params, subset)
+                evaluated[0] += n_scored
+                trial.report(value, step)
+                if trial.should_prune():
+                    raise optuna.TrialPruned()
+            value, n_scored = nested(params)
+            evaluated[0] += n_scored
+            return value
+        evaluated[0] += len(idx) * len(evaluators)
+        if rank_type == 'both':
+            return tuple(e(params) for e in evaluators)
+        return evaluate(params)
+
+    if fidelity and pruner is None:
+        # 前n_startup_trials个试验不剪枝，按试验次数的比例设置，避免短的调参中大部分试验都无法剪枝
+        pruner = optuna.pruners.MedianPruner(n_startup_trials=max(1, min(5, n_trials // 10)))
+    directions = ['maximize'] * len(rank_types)
+    # 不输出日志时完全禁用optuna的输出
+    with nullcontext() if verbose else _quiet_optuna():
+        study = optuna.create_study(directions=directions, sampler=optuna.samplers.TPESampler(seed=seed),
+                                    pruner=pruner if fidelity else None)
+        # 参数库中的参数作为最先评估的试验
+        for params in (p for r in rank_types for p in warm_starts.get(r, [])):
+            study.enqueue_trial({name: params[name] for name in free_names}, skip_if_exists=True)
+        with profiling.stage('tuning'):
+            study.optimize(objective, n_trials=n_trials, show_progress_bar=verbose)
+    profiling.count('trials', len(study.trials))
+    full_cost = len(study.trials) * len(idx)
+    if fidelity:
+        profiling.count('pruned_trials', len(study.get_trials(states=(optuna.trial.TrialState.PRUNED,))))
+        # 打分的节点数与不剪枝时的节点数，两者之比即多保真度调参节省的比例
+        profiling.count('fidelity_scored_nodes', evaluated[0])
+        profiling.count('fidelity_full_nodes', full_cost)
+        if evaluated[0] >= full_cost:
+            warnings.warn(f"Multi-fidelity tuning saved no evaluations: no trial was pruned in {len(study.trials)} "
+                          f"trials; use more trials or a different pruner")
+
+    if fidelity and verbose:
+        n_pruned = len(study.get_trials(states=(optuna.trial.TrialState.PRUNED,)))
+        print(f"Multi-fidelity tuning: {n_pruned} of {len(study.trials)} trials pruned, "
+              f"{evaluated[0]} of {full_cost} labeled-node evaluations "
+              f"(saved fraction: {1 - evaluated[0] / max(full_cost, 1):.3f})")
+
+    if rank_type == 'both':
+        # 分别取Pareto前沿上CDR与CSR得分最高的试验
+        best_params, best_values = {}, {}
+        for i, r in enumerate(rank_types):
+            trial = max(study.best_trials, key=lambda t: t.values[i])
+            best_params[r] = complete(trial.params)
+            best_values[r] = trial.values[i]
+        if verbose:
+            print(f"Pareto front contains {len(study.best_trials)} trials")
+        _update_library(library, features, metric, best_params, best_values)
+        return best_params, best_values
+
+    best_params = complete(study.best_params)
+    _update_library(library, features, metric, {rank_type: best_params}, {rank_type: study.best_value})
+    return best_params, study.best_value
\ No newline at end of file
@@ -0,0 +1,395 @@
+import argparse
+import glob
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+import networkx as nx
+import numpy as np
+from graph_core import GraphCore, clique_arrays, count_cliques
+from centrality_improvement import (HigherOrderFeatures, compute_base_scores, compute_combined_motif_network,
+                                    find_motifs, improved_centrality, score_features, score_nodes_batch)
+from sweep import load_network, load_nodes
+import profiling
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+TISSUE_DIR = os.path.join(PACKAGE_DIR, 'tissue-specific networks analysis', 'data', 'pairwise interaction networks')
+FORMAT_VERSION = 1
+# 结果中各阶段的顺序
+STAGES = ['load', 'base_centralities', 'graph_core', 'enumeration', 'counts', 'g_prime', 'scoring', 'tuning']
+# 附带的网络，路径相对于仓库根目录
+SHIPPED = {
+    'artificial': {'path': 'data/artificial_network_edgelist.edgelist', 'key_nodes': 'data/key_nodes_100.txt'},
+    'sc': {'path': 'data/sc/PPI Network.txt'},
+    'ec': {'path': 'data/ec/Ec PPI Network.csv'},
+}
+for _path in sorted(glob.glob(os.path.join(TISSUE_DIR, '*_network.edgelist'))):
+    # 组织特异性网络较稠密(脑组织尤甚)，与Fig.5一致只统计到5团
+    SHIPPED['tissue_' + os.path.basename(_path).split('_')[0]] = {
+        'path': os.path.relpath(_path, PACKAGE_DIR), 'max_clique': 5}
+# 生成的网络：节点数与平均度递增的幂律聚类网络
+SYNTHETIC = {f'synthetic_n{n}_d{d}': {'generator': 'powerlaw_cluster', 'n': n, 'degree': d}
+             for n in (1000, 2000, 4000, 8000) for d in (4, 8, 16)}
+SUITES = {
+    'quick': ['artificial', 'ec', 'tissue_blood', 'tissue_kidney', 'synthetic_n1000_d4', 'synthetic_n1000_d8',
+              'synthetic_n2000_d8'],
+    'full': list(SHIPPED) + list(SYNTHETIC),
+}
+
+
+def network_spec(name):
+    """返回网络名对应的配置字典"""
+    if name in SHIPPED:
+        return dict(SHIPPED[name])
+    if name in SYNTHETIC:
+        return dict(SYNTHETIC[name])
+    raise ValueError(f"Unknown benchmark network '{name}'. Choose from {sorted(SHIPPED) + sorted(SYNTHETIC)}")
+
+
+def load_benchmark_network(spec):
+    """按配置加载附带的网络或以固定种子生成网络"""
+    if spec.get('generator') == 'powerlaw_cluster':
+        G = nx.powerlaw_cluster_graph(spec['n'], spec['degree'] // 2, 0.5, seed=spec.get('seed', 0))
+        return nx.relabel_nodes(G, str)
+    return load_network(os.path.join(PACKAGE_DIR, spec['path']))
+
+
+def benchmark_labels(G, spec, fraction=0.1, seed=0):
+    """调参用的关键节点：配置中给出时读取文件，否则以固定种子随机选取一定比例的节点(只用于计时)"""
+    if spec.get('key_nodes'):
+        return load_nodes(os.path.join(PACKAGE_DIR, spec['key_nodes']), str)
+    labels = sorted(G.nodes())
+    rng = np.random.default_rng(seed)
+    return [labels[i] for i in rng.choice(len(labels), max(2, int(fraction * len(labels))), replace=False)]
+
+
+def reference_features(G, max_clique=None):
+    """不依赖graph_core的参考实现：networkx枚举团，compute_combined_motif_network构建G_prime
+
+    返回:
+        团列表(节点标签排序后的元组)、G_prime、{(节点, 团大小): 参与次数}
+    """
+    simple = nx.Graph(G)
+    simple.remove_edges_from(nx.selfloop_edges(simple))
+    motifs = []
+    for clique in nx.enumerate_all_cliques(simple):
+        if max_clique is not None and len(clique) > max_clique:
+            break
+        if len(clique) >= 3:
+            motifs.append(tuple(sorted(clique)))
+    G_prime = compute_combined_motif_network(G.edges(), motifs)
+    G_prime.add_nodes_from(G.nodes())
+    participation = Counter((node, len(motif)) for motif in motifs for node in motif)
+    return motifs, G_prime, participation
+
+
+def reference_scores(G, base_scores, motifs, G_prime, participation, params):
+    """按CDR/CSR的定义逐节点计算得分(参考实现)，返回CDR和CSR字典"""
+    base = compute_base_scores(G, base_scores)
+    sizes = sorted({len(motif) for motif in motifs})
+    totals = {k: sum(v for (_, size), v in participation.items() if size == k) or 1e-10 for k in sizes}
+    degree = dict(G_prime.degree())
+    strength = dict(G_prime.degree(weight='weight'))
+    results = []
+    for values in (degree, strength):
+        total = sum(values.values()) + 1e-10
+        adjusted = {}
+        for node in G.nodes():
+            correction = 1 + sum(params.get(f'lambda_{k}', 0) * participation.get((node, k), 0) / totals[k]
+                                 for k in sizes)
+            adjusted[node] = base.get(node, 0) * (values[node] / total) ** params['theta'] * correction
+        norm = sum(adjusted.values()) + 1e-10
+        results.append({node: value / norm for node, value in adjusted.items()})
+    return results
+
+
+def _max_diff(a, b):
+    return max((abs(a[node] - b[node]) for node in a), default=0.0)
+
+
+def check_network(G, max_clique=None, base_scores='dc', n_params=3, seed=0, tol=1e-12):
+    """快速实现与参考实现的差分正确性检查
+
+    检查项:
+        motifs: find_motifs 与 networkx 枚举的团集合一致
+        counts: count_cliques 的团个数、节点参与次数和边权重与参考实现一致
+        scores: improved_centrality 在若干组随机参数下与逐节点参考实现一致
+        batch_scores: score_nodes_batch(normalize=True) 与 score_features 一致
+
+    返回:
+        {检查项: {'ok': 是否通过, 'max_diff': 最大偏差}}
+    """
+    motifs, G_prime, participation = reference_features(G, max_clique)
+    checks = {}
+    fast_motifs = find_motifs(G, max_clique)
+    checks['motifs'] = {'ok': sorted(fast_motifs) == sorted(motifs), 'max_diff': abs(len(fast_motifs) - len(motifs))}
+
+    core = GraphCore.from_networkx(G)
+    counts = count_cliques(core, max_clique)
+    diff = 0.0
+    for j, size in enumerate(counts.sizes):
+        expected = np.array([participation.get((label, size), 0) for label in core.labels])
+        diff = max(diff, float(np.abs(counts.node_counts[:, j] - expected).max(initial=0)))
+        diff = max(diff, abs(int(counts.clique_numbers[j]) - sum(1 for m in motifs if len(m) == size)))
+    expected = np.array([G_prime[core.labels[u]][core.labels[v]]['weight']
+                         for u, v in zip(core.edge_u, core.edge_v)])
+    diff = max(diff, float(np.abs(counts.edge_weights - expected).max(initial=0)))
+    checks['counts'] = {'ok': diff == 0, 'max_diff': diff}
+
+    rng = np.random.default_rng(seed)
+    features = HigherOrderFeatures(core, core.from_dict(compute_base_scores(G, base_scores)), counts, base_scores)
+    score_diff = batch_diff = 0.0
+    for _ in range(n_params):
+        params = {'theta': float(rng.uniform())}
+        params.update({f'lambda_{size}': float(rng.uniform()) for size in counts.sizes})
+        cdr, csr = improved_centrality(G, base_scores, max_clique, params)
+        ref_cdr, ref_csr = reference_scores(G, base_scores, motifs, G_prime, participation, params)
+        score_diff = max(score_diff, _max_diff(ref_cdr, cdr), _max_diff(ref_csr, csr))
+        row = [params['theta']] + [params[f'lambda_{size}'] for size in features.sizes]
+        idx = np.arange(core.number_of_nodes())
+        for r, full in zip(('cdr', 'csr'), score_features(features, params)):
+            batch = score_nodes_batch(features, row, idx, r, normalize=True)[0]
+            batch_diff = max(batch_diff, float(np.abs(batch - full).max(initial=0)))
+    checks['scores'] = {'ok': score_diff <= tol, 'max_diff': score_diff}
+    checks['batch_scores'] = {'ok': batch_diff <= tol, 'max_diff': batch_diff}
+    return checks
+
+
+def bench_network(name, repeat=1, bases=('dc',), n_trials=50, n_scores=100, check=False, check_max_edges=20000):
+    """在当前进程中对单个网络计时各阶段(每个阶段取repeat次中的最小值)
+
+    返回:
+        结果字典，包含 nodes、edges、max_clique、stages(各阶段每次调用的秒数)、peak_mb(各阶段RSS峰值)、
+        max_rss_mb、counters、tuning_value，以及check为True时的checks
+    """
+    # 调参依赖optuna和sklearn，只在需要时导入；计时前先导入，避免首次调参计入导入耗时
+    from bayesian_optimization import optimize_features
+    if n_trials:
+        import optuna
+        import sklearn.metrics
+
+    spec = network_spec(name)
+    max_clique = spec.get('max_clique')
+    best = {}
+    for _ in range(repeat):
+        with profiling.profile(memory=True) as prof:
+            with profiling.stage('load'):
+                G = load_benchmark_network(spec)
+            with profiling.stage('base_centralities'):
+                base = {b: compute_base_scores(G, b) for b in bases}
+            with profiling.stage('graph_core'):
+                core = GraphCore.from_networkx(G)
+            with profiling.stage('enumeration'):
+                cliques = clique_arrays(core, max_clique)
+            del cliques
+            with profiling.stage('counts'):
+                counts = count_cliques(core, max_clique)
+            with profiling.stage('g_prime'):
+                features = HigherOrderFeatures(core, core.from_dict(base[bases[0]]), counts, bases[0])
+            params = features.default_params()
+            for _ in range(n_scores):
+                score_features(features, params)
+            if n_trials:
+                _, value = optimize_features(features, benchmark_labels(G, spec), n_trials=n_trials, seed=0,
+                                             verbose=False)
+        for stage, record in prof.stages.items():
+            seconds = record['seconds'] / max(record['calls'], 1)
+            if stage not in best or seconds < best[stage]['seconds']:
+                best[stage] = dict(record, seconds=seconds)
+    report = prof.report()
+    result = {'nodes': G.number_of_nodes(), 'edges': G.number_of_edges(), 'max_clique': max_clique,
+              'stages': {stage: round(best[stage]['seconds'], 6) for stage in STAGES if stage in best},
+              'peak_mb': {stage: best[stage]['peak_mb'] for stage in STAGES if stage in best},
+              'max_rss_mb': report['memory']['peak_rss_mb'],
+              'counters': {key: value for key, value in report['counters'].items() if key != 'trials'}}
+    if n_trials:
+        result['tuning_value'] = value
+    if check:
+        if G.number_of_edges() <= check_max_edges:
+            result['checks'] = check_network(G, max_clique)
+        else:
+            result['checks'] = {'skipped': f'more than {check_max_edges} edges'}
+    return result
+
+
+def bench_startup(repeat=3):
+    """冷启动耗时：main.py --help 以及对34个节点的空手道俱乐部网络打分(各取repeat次中的最小值)"""
+    main = os.path.join(PACKAGE_DIR, 'main.py')
+    with tempfile.TemporaryDirectory() as folder:
+        network = os.path.join(folder, 'karate.edgelist')
+        nx.write_edgelist(nx.karate_club_graph(), network, data=False)
+        commands = {'main_help': [sys.executable, main, '--help'],
+                    'main_score_small': [sys.executable, main, '-G', network, '-b', 'dc', '-o', folder]}
+        stages = {}
+        for stage, command in commands.items():
+            seconds = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                subprocess.run(command, check=True, capture_output=True)
+                seconds.append(time.perf_counter() - start)
+            stages[stage] = round(min(seconds), 6)
+    return {'stages': stages}
+
+
+def machine_info():
+    return {'python': platform.python_version(), 'platform': platform.platform(), 'cpu_count': os.cpu_count(),
+            'numpy': np.__version__, 'networkx': nx.__version__}
+
+
+def run_suite(names, repeat=1, bases=('dc',), n_trials=50, check=False, startup=True, verbose=True):
+    """依次在独立的子进程中对各网络计时，避免网络之间的内存和缓存相互影响
+
+    返回:
+        可写为JSON的基准结果字典
+    """
+    results = {'format_version': FORMAT_VERSION, 'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+               'machine': machine_info(), 'settings': {'repeat': repeat, 'bases': list(bases), 'n_trials': n_trials},
+               'networks': {}}
+    if startup:
+        results['networks']['cli_startup'] = bench_startup()
+    for name in names:
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as pool:
+            try:
+                results['networks'][name] = pool.submit(bench_network, name, repeat, tuple(bases), n_trials,
+                                                        check=check).result()
+            except Exception as e:
+                results['networks'][name] = {'error': f'{type(e).__name__}: {e}'}
+        if verbose:
+            entry = results['networks'][name]
+            status = entry.get('error') or ', '.join(f'{k} {v:.3f}s' for k, v in entry['stages'].items())
+            print(f"{name} ({time.perf_counter() - start:.1f}s): {status}", flush=True)
+    return results
+
+
+def compare_results(baseline, current, threshold=0.3, min_seconds=0.02):
+    """比较两次基准结果
+
+    某阶段耗时超过基准的 (1 + threshold) 倍且绝对差超过min_seconds时记为regression，
+    低于基准的 1 / (1 + threshold) 倍时记为improvement；团计数变化或差分检查失败记为error。
+    两次运行的settings(repeat、bases、n_trials)不同时耗时不可比，不比较耗时而对每个不同的设置记为error，
+    只比较团计数和差分检查；machine不同时对每个不同的字段记为warning。
+
+    返回:
+        行列表，每行为 (网络, 阶段, 基准值, 当前值, 比值, 状态)
+    """
+    rows = []
+    settings = _differences(baseline.get('settings', {}), current.get('settings', {}))
+    for key, before, after in settings:
+        rows.append(('-', f'settings:{key}', None, None, None,
+                     f"error: settings differ ({before!r} vs {after!r}), timings not compared"))
+    for key, before, after in _differences(baseline.get('machine', {}), current.get('machine', {})):
+        rows.append(('-', f'machine:{key}', None, None, None, f"warning: machine differs ({before!r} vs {after!r})"))
+    for name, entry in current['networks'].items():
+        old = baseline['networks'].get(name)
+        if 'error' in entry:
+            rows.append((name, '-', None, None, None, f"error: {entry['error']}"))
+            continue
+        if old is None or 'error' in old:
+            rows.append((name, '-', None, None, None, 'new'))
+            continue
+        for stage, seconds in ([] if settings else entry['stages'].items()):
+            before = old['stages'].get(stage)
+            if before is None:
+                rows.append((name, stage, None, seconds, None, 'new'))
+                continue
+            ratio = seconds / before if before > 0 else float('inf')
+            status = 'ok'
+            if ratio > 1 + threshold and seconds - before > min_seconds:
+                status = 'regression'
+            elif ratio < 1 / (1 + threshold) and before - seconds > min_seconds:
+                status = 'improvement'
+            rows.append((name, stage, before, seconds, ratio, status))
+        changed = {key for key in set(entry.get('counters', {})) | set(old.get('counters', {}))
+                   if key.startswith('cliques_') and entry['counters'].get(key) != old['counters'].get(key)}
+        if changed:
+            rows.append((name, 'counters', None, None, None, f"error: clique counts changed ({', '.join(sorted(changed))})"))
+        for check, outcome in entry.get('checks', {}).items():
+            if isinstance(outcome, dict) and not outcome['ok']:
+                rows.append((name, f'check:{check}', None, outcome['max_diff'], None, 'error: check failed'))
+    return rows
+
+
+def _differences(old, new):
+    """两个字典中取值不同的键，返回 (键, 旧值, 新值) 列表"""
+    return [(key, old.get(key), new.get(key)) for key in sorted(set(old) | set(new)) if old.get(key) != new.get(key)]
+
+
+def print_comparison(rows, only_flagged=False):
+    print(f"{'network':<24}{'stage':<20}{'baseline':>12}{'current':>12}{'ratio':>9}  status")
+    for name, stage, before, seconds, ratio, status in rows:
+        if only_flagged and status == 'ok':
+            continue
+        fmt = lambda value, spec: format(value, spec) if value is not None else '-'
+        print(f"{name:<24}{stage:<20}{fmt(before, '12.4f'):>12}{fmt(seconds, '12.4f'):>12}"
+              f"{fmt(ratio, '9.2f'):>9}  {status}")
+
+
+def parse_arguments():
+    """
+    解析命令行参数
+    """
+    parser = argparse.ArgumentParser(description="基准测试：各阶段计时、与基准结果比较以及差分正确性检查")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run = subparsers.add_parser('run', help="运行基准测试并将结果写入 JSON 文件")
+    run.add_argument('-s', '--suite', type=str, choices=sorted(SUITES), default='quick', help="网络集合，默认为quick")
+    run.add_argument('-N', '--networks', type=str, nargs='*', default=None, help="指定网络名(覆盖--suite)")
+    run.add_argument('-o', '--output', type=str, help="结果 JSON 文件路径", required=True)
+    run.add_argument('-r', '--repeat', type=int, default=3, help="每个网络的重复次数(各阶段取最小值)，默认为3")
+    run.add_argument('-b', '--bases', type=str, nargs='*', default=['dc', 'pr', 'ec'],
+                     help="计时的基础中心性，默认为 dc pr ec(第一个用于打分和调参)")
+    run.add_argument('--n_trials', type=int, default=50, help="固定种子调参的试验次数，0表示不调参，默认为50")
+    run.add_argument('--check', action='store_true', help="同时运行差分正确性检查")
+    run.add_argument('--baseline', type=str, default=None, help="运行后与该基准结果比较")
+    run.add_argument('--threshold', type=float, default=0.3, help="比较时判定为变慢的相对阈值，默认为0.3")
+
+    cmp = subparsers.add_parser('compare', help="比较两个结果文件，有变慢或错误时以非零状态退出")
+    cmp.add_argument('baseline', type=str, help="基准结果 JSON 文件路径")
+    cmp.add_argument('current', type=str, help="当前结果 JSON 文件路径")
+    cmp.add_argument('--threshold', type=float, default=0.3, help="判定为变慢的相对阈值，默认为0.3")
+    cmp.add_argument('--all', action='store_true', help="列出所有阶段(默认只列出有变化的)")
+
+    chk = subparsers.add_parser('check', help="只运行差分正确性检查")
+    chk.add_argument('-s', '--suite', type=str, choices=sorted(SUITES), default='quick', help="网络集合，默认为quick")
+    chk.add_argument('-N', '--networks', type=str, nargs='*', default=None, help="指定网络名(覆盖--suite)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    if args.command == 'compare':
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        with open(args.current, 'r') as f:
+            current = json.load(f)
+        rows = compare_results(baseline, current, args.threshold)
+        print_comparison(rows, only_flagged=not args.all)
+        sys.exit(1 if any(row[5] == 'regression' or row[5].startswith('error') for row in rows) else 0)
+
+    names = args.networks or SUITES[args.suite]
+    if args.command == 'check':
+        failed = False
+        for name in names:
+            spec = network_spec(name)
+            checks = check_network(load_benchmark_network(spec), spec.get('max_clique'))
+            failed |= not all(outcome['ok'] for outcome in checks.values())
+            print(f"{name}: " + ', '.join(f"{check} {'ok' if outcome['ok'] else 'FAILED'} ({outcome['max_diff']:.3g})"
+                                          for check, outcome in checks.items()), flush=True)
+        sys.exit(1 if failed else 0)
+
+    results = run_suite(names, args.repeat, args.bases, args.n_trials, args.check)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"结果已保存至 {args.output}")
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            rows = compare_results(json.load(f), results, args.threshold)
+        print_comparison(rows, only_flagged=True)
+        sys.exit(1 if any(row[5] == 'regression' or row[5].startswith('error') for row in rows) else 0)
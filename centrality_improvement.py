@@ -1,12 +1,11 @@
 import networkx as nx
+import numpy as np
 from collections import defaultdict
+from contextlib import nullcontext
 from itertools import combinations
-import random
-import os
-
-# 设置工作路径为当前文件所在的目录
-current_file_dir = os.path.dirname(os.path.abspath(__file__))
-os.chdir(current_file_dir)
+from graph_core import GraphCore, iter_cliques, count_cliques
+from clique_sampling import budgeted_clique_counts, approximate_clique_counts
+import profiling
 
 def find_motifs(G, max_clique=None):
     """查找网络中的所有团
@@ -18,17 +17,14 @@ def find_motifs(G, max_clique=None):
     返回:
         包含所有motif的列表，每个motif是一个排序后的元组
     """
+    with profiling.stage('find_motifs'):
+        core = GraphCore.from_networkx(G)
+        by_size = defaultdict(list)
+        for clique in iter_cliques(core, max_clique):
+            by_size[len(clique)].append(tuple(sorted(core.labels[i] for i in clique)))
     all_motifs = []
-    if max_clique is None:
-        max_clique = max(len(c) for c in nx.find_cliques(G))
-    for size in range(3, max_clique + 1):
-        cliques = []
-        for clique in nx.find_cliques(G):
-            if len(clique) >= size:
-                for sub_clique in combinations(clique, size):
-                    if all(G.has_edge(u, v) for u, v in combinations(sub_clique, 2)):
-                        cliques.append(tuple(sorted(sub_clique)))
-        all_motifs.extend(list(set(cliques)))
+    for size in sorted(by_size):
+        all_motifs.extend(by_size[size])
     return all_motifs
 
 
@@ -42,23 +38,19 @@ def compute_combined_motif_network(edges, motifs):
     返回:
         高阶加权后的网络G_prime
     """
-    G = nx.Graph()
-    G.add_edges_from(edges)
-    edge_weights = defaultdict(int)
-    for u, v in G.edges():
-        edge_weights[(u, v)] = 1
-
-    clique_sizes = set(len(motif) for motif in motifs)
-    for size in clique_sizes:
-        size_motifs = [motif for motif in motifs if len(motif) == size]
-        for clique in size_motifs:
-            for u, v in combinations(clique, 2):
-                edge_weights[(u, v)] += size
-
-    G_prime = nx.Graph()
-    G_prime.add_nodes_from(G.nodes())
-    for (u, v), weight in edge_weights.items():
-        G_prime.add_edge(u, v, weight=weight)
+    with profiling.stage('combined_motif_network'):
+        G = nx.Graph()
+        G.add_edges_from(edges)
+        G_prime = nx.Graph()
+        G_prime.add_nodes_from(G.nodes())
+        G_prime.add_edges_from(G.edges(), weight=1)
+
+        # 边权重以无向边为单位累加，与边在G.edges()中的方向无关
+        for motif in motifs:
+            size = len(motif)
+            profiling.check_memory(size)
+            for u, v in combinations(motif, 2):
+                G_prime[u][v]['weight'] += size
 
     return G_prime
 
@@ -76,98 +68,253 @@ def count_motif(node, motifs):
     return sum(1 for motif in motifs if node in motif)
 
 
-def improved_centrality(G, base_scores='dc', max_clique=None, params=None):
-    """计算改进的中心性指标(CDR和CSR)
+def compute_base_scores(G, base_scores='dc'):
+    """计算基础中心性得分
 
     参数:
         G: 网络图对象
-        base_scores: 基础中心性类型，可选'dc'(度中心性，默认)、'bc'(中介中心性)、
-                    'cc'(接近中心性)、'ec'(特征向量中心性)、'pr'(PageRank)
-                    或直接提供预计算的中心性分数字典
-        max_clique: 最大团大小，None则自动计算网络中的最大团
-        params: 包含theta和lambda参数的字典，None则随机生成
+        base_scores: 基础中心性类型，可选'dc'、'bc'、'cc'、'ec'、'pr'或得分字典
 
     返回:
-        两个字典: CDR分数字典, CSR分数字典
+        基础中心性得分字典 {node: score}
     """
+    if isinstance(base_scores, dict):
+        return base_scores
     if base_scores == 'bc':
-        base_scores = nx.betweenness_centrality(G)
+        return nx.betweenness_centrality(G)
     elif base_scores == 'cc':
-        base_scores = nx.closeness_centrality(G)
+        return nx.closeness_centrality(G)
     elif base_scores == 'dc':
-        base_scores = nx.degree_centrality(G)
+        return nx.degree_centrality(G)
     elif base_scores == 'ec':
-        base_scores = nx.eigenvector_centrality(G)
+        return nx.eigenvector_centrality(G)
     elif base_scores == 'pr':
-        base_scores = nx.pagerank(G)
-    else:
-        base_scores = base_scores
+        return nx.pagerank(G)
+    return base_scores
 
-    if params is None:
-        # 将所有参数设为1
-        params = {}
-        params['theta'] = 1.0
-        if max_clique is None:
-            max_clique = max(len(c) for c in nx.find_cliques(G))
-        for size in range(3, max_clique + 1):
+
+class HigherOrderFeatures:
+    """改进中心性所需的预计算特征
+
+    与参数theta、lambda无关的中间结果只需计算一次，之后可以用不同的参数
+    反复调用score_features，所有数组均按core的节点编号排列。
+
+    属性:
+        core: GraphCore对象
+        base: 基础中心性得分数组
+        sizes: 团大小列表 [3, ..., max_clique]
+        node_counts: 节点参与各大小团次数的矩阵 (节点数 x len(sizes))
+        totals: 各大小团的参与次数之和(为0时替换为1e-10)
+        edge_weights: 高阶加权网络G_prime中按无向边编号排列的边权重
+        motif_degree, motif_strength: 高阶加权网络的度数与强度(自环计2)
+        norm_degree: 归一化的高阶加权网络度数
+        norm_strength: 归一化的高阶加权网络强度
+        base_name: 基础中心性名称('dc'等，直接提供得分字典时为'custom')
+        clique_variance: 团计数为抽样估计时各大小团个数的方差，精确计数时为None
+        node_ci: 近似团计数时节点计数置信区间的(下界, 上界)数组(形状同node_counts)，否则为None
+        count_report: 计数方式说明：按预算计数时为budgeted_clique_counts给出的字典，近似计数时为
+                      {'mode': 'approximate', 'fraction': sample_rate, 'seed': seed}，超出内存上限而降低
+                      最大团大小时另含max_clique和memory_limit_hit，否则为None
+    """
+
+    def __init__(self, core, base, counts, base_name='custom', count_report=None):
+        self.core = core
+        self.base = base
+        self.base_name = base_name
+        self.sizes = counts.sizes
+        self.node_counts = counts.node_counts
+        self.clique_numbers = counts.clique_numbers
+        self.clique_variance = counts.variance
+        self.node_ci = counts.node_ci
+        self.count_report = count_report
+        self.totals = np.where(counts.totals == 0, 1e-10, counts.totals).astype(float)
+
+        loops = 2 * core.self_loops
+        self.edge_weights = counts.edge_weights
+        self.motif_degree = core.degree() + loops
+        self.motif_strength = np.bincount(core.indices, weights=counts.edge_weights[core.edge_ids],
+                                          minlength=core.number_of_nodes()) + loops
+        self.norm_degree = self.motif_degree / (self.motif_degree.sum() + 1e-10)
+        self.norm_strength = self.motif_strength / (self.motif_strength.sum() + 1e-10)
+        # 节点参与各大小团的比例，score_features中直接与lambda做矩阵乘法
+        self.count_ratios = self.node_counts / self.totals
+
+    def default_params(self):
+        """返回所有参数均为1的参数字典"""
+        params = {'theta': 1.0}
+        for size in self.sizes:
             params[f'lambda_{size}'] = 1.0
+        return params
+
+    def lambdas(self, params):
+        """将参数字典中的lambda按sizes排列为数组，缺失的lambda视为0"""
+        return np.array([params.get(f'lambda_{size}', 0) for size in self.sizes], dtype=float)
+
+
+def compute_features(G, base_scores='dc', max_clique=None, time_budget=None, memory_budget=None,
+                     sample_rate=None, seed=None):
+    """预计算改进中心性所需的全部特征
+
+    参数:
+        G: 网络图对象
+        base_scores: 基础中心性类型或得分字典，同improved_centrality
+        max_clique: 最大团大小，None则自动计算网络中的最大团
+        time_budget: 团计数的时间预算(秒)，预估的精确枚举耗时超出时改用抽样计数
+        memory_budget: 团计数的内存预算(字节)，预估超出时降低最大团大小
+        sample_rate: 不为None时使用边抽样的近似团计数(approximate_clique_counts)，
+                     取值为期望枚举的工作量比例，此时忽略时间和内存预算
+        seed: 抽样计数和近似计数的随机种子，None表示不固定
+
+    返回:
+        HigherOrderFeatures对象
+    """
+    with profiling.stage('graph_core'):
+        core = GraphCore.from_networkx(G)
+    with profiling.stage('base_centrality'):
+        base = core.from_dict(compute_base_scores(G, base_scores))
+    report = limit_hit = None
+    attempt = nullcontext
+    with profiling.stage('clique_counts'):
+        while True:
+            try:
+                with attempt():
+                    if sample_rate is not None:
+                        counts = approximate_clique_counts(core, max_clique, sample_rate, seed=seed)
+                        report = {'mode': 'approximate', 'fraction': sample_rate, 'seed': seed}
+                    elif time_budget is None and memory_budget is None:
+                        counts = count_cliques(core, max_clique)
+                    else:
+                        counts, report = budgeted_clique_counts(core, max_clique, time_budget, memory_budget, seed)
+                break
+            except profiling.MemoryLimitExceeded as e:
+                # 超出内存上限时降低最大团大小重新计数，已无法降低时放弃；
+                # memory_retry先回收内存，并以阶段开始时的RSS加上重试新分配的内存判定是否超限
+                if e.size is None or e.size <= 3:
+                    profiling.memory_event(e, 'aborted')
+                    raise
+                max_clique = e.size - 1
+                profiling.memory_event(e, f'retried with max_clique={max_clique}')
+                limit_hit = e.info()
+                attempt = profiling.memory_retry
+    if limit_hit is not None:
+        report = dict(report or {'mode': 'exact'}, max_clique=max_clique, memory_limit_hit=limit_hit)
+    for size, number in zip(counts.sizes, counts.clique_numbers):
+        profiling.count(f'cliques_{size}', int(number))
+    base_name = base_scores if isinstance(base_scores, str) else 'custom'
+    # 高阶加权网络(G_prime)的节点强度与各大小团的参与比例
+    with profiling.stage('weighted_network'):
+        return HigherOrderFeatures(core, base, counts, base_name, report)
+
+
+def score_features(features, params=None):
+    """根据预计算特征和参数计算CDR与CSR得分数组
+
+    参数:
+        features: HigherOrderFeatures对象
+        params: 包含theta和lambda参数的字典，None则所有参数取1
+
+    返回:
+        两个数组: CDR得分, CSR得分(按节点编号排列)
+    """
+    if params is None:
+        params = features.default_params()
+    with profiling.stage('scoring'):
+        return combine_scores(features.base, features.norm_degree, features.norm_strength,
+                              features.count_ratios, features.lambdas(params), params.get('theta', 1.0))
+
+
+def combine_scores(base, norm_degree, norm_strength, count_ratios, lambdas, theta=1.0):
+    """由基础中心性、归一化的高阶加权度数/强度和团参与比例计算CDR与CSR得分数组
 
-    # if params is None:
-    #     # 设置随机种子
-    #     random.seed(42)
-    #     # 自动生成参数
-    #     params = {}
-    #     params['theta'] = random.uniform(0, 1)
-    #     if max_clique is None:
-    #         max_clique = max(len(c) for c in nx.find_cliques(G))
-    #     for size in range(3, max_clique + 1):
-    #         params[f'lambda_{size}'] = random.uniform(0, 1)
-            
-    motifs = find_motifs(G, max_clique)
-    G_prime = compute_combined_motif_network(G.edges, motifs)
-
-    motif_degree = dict(G_prime.degree())
-    motif_strength = dict(nx.degree(G_prime, weight='weight'))
-
-    # 初始化所有节点的团计数
-    # node_motif_counts = {}
-    node_motif_counts = {node: {} for node in G.nodes()}
-
-    clique_sizes = set(len(motif) for motif in motifs)
-    for size in clique_sizes:
-        size_motifs = [motif for motif in motifs if len(motif) == size]
-        for node in G.nodes():
-            count = count_motif(node, size_motifs)
-            # if node not in node_motif_counts:
-            #     node_motif_counts[node] = {}
-            node_motif_counts[node][size] = count
-
-    total_degree = sum(motif_degree.values()) + 1e-10
-    norm_degree = {n: d / total_degree for n, d in motif_degree.items()}
-
-    total_strength = sum(motif_strength.values()) + 1e-10
-    norm_strength = {n: s / total_strength for n, s in motif_strength.items()}
-
-    def _calculate_scores(base_scores, norm_motif_vals):
-        adjusted = {}
-        for n in G.nodes():
-            base_effect = (norm_motif_vals[n]) ** params.get('theta', 1.0)
-            high_order_correction = 1
-            for size in node_motif_counts[n]:
-                lambda_n = params.get(f'lambda_{size}', 0)
-                total_size = sum(node_motif_counts[m][size] for m in G.nodes())
-                if total_size == 0:
-                    total_size = 1e-10  # 防止除零错误
-                high_order_correction += lambda_n * (node_motif_counts[n][size] / total_size)
-            adjusted[n] = base_scores[n] * base_effect * high_order_correction
-
-        total = sum(adjusted.values()) + 1e-10
-        return {n: score / total for n, score in adjusted.items()}
-
-    cdr = _calculate_scores(base_scores, norm_degree)
-    csr = _calculate_scores(base_scores, norm_strength)
-
-    return cdr, csr
+    score_features的核心计算，供直接维护这些数组而不构建HigherOrderFeatures的调用方
+    (如DynamicCliqueIndex.score_arrays)使用。
+
+    参数:
+        base: 基础中心性得分数组
+        norm_degree, norm_strength: 归一化的高阶加权网络度数与强度
+        count_ratios: 节点参与各大小团的比例矩阵 (节点数 x 团大小个数)
+        lambdas: 按团大小排列的lambda数组
+        theta: 参数theta
+
+    返回:
+        两个数组: CDR得分, CSR得分
+    """
+    high_order_correction = 1 + count_ratios @ lambdas
+
+    def _calculate_scores(norm_motif_vals):
+        adjusted = base * norm_motif_vals ** theta * high_order_correction
+        return adjusted / (adjusted.sum() + 1e-10)
+
+    return _calculate_scores(norm_degree), _calculate_scores(norm_strength)
+
+
+def score_nodes(features, params, idx, rank_type='csr'):
+    """只计算部分节点未归一化的CDR或CSR得分
+
+    归一化常数对所有节点相同，不影响排序类指标(AUC、AP)，
+    因此调参时只需计算参与评估的节点。
+
+    参数:
+        features: HigherOrderFeatures对象
+        params: 包含theta和lambda参数的字典
+        idx: 节点编号数组
+        rank_type: 'csr'(默认) 或 'cdr'
+
+    返回:
+        idx中各节点未归一化的得分数组
+    """
+    norm = features.norm_strength if rank_type == 'csr' else features.norm_degree
+    correction = 1 + features.count_ratios[idx] @ features.lambdas(params)
+    return features.base[idx] * norm[idx] ** params.get('theta', 1.0) * correction
+
+
+def score_nodes_batch(features, param_matrix, idx, rank_type='csr', normalize=False):
+    """一次计算多组参数下部分节点的CDR或CSR得分
+
+    参数:
+        features: HigherOrderFeatures对象
+        param_matrix: 参数矩阵(参数组数, 1 + len(features.sizes))，每行为 [theta, lambda_3, ...]
+        idx: 节点编号数组
+        rank_type: 'csr'(默认) 或 'cdr'
+        normalize: 是否按全部节点的得分之和归一化(与score_features一致)，
+                   仅排序类指标时可保持默认的False
+
+    返回:
+        得分矩阵(参数组数, len(idx))
+    """
+    param_matrix = np.atleast_2d(param_matrix)
+    theta, lambdas = param_matrix[:, :1], param_matrix[:, 1:]
+    norm = features.norm_strength if rank_type == 'csr' else features.norm_degree
+    if not normalize:
+        correction = 1 + lambdas @ features.count_ratios[idx].T
+        return features.base[idx] * norm[idx] ** theta * correction
+    correction = 1 + lambdas @ features.count_ratios.T
+    adjusted = features.base * norm ** theta * correction
+    return (adjusted / (adjusted.sum(axis=1, keepdims=True) + 1e-10))[:, idx]
+
+
+def improved_centrality(G, base_scores='dc', max_clique=None, params=None, time_budget=None,
+                        memory_budget=None, sample_rate=None, seed=None):
+    """计算改进的中心性指标(CDR和CSR)
+
+    参数:
+        G: 网络图对象
+        base_scores: 基础中心性类型，可选'dc'(度中心性，默认)、'bc'(中介中心性)、
+                    'cc'(接近中心性)、'ec'(特征向量中心性)、'pr'(PageRank)
+                    或直接提供预计算的中心性分数字典
+        max_clique: 最大团大小，None则自动计算网络中的最大团
+        params: 包含theta和lambda参数的字典，None则所有参数取1
+        time_budget: 团计数的时间预算(秒)，None表示不限，超出预算时使用无偏的抽样团计数
+        memory_budget: 团计数的内存预算(字节)，None表示不限，超出预算时降低最大团大小
+        sample_rate: 近似团计数的抽样比例，None表示精确计数，适用于精确枚举无法完成的大规模网络
+        seed: 抽样计数和近似计数的随机种子，None表示不固定
+
+    返回:
+        两个字典: CDR分数字典, CSR分数字典
+    """
+    features = compute_features(G, base_scores, max_clique, time_budget, memory_budget, sample_rate, seed)
+    cdr, csr = score_features(features, params)
+    return features.core.to_dict(cdr), features.core.to_dict(csr)
 
 # # 使用示例
 # if __name__ == "__main__":
@@ -0,0 +1,136 @@
+from itertools import combinations
+import networkx as nx
+import numpy as np
+from graph_core import GraphCore, CliqueCounts, clique_arrays
+from centrality_improvement import HigherOrderFeatures, compute_base_scores, score_features
+
+
+class GlobalCliqueIndex:
+    """多个共享节点和边的网络(如11个组织特异性网络)共用的全局团索引
+
+    在所有网络的并图上只枚举一次团，每条边记录包含它的网络的位图，每个团的位图为
+    其所有边位图的按位与，即包含该团全部边的网络集合。某个网络中的团恰好是并图中
+    位图包含该网络的团，因此各网络的团计数、超边文件和CDR/CSR都可以通过位图筛选得到。
+
+    属性:
+        names: 网络名称列表，第t个网络对应位图的第t位
+        networks: {网络名称: 网络图对象}
+        core: 并图的GraphCore对象
+        edge_masks: 并图每条边的网络位图
+        cliques: {团大小: (团个数, 团大小) 的并图节点编号数组}
+        clique_masks: {团大小: 各团的网络位图}
+        clique_edges: {团大小: (团个数, 团内边数) 的并图边编号数组}
+    """
+
+    def __init__(self, networks, max_clique=None):
+        if len(networks) > 63:
+            raise ValueError("GlobalCliqueIndex supports at most 63 networks")
+        self.names = list(networks)
+        self.networks = dict(networks)
+        self.max_clique = max_clique
+        union = nx.Graph()
+        for G in self.networks.values():
+            union.add_nodes_from(G.nodes())
+            union.add_edges_from((u, v) for u, v in G.edges() if u != v)
+        self.core = GraphCore.from_networkx(union)
+
+        self.edge_masks = np.zeros(self.core.number_of_edges(), dtype=np.int64)
+        for t, G in enumerate(self.networks.values()):
+            u, v = self._edge_ids(G)
+            self.edge_masks[self.core.edge_index(u, v)] |= 1 << t
+
+        self.cliques = clique_arrays(self.core, max_clique)
+        self.clique_masks, self.clique_edges = {}, {}
+        for size, members in self.cliques.items():
+            pairs = list(combinations(range(size), 2))
+            edges = np.column_stack([self.core.edge_index(members[:, a], members[:, b]) for a, b in pairs])
+            self.clique_edges[size] = edges
+            self.clique_masks[size] = np.bitwise_and.reduce(self.edge_masks[edges], axis=1)
+
+    def _edge_ids(self, G):
+        """返回网络G中非自环边两端在并图中的节点编号"""
+        index = self.core.index
+        edges = [(index[u], index[v]) for u, v in G.edges() if u != v]
+        if not edges:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        u, v = np.array(edges, dtype=np.int64).T
+        return u, v
+
+    def _selected(self, name):
+        """返回 {团大小: 属于该网络的团的布尔掩码}"""
+        bit = 1 << self.names.index(name)
+        return {size: (masks & bit) != 0 for size, masks in self.clique_masks.items()}
+
+    def clique_numbers(self, name):
+        """返回该网络中各大小团的个数 {团大小: 个数}(含大小为2的团，即边数)"""
+        numbers = {2: self.networks[name].number_of_edges()}
+        for size, mask in self._selected(name).items():
+            numbers[size] = int(mask.sum())
+        return numbers
+
+    def hyperedges(self, name, sizes=None):
+        """返回该网络中的团(超边)，每个团为节点标签元组
+
+        参数:
+            name: 网络名称
+            sizes: 团大小列表，None则返回所有大小
+        """
+        labels = self.core.labels
+        result = []
+        for size, mask in self._selected(name).items():
+            if sizes is not None and size not in sizes:
+                continue
+            result.extend(tuple(labels[i] for i in row) for row in self.cliques[size][mask])
+        return result
+
+    def write_hyperedges(self, name, path, sizes=(3, 4, 5)):
+        """按 data/higher-order feature hypergraphs 中的格式("节点 节点 节点,大小")写出超边文件"""
+        with open(path, 'w') as f:
+            for clique in self.hyperedges(name, sizes):
+                f.write(f"{' '.join(map(str, clique))},{len(clique)}\n")
+
+    def counts(self, name):
+        """由位图筛选得到该网络的团计数
+
+        返回:
+            该网络的GraphCore对象(节点顺序与G.nodes()一致)和CliqueCounts对象，
+            与对该网络调用count_cliques的结果一致
+        """
+        G = self.networks[name]
+        core = GraphCore.from_networkx(G)
+        # 网络节点编号到并图节点编号的映射
+        to_union = np.array([self.core.index[label] for label in core.labels], dtype=np.int64)
+        n_union = self.core.number_of_nodes()
+
+        selected = self._selected(name)
+        found = [size for size, mask in selected.items() if mask.any()]
+        top = max(found) if found else 2
+        if self.max_clique is not None:
+            top = max(top, self.max_clique)
+        sizes = list(range(3, top + 1))
+        node_counts = np.zeros((core.number_of_nodes(), len(sizes)), dtype=np.int64)
+        clique_numbers = np.zeros(len(sizes), dtype=np.int64)
+        union_weights = np.ones(self.core.number_of_edges(), dtype=np.int64)
+        for j, size in enumerate(sizes):
+            if size not in selected:
+                continue
+            mask = selected[size]
+            node_counts[:, j] = np.bincount(self.cliques[size][mask].ravel(), minlength=n_union)[to_union]
+            clique_numbers[j] = mask.sum()
+            union_weights += size * np.bincount(self.clique_edges[size][mask].ravel(),
+                                                minlength=self.core.number_of_edges())
+        edge_weights = union_weights[self.core.edge_index(to_union[core.edge_u], to_union[core.edge_v])]
+        return core, CliqueCounts(sizes, node_counts, clique_numbers, edge_weights)
+
+    def features(self, name, base_scores='dc'):
+        """返回该网络的HigherOrderFeatures对象(不重新枚举团)"""
+        core, counts = self.counts(name)
+        base = core.from_dict(compute_base_scores(self.networks[name], base_scores))
+        base_name = base_scores if isinstance(base_scores, str) else 'custom'
+        return HigherOrderFeatures(core, base, counts, base_name)
+
+    def scores(self, name, base_scores='dc', params=None):
+        """返回该网络的CDR和CSR分数字典，同improved_centrality"""
+        features = self.features(name, base_scores)
+        cdr, csr = score_features(features, params)
+        return features.core.to_dict(cdr), features.core.to_dict(csr)
@@ -0,0 +1,423 @@
+import time
+import numpy as np
+from graph_core import CliqueAccumulator, CliqueCounts, count_cliques
+
+# 按预算抽样计数时的最小抽样比例
+MIN_FRACTION = 0.01
+# 按预算计数时分配给预估本身的时间预算比例
+ESTIMATE_FRACTION = 0.2
+
+
+def _root_work(core):
+    """各节点作为根时的工作量代理：前向邻居中的候选三角形(楔形)个数加1"""
+    fwd = np.diff(core.fwd_indptr).astype(float)
+    return fwd * (fwd - 1) / 2 + 1, fwd
+
+
+def _log_comb(n, r):
+    """log C(n, r)，n为数组"""
+    from scipy.special import gammaln
+
+    return gammaln(n + 1) - gammaln(r + 1) - gammaln(n - r + 1)
+
+
+def clique_upper_bounds(core, max_clique=None):
+    """由退化序给出各大小团个数的上界
+
+    以v为根的k团由v与其k-1个前向邻居组成，因此k团个数不超过 sum_v C(fwd_v, k-1)，
+    团大小也不超过退化度加1。
+
+    返回:
+        {团大小: 上界}
+    """
+    _, fwd = _root_work(core)
+    return _root_clique_bounds(fwd, max_clique)
+
+
+def _root_clique_bounds(fwd, max_clique=None, prefix=1):
+    """由prefix个节点组成的一组前缀(各自的公共前向邻居数为fwd)扩展出的各大小团个数的上界之和
+
+    返回:
+        {团大小: 上界}
+    """
+    top = int(fwd.max()) + prefix if len(fwd) else 0
+    if max_clique is not None:
+        top = min(top, max_clique)
+    bounds = {}
+    for size in range(3, top + 1):
+        r = size - prefix
+        valid = fwd >= r
+        with np.errstate(over='ignore'):
+            bounds[size] = float(np.exp(_log_comb(fwd[valid], r)).sum())
+    return bounds
+
+
+def _visit_bounds(fwd, max_clique=None, prefix=1):
+    """由prefix个节点组成的各前缀(公共前向邻居数为fwd)向下枚举时访问前缀个数的上界
+
+    访问的前缀为该前缀加上公共前向邻居的一个子集，其候选集非空且团大小为前缀长度加1，
+    因此访问次数不超过 sum_{j=0}^{J} C(fwd, j)，J = min(fwd - 1, max_clique - prefix - 1)。
+    """
+    limit = fwd - 1 if max_clique is None else np.minimum(fwd - 1, max_clique - prefix - 1)
+    bounds = np.zeros(len(fwd))
+    for j in range(int(limit.max()) + 1 if len(fwd) else 0):
+        valid = limit >= j
+        with np.errstate(over='ignore'):
+            bounds[valid] += np.exp(_log_comb(fwd[valid], j))
+    return bounds
+
+
+def _common_forward(core, v):
+    """根节点v的各前向邻居c与v的公共前向邻居个数 |N+(v)∩N+(c)|"""
+    cand = core.forward_neighbors(v)
+    return np.array([len(np.intersect1d(cand, core.forward_neighbors(c), assume_unique=True))
+                     for c in cand], dtype=float)
+
+
+def _refined_visit_bound(common, max_clique):
+    """由_common_forward的结果给出的根节点访问次数的二层上界"""
+    return (len(common) > 0) + _visit_bounds(common, max_clique, prefix=2).sum()
+
+
+def _extrapolated_bounds(core, roots, max_clique, visits, deadline):
+    """预估超时后对未由样本代表的根节点外推的访问次数和各大小团个数的上界
+
+    在截止时间前按二层上界细化：以v为根、c为第二个节点的团只能从 N+(v)∩N+(c) 中扩展，
+    因此对稀疏网络中前向邻居多但彼此少相连的根节点远比 C(fwd_v, k-1) 紧，
+    对完全图则二者都是精确值；来不及细化的根节点仍使用由退化序给出的一层上界。
+
+    返回:
+        各根节点(与roots对应)的访问次数上界数组，标记其中哪些已细化的布尔数组，{团大小: 团个数上界之和}
+    """
+    fwd = np.diff(core.fwd_indptr)
+    per_root = visits[roots].copy()
+    refined = np.zeros(len(roots), dtype=bool)
+    numbers = {}
+    order = np.argsort(-per_root, kind='stable')
+    for rank, i in enumerate(order):
+        if time.perf_counter() > deadline:
+            break
+        common = _common_forward(core, roots[i])
+        per_root[i] = _refined_visit_bound(common, max_clique)
+        refined[i] = True
+        for size, bound in _root_clique_bounds(common, max_clique, prefix=2).items():
+            numbers[size] = numbers.get(size, 0.0) + bound
+    else:
+        rank = len(order)
+    rest = roots[order[rank:]]
+    for size, bound in _root_clique_bounds(fwd[rest].astype(float), max_clique).items():
+        numbers[size] = numbers.get(size, 0.0) + bound
+    return per_root, refined, numbers
+
+
+def _count_probabilities(work, n_roots):
+    """包含概率 p_v = min(1, c * work_v)，二分求c使期望抽中的根节点个数为n_roots"""
+    lo, hi = 0.0, 1.0 / work.min()
+    for _ in range(100):
+        c = (lo + hi) / 2
+        if np.minimum(1, c * work).sum() < n_roots:
+            lo = c
+        else:
+            hi = c
+    return np.minimum(1, hi * work)
+
+
+class _EstimateTimeout(Exception):
+    """预估超出自身的时间预算"""
+
+
+class _DeadlineAccumulator(CliqueAccumulator):
+    """到达截止时间后在下一次访问前缀时中止枚举的CliqueAccumulator(至少完成一次访问)"""
+
+    def __init__(self, core, max_clique, deadline):
+        super().__init__(core, max_clique)
+        self.deadline = deadline
+
+    def _visit(self, prefix, cand, size):
+        super()._visit(prefix, cand, size)
+        if time.perf_counter() > self.deadline:
+            raise _EstimateTimeout
+
+
+def estimate_clique_cost(core, max_clique=None, n_roots=64, seed=None, time_budget=None):
+    """在正式计数前估计各大小团的个数以及精确枚举的耗时和内存
+
+    按工作量代理成比例地无放回(Poisson抽样)抽取约n_roots个根节点，按访问次数上界
+    从小到大逐个枚举并计时，用Horvitz-Thompson估计量外推到全部节点。
+    预估本身受time_budget限制：超时时中止当前根节点，已枚举的根只代表访问次数上界
+    小于中止处的节点，其余节点的团个数和访问次数取上界(见_extrapolated_bounds)，
+    耗时取访问次数上界乘以被中止的根上实测的单次访问耗时，因此这部分估计偏保守。
+    预估的总耗时不超过约两倍time_budget。
+
+    参数:
+        core: GraphCore对象
+        max_clique: 最大团大小，None则不限制
+        n_roots: 期望抽取的根节点个数
+        seed: 随机种子
+        time_budget: 预估本身的时间预算(秒)，None表示不限
+
+    返回:
+        字典，包含
+            sizes: 团大小列表
+            clique_numbers, clique_numbers_std: 各大小团个数的估计值及其标准差
+            upper_bounds: 各大小团个数的上界
+            degeneracy: 网络的退化度
+            seconds, seconds_std: 精确枚举耗时的估计值及其标准差
+            memory_bytes: 精确计数所需内存的估计值
+            truncated: 预估是否因超时而对部分节点改用上界外推
+    """
+    return _estimate_clique_cost(core, max_clique, n_roots, seed, time_budget)[0]
+
+
+def _estimate_clique_cost(core, max_clique=None, n_roots=64, seed=None, time_budget=None):
+    """estimate_clique_cost的实现，另返回供sample_clique_counts使用的各根节点工作量代理"""
+    start = time.perf_counter()
+    deadline = start + time_budget if time_budget is not None else np.inf
+    rng = np.random.default_rng(seed)
+    work, fwd = _root_work(core)
+    n = core.number_of_nodes()
+    degeneracy = int(core.core_number.max()) if n else 0
+    bounds = _root_clique_bounds(fwd, max_clique)
+    visits = _visit_bounds(fwd, max_clique)
+
+    prob = _count_probabilities(work, min(n_roots, n)) if n else np.zeros(0)
+    selected = np.flatnonzero(rng.random(n) < prob)
+    selected = selected[np.argsort(visits[selected], kind='stable')]
+    accumulator = _DeadlineAccumulator(core, max_clique, deadline)
+    samples_seconds, samples_numbers, samples_visits, done = [], [], [], []
+    stop_bound = heavy_rate = None
+    enumerating = 0.0
+    for v in selected:
+        before = dict(accumulator.numbers)
+        visits_before = accumulator.n_visits
+        root_start = time.perf_counter()
+        try:
+            accumulator.add_root(v)
+        except _EstimateTimeout:
+            elapsed = time.perf_counter() - root_start
+            enumerating += elapsed
+            stop_bound = visits[v]
+            # 被中止的根已深入枚举，其单次访问耗时更能代表上界外推的那部分节点
+            heavy_rate = elapsed / (accumulator.n_visits - visits_before)
+            break
+        elapsed = time.perf_counter() - root_start
+        enumerating += elapsed
+        samples_seconds.append(elapsed)
+        samples_numbers.append({size: number - before.get(size, 0) for size, number in accumulator.numbers.items()})
+        samples_visits.append(accumulator.n_visits - visits_before)
+        done.append(v)
+    if heavy_rate is None:
+        heavy_rate = enumerating / max(accumulator.n_visits, 1)
+
+    # 访问次数上界不小于中止处的节点不由样本代表，按上界外推；细化上界至多再用一份time_budget
+    heavy = np.flatnonzero(visits >= stop_bound) if stop_bound is not None else np.zeros(0, dtype=int)
+    heavy_visits, refined, heavy_bounds = _extrapolated_bounds(core, heavy, max_clique, visits,
+                                                               deadline + (time_budget or 0))
+    # 楔形个数严重低估稠密根节点的工作量，这些根节点在抽样计数时改用细化后的访问次数上界，
+    # 并按已枚举的根上实际访问次数与上界之比校准(完全图上为1；一层上界过于宽松，不用作代理)
+    if refined.any():
+        bound_done = sum(_refined_visit_bound(_common_forward(core, v), max_clique) for v in done)
+        ratio = min(sum(samples_visits) / bound_done, 1.0) if bound_done else 1.0
+        work[heavy[refined]] = np.maximum(work[heavy[refined]], ratio * heavy_visits[refined])
+    found_sizes = {size for sample in samples_numbers for size in sample} | set(heavy_bounds)
+    top = max(found_sizes) if found_sizes else 2
+    if max_clique is not None:
+        top = max(top, max_clique)
+    sizes = list(range(3, top + 1))
+    p = prob[done]
+    numbers = np.array([[sample.get(size, 0) for size in sizes] for sample in samples_numbers]).reshape(-1, len(sizes))
+    seconds = np.array(samples_seconds)
+    # Poisson抽样下总量的估计为 sum y/p，方差估计为 sum (1 - p) / p^2 * y^2
+    weight = 1 / p if len(p) else np.zeros(0)
+    var_weight = (1 - p) * weight ** 2
+    clique_numbers = weight @ numbers + np.array([heavy_bounds.get(size, 0.0) for size in sizes])
+
+    # 计数数组(节点数 x 团大小)在累积和整理时各有一份，另加边权重和图结构本身
+    memory = 2 * n * len(sizes) * 8 + core.number_of_edges() * 8 + core.nbytes()
+    return {'sizes': sizes,
+            'clique_numbers': clique_numbers,
+            'clique_numbers_std': np.sqrt(var_weight @ numbers ** 2),
+            'upper_bounds': bounds, 'degeneracy': degeneracy,
+            'seconds': float(weight @ seconds + heavy_rate * heavy_visits.sum()),
+            'seconds_std': float(np.sqrt(var_weight @ seconds ** 2)),
+            'memory_bytes': int(memory),
+            'truncated': bool(len(heavy))}, work
+
+
+def _inclusion_probabilities(work, fraction):
+    """包含概率 p_v = min(1, c * work_v)，二分求c使期望工作量 sum p_v * work_v 为全部工作量的fraction倍"""
+    target = fraction * work.sum()
+    lo, hi = 0.0, 1.0 / work.min()
+    for _ in range(100):
+        c = (lo + hi) / 2
+        if np.minimum(1, c * work) @ work < target:
+            lo = c
+        else:
+            hi = c
+    return np.minimum(1, hi * work)
+
+
+def sample_clique_counts(core, max_clique=None, fraction=0.1, seed=None, work=None):
+    """抽样根节点得到团计数的无偏估计
+
+    每个根节点以与工作量成比例的概率被独立抽中(Poisson抽样)，被抽中的根上的
+    全部团按概率的倒数加权累积(Horvitz-Thompson估计量)，因此节点计数、团个数
+    和边权重的期望均等于精确值。
+
+    参数:
+        core: GraphCore对象
+        max_clique: 最大团大小，None则不限制
+        fraction: 期望枚举的工作量占全部工作量的比例
+        seed: 随机种子
+        work: 各根节点的工作量代理，None则使用前向邻居中的楔形个数
+
+    返回:
+        CliqueCounts对象，数组为浮点数，variance为各大小团个数估计量的方差
+    """
+    rng = np.random.default_rng(seed)
+    if work is None:
+        work, _ = _root_work(core)
+    if not len(work):
+        return count_cliques(core, max_clique)
+    prob = _inclusion_probabilities(work, min(fraction, 1.0))
+    selected = np.flatnonzero(rng.random(len(prob)) < prob)
+
+    accumulator = CliqueAccumulator(core, max_clique, dtype=float)
+    variance = {}
+    for v in selected:
+        before = dict(accumulator.numbers)
+        accumulator.add_root(v, weight=1.0 / prob[v])
+        # 根v的加权贡献为y/p，Poisson抽样下方差估计为 sum (1 - p) / p^2 * y^2
+        for size, number in accumulator.numbers.items():
+            contribution = number - before.get(size, 0)
+            variance[size] = variance.get(size, 0.0) + (1 - prob[v]) * contribution ** 2
+    return accumulator.result(variance)
+
+
+def budgeted_clique_counts(core, max_clique=None, time_budget=None, memory_budget=None, seed=None,
+                           verbose=False):
+    """在时间和内存预算内统计团
+
+    先用estimate_clique_cost做预估(预估本身至多使用时间预算的ESTIMATE_FRACTION)：
+    精确计数满足预算时直接精确计数；
+    内存超出预算时降低最大团大小；耗时超出预算时改用sample_clique_counts，
+    抽样比例按剩余预算(扣除预估本身的耗时)与预估耗时之比确定。
+
+    参数:
+        core: GraphCore对象
+        max_clique: 最大团大小，None则不限制
+        time_budget: 时间预算(秒)，None表示不限
+        memory_budget: 内存预算(字节)，None表示不限
+        seed: 随机种子
+        verbose: 是否输出预估结果和所选的计数方式
+
+    返回:
+        CliqueCounts对象，以及包含 mode('exact'或'sampled')、fraction、max_clique、estimate、
+        estimate_seconds(预估本身的耗时) 的字典
+    """
+    start = time.perf_counter()
+    estimate_budget = None if time_budget is None else ESTIMATE_FRACTION * time_budget
+    estimate, work = _estimate_clique_cost(core, max_clique, seed=seed, time_budget=estimate_budget)
+    report = {'mode': 'exact', 'fraction': 1.0, 'max_clique': max_clique, 'estimate': estimate}
+
+    if memory_budget is not None and estimate['memory_bytes'] > memory_budget:
+        fixed = core.number_of_edges() * 8 + core.nbytes()
+        per_size = 2 * core.number_of_nodes() * 8
+        report['max_clique'] = max_clique = max(3, 2 + int((memory_budget - fixed) // max(per_size, 1)))
+        if estimate_budget is not None:
+            estimate_budget = max(estimate_budget - (time.perf_counter() - start), 0.0)
+        estimate, work = _estimate_clique_cost(core, max_clique, seed=seed, time_budget=estimate_budget)
+        report['estimate'] = estimate
+    report['estimate_seconds'] = time.perf_counter() - start
+
+    if verbose:
+        print(f"Estimated exact counting: {estimate['seconds']:.1f}s "
+              f"(std {estimate['seconds_std']:.1f}s), {estimate['memory_bytes'] / 2 ** 20:.1f} MB, "
+              f"max clique size ~{estimate['sizes'][-1] if estimate['sizes'] else 2}")
+
+    remaining = None if time_budget is None else time_budget - report['estimate_seconds']
+    if remaining is not None and estimate['seconds'] > remaining:
+        # 留出余量，抵消预估误差和抽样本身的开销；预算已被预估用尽时仍至少抽取MIN_FRACTION
+        report['mode'] = 'sampled'
+        report['fraction'] = max(0.8 * remaining / estimate['seconds'], MIN_FRACTION)
+        # 抽样按预估所用的同一代价模型分配概率(见_estimate_clique_cost)
+        counts = sample_clique_counts(core, max_clique, report['fraction'], seed, work)
+    else:
+        counts = count_cliques(core, max_clique)
+    if verbose:
+        print(f"Clique counts: {report['mode']} (fraction {report['fraction']:.3f}, "
+              f"max_clique {report['max_clique']})")
+    return counts, report
+
+
+def approximate_clique_counts(core, max_clique=None, sample_rate=0.1, n_replicates=10, confidence=0.95,
+                              seed=None):
+    """基于边抽样的近似团计数，给出每个节点各大小团参与次数的估计及置信区间
+
+    每个团只在其退化序最小的两个节点构成的前向边处被枚举一次。前向边的抽样概率与
+    工作量代理(两端前向度数的较小值)成比例，使期望工作量为全部的sample_rate倍；
+    概率达到1的重边只精确枚举一次，其余边在每个重复中以该概率的1/n_replicates
+    被独立抽取并按概率的倒数加权，得到无偏估计。最终估计为各重复的均值，置信区间
+    由重复间的t分布给出。各重复的结果逐个合并(Welford算法)，额外内存与节点数成正比。
+
+    参数:
+        core: GraphCore对象
+        max_clique: 最大团大小，None则不限制
+        sample_rate: 期望枚举的工作量占全部工作量的比例
+        n_replicates: 独立重复次数(至少为2)
+        confidence: 置信水平
+        seed: 随机种子
+
+    返回:
+        CliqueCounts对象，数组为浮点数；variance为各大小团个数估计量的方差，
+        node_ci为节点计数置信区间的(下界, 上界)数组
+    """
+    # t分布分位数用scipy.special计算，scipy.stats的导入会多占约50 MB内存
+    from scipy.special import stdtrit
+
+    rng = np.random.default_rng(seed)
+    n_replicates = max(n_replicates, 2)
+    fwd = np.diff(core.fwd_indptr)
+    rows = np.repeat(np.arange(core.number_of_nodes()), fwd)
+    cols = core.fwd_indices
+    work = np.minimum(fwd[rows], fwd[cols]).astype(float) + 1
+    prob = _inclusion_probabilities(work, min(sample_rate, 1.0)) if len(work) else work
+
+    # 必然被抽中的边只精确枚举一次，作为各重复共同的确定部分
+    exact = CliqueAccumulator(core, max_clique, dtype=float)
+    for i in np.flatnonzero(prob >= 1):
+        exact.add_edge(rows[i], cols[i])
+    fixed = exact.result()
+    sampled = np.flatnonzero(prob < 1)
+    rate = prob[sampled] / n_replicates
+
+    mean = m2 = None
+    numbers, edge_weights = [], np.zeros(core.number_of_edges())
+    for r in range(n_replicates):
+        accumulator = CliqueAccumulator(core, max_clique, dtype=float)
+        hit = rng.random(len(sampled)) < rate
+        for i, p in zip(sampled[hit], rate[hit]):
+            accumulator.add_edge(rows[i], cols[i], weight=1.0 / p)
+        counts = accumulator.result()
+        if mean is None:
+            mean, m2 = np.zeros_like(counts.node_counts), np.zeros_like(counts.node_counts)
+        # 不同重复找到的最大团大小可能不同，按较大者补零对齐
+        width = max(mean.shape[1], counts.node_counts.shape[1])
+        mean, m2, x = (np.pad(a, ((0, 0), (0, width - a.shape[1]))) for a in (mean, m2, counts.node_counts))
+        delta = x - mean
+        mean += delta / (r + 1)
+        m2 += delta * (x - mean)
+        numbers.append(counts.clique_numbers)
+        edge_weights += (counts.edge_weights - 1) / n_replicates
+
+    width = max(mean.shape[1], fixed.node_counts.shape[1])
+    sizes = list(range(3, 3 + width))
+    mean, m2, base = (np.pad(a, ((0, 0), (0, width - a.shape[1]))) for a in (mean, m2, fixed.node_counts))
+    numbers = np.array([np.pad(x, (0, width - len(x))) for x in numbers])
+    stderr = np.sqrt(m2 / (n_replicates - 1) / n_replicates)
+    half_width = stdtrit(n_replicates - 1, (1 + confidence) / 2) * stderr
+    node_counts = base + mean
+    node_ci = (np.maximum(node_counts - half_width, base), node_counts + half_width)
+    clique_numbers = np.pad(fixed.clique_numbers, (0, width - len(fixed.clique_numbers))) + numbers.mean(axis=0)
+    return CliqueCounts(sizes, node_counts, clique_numbers, fixed.edge_weights + edge_weights,
+                        variance=numbers.var(axis=0, ddof=1) / n_replicates, node_ci=node_ci)
@@ -0,0 +1,197 @@
+import copy
+from itertools import combinations
+import networkx as nx
+import numpy as np
+from graph_core import GraphCore, CliqueCounts, count_cliques
+from centrality_improvement import HigherOrderFeatures, combine_scores, compute_base_scores, score_features
+
+
+class DynamicCliqueIndex:
+    """支持增删边的团计数索引
+
+    包含边(u, v)的团恰好是 {u, v} 与u、v公共邻居中任一团的并，因此增删一条边时
+    只需枚举公共邻居诱导子图中的团，并相应增减节点的团参与次数、高阶加权网络
+    G_prime的边权重和节点强度。CDR/CSR在需要时由维护的计数直接得到，
+    与对编辑后的网络重新调用improved_centrality的结果一致。
+
+    属性:
+        G: 当前网络(networkx图对象)
+        labels: 节点标签列表，index: 标签到编号的字典(新节点追加在末尾)
+        node_counts: 节点参与各大小团次数的矩阵 (节点数 x 列数)，第j列对应大小为j+3的团
+        edge_weights: {(i, j): 权重} 字典(i < j)，权重等于1加上包含该边的所有团的大小之和
+        strength: 各节点在G_prime中的强度(不含自环)
+        self_loops: 各节点的自环个数
+        degree: 各节点的度数(自环计2，与networkx一致)
+    """
+
+    def __init__(self, G, base_scores='dc', max_clique=None):
+        self.G = G.copy()
+        self.base_scores = base_scores
+        self.max_clique = max_clique
+        core = GraphCore.from_networkx(self.G)
+        counts = count_cliques(core, max_clique)
+        self.labels = list(core.labels)
+        self.index = dict(core.index)
+        self.node_counts = counts.node_counts.copy()
+        self.edge_weights = dict(zip(zip(core.edge_u.tolist(), core.edge_v.tolist()),
+                                     counts.edge_weights.tolist()))
+        self.strength = np.bincount(core.indices, weights=counts.edge_weights[core.edge_ids],
+                                    minlength=core.number_of_nodes())
+        self.self_loops = core.self_loops.astype(np.int64)
+        self.degree = core.degree() + 2 * self.self_loops
+        self._features = None
+        self._base = None
+
+    def copy(self):
+        """返回独立的副本，之后对副本的增删不影响原索引"""
+        other = copy.copy(self)
+        other.G = self.G.copy()
+        other.labels = list(self.labels)
+        other.index = dict(self.index)
+        other.node_counts = self.node_counts.copy()
+        other.edge_weights = dict(self.edge_weights)
+        other.strength = self.strength.copy()
+        other.self_loops = self.self_loops.copy()
+        other.degree = self.degree.copy()
+        return other
+
+    def _node(self, label):
+        """返回节点编号，新节点追加到各数组末尾"""
+        if label not in self.index:
+            self.index[label] = len(self.labels)
+            self.labels.append(label)
+            self.node_counts = np.vstack([self.node_counts, np.zeros((1, self.node_counts.shape[1]),
+                                                                     dtype=self.node_counts.dtype)])
+            self.strength = np.append(self.strength, 0.0)
+            self.self_loops = np.append(self.self_loops, 0)
+            self.degree = np.append(self.degree, 0)
+        return self.index[label]
+
+    def _update_cliques(self, u, v, sign):
+        """对包含边(u, v)的所有团，按sign增减计数与权重
+
+        返回:
+            边(u, v)在编号下的键，以及这些团的大小之和(即该边权重中高阶部分)
+        """
+        iu, iv = self.index[u], self.index[v]
+        common = list(nx.common_neighbors(self.G, u, v)) if self.G.has_node(u) and self.G.has_node(v) else []
+        common = [w for w in common if w != u and w != v]
+        key = (min(iu, iv), max(iu, iv))
+        total = 0
+        for clique in nx.enumerate_all_cliques(self.G.subgraph(common)):
+            size = len(clique) + 2
+            if self.max_clique is not None and size > self.max_clique:
+                break
+            if size - 2 > self.node_counts.shape[1]:
+                self.node_counts = np.pad(self.node_counts, ((0, 0), (0, size - 2 - self.node_counts.shape[1])))
+            total += size
+            members = sorted([iu, iv] + [self.index[w] for w in clique])
+            self.node_counts[members, size - 3] += sign
+            # 每个成员关联团内size-1条边，每条边的权重变化size
+            self.strength[members] += sign * size * (size - 1)
+            for pair in combinations(members, 2):
+                if pair != key:
+                    self.edge_weights[pair] += sign * size
+        return key, total
+
+    def add_edge(self, u, v):
+        """添加边(u, v)，节点不存在时自动添加"""
+        iu, iv = self._node(u), self._node(v)
+        if self.G.has_edge(u, v):
+            return
+        self._features = self._base = None
+        if u == v:
+            self.G.add_edge(u, v)
+            self.self_loops[iu] += 1
+            self.degree[iu] += 2
+            return
+        key, total = self._update_cliques(u, v, 1)
+        # 新边的权重为1加上包含它的团的大小之和，_update_cliques已把后者计入强度
+        self.edge_weights[key] = 1 + total
+        self.strength[[iu, iv]] += 1
+        self.degree[[iu, iv]] += 1
+        self.G.add_edge(u, v)
+
+    def remove_edge(self, u, v):
+        """删除边(u, v)，节点保留"""
+        if not self.G.has_edge(u, v):
+            raise nx.NetworkXError(f"The edge {u}-{v} is not in the graph.")
+        self._features = self._base = None
+        self.G.remove_edge(u, v)
+        iu, iv = self.index[u], self.index[v]
+        if u == v:
+            self.self_loops[iu] -= 1
+            self.degree[iu] -= 2
+            return
+        key, _ = self._update_cliques(u, v, -1)
+        self.strength[[iu, iv]] -= 1
+        self.degree[[iu, iv]] -= 1
+        del self.edge_weights[key]
+
+    def sizes(self):
+        """当前的团大小列表，与count_cliques的约定一致"""
+        nonzero = np.flatnonzero(self.node_counts.any(axis=0))
+        top = int(nonzero[-1]) + 3 if len(nonzero) else 2
+        if self.max_clique is not None:
+            top = max(top, self.max_clique)
+        return list(range(3, top + 1))
+
+    def features(self):
+        """由维护的计数构建当前网络的HigherOrderFeatures(不重新枚举团)"""
+        if self._features is not None:
+            return self._features
+        pairs = sorted(self.edge_weights)
+        edge_u = np.array([p[0] for p in pairs], dtype=np.int32)
+        edge_v = np.array([p[1] for p in pairs], dtype=np.int32)
+        core = GraphCore(self.labels, edge_u, edge_v, self.self_loops)
+        sizes, node_counts = self._node_counts()
+        clique_numbers = node_counts.sum(axis=0) // np.array(sizes, dtype=np.int64)
+        # GraphCore的边编号按(较小编号, 较大编号)排序，与pairs的顺序一致
+        weights = np.array([self.edge_weights[p] for p in pairs], dtype=np.int64)
+        counts = CliqueCounts(sizes, node_counts, clique_numbers, weights)
+        base_name = self.base_scores if isinstance(self.base_scores, str) else 'custom'
+        self._features = HigherOrderFeatures(core, self._base_array(), counts, base_name)
+        return self._features
+
+    def _node_counts(self):
+        """按sizes()补齐或截断列数的节点团参与次数矩阵"""
+        sizes = self.sizes()
+        node_counts = np.zeros((len(self.labels), len(sizes)), dtype=self.node_counts.dtype)
+        width = min(len(sizes), self.node_counts.shape[1])
+        node_counts[:, :width] = self.node_counts[:, :width]
+        return sizes, node_counts
+
+    def _base_array(self):
+        """按节点编号排列的基础中心性得分，'dc'由维护的度数直接得到，其余类型由当前网络计算"""
+        if self._base is None:
+            n = len(self.labels)
+            if self.base_scores == 'dc':
+                # 同nx.degree_centrality
+                self._base = self.degree / (n - 1) if n > 1 else np.ones(n)
+            else:
+                scores = compute_base_scores(self.G, self.base_scores)
+                self._base = np.array([scores.get(label, 0.0) for label in self.labels], dtype=float)
+        return self._base
+
+    def score_arrays(self, params=None):
+        """由维护的计数直接计算当前网络的CDR和CSR得分数组(按节点编号排列)
+
+        结果与score_features(self.features(), params)一致，但不重建GraphCore和边数组，
+        基础中心性为'dc'时也不重新计算，适合每次改动后只需打分的场景(如扰动重复)。
+        """
+        sizes, node_counts = self._node_counts()
+        totals = node_counts.sum(axis=0)
+        count_ratios = node_counts / np.where(totals == 0, 1e-10, totals)
+        motif_strength = self.strength + 2 * self.self_loops
+        if params is None:
+            params = {f'lambda_{size}': 1.0 for size in sizes}
+        lambdas = np.array([params.get(f'lambda_{size}', 0) for size in sizes], dtype=float)
+        return combine_scores(self._base_array(), self.degree / (self.degree.sum() + 1e-10),
+                              motif_strength / (motif_strength.sum() + 1e-10), count_ratios, lambdas,
+                              params.get('theta', 1.0))
+
+    def scores(self, params=None):
+        """返回当前网络的CDR和CSR分数字典，同improved_centrality"""
+        features = self.features()
+        cdr, csr = score_features(features, params)
+        return features.core.to_dict(cdr), features.core.to_dict(csr)
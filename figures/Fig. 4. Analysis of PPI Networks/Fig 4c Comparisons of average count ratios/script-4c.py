@@ -5,7 +5,12 @@ import csv
 import matplotlib.pyplot as plt
 from pathlib import Path
 import networkx as nx
+import sys
 import os
+python_code_path = str(Path(__file__).parent.parent.parent.parent)
+if python_code_path not in sys.path:
+    sys.path.append(python_code_path)
+from graph_core import GraphCore, count_cliques
 
 # 设置工作路径为当前文件所在的目录
 current_file_dir = os.path.dirname(os.path.abspath(__file__))
@@ -41,52 +46,15 @@ def compute_motif_participation(G, key_nodes, non_key_nodes=None, motifs=[3,4,5]
         # 确保非关键节点不包含任何关键节点
         non_key_set = (set(non_key_nodes) & all_nodes) - key_set
     
-    # 初始化计数结构
+    # 只统计关注节点诱导子图中的团，在整数索引的CSR结构上计数
+    core = GraphCore.from_networkx(G.subgraph(key_set | non_key_set))
+    counts = count_cliques(core, max_k)
+    column = {size: j for j, size in enumerate(counts.sizes)}
     counters = {
-        node: {k:0 for k in all_motifs} 
-        for node in key_set | non_key_set  # 只为关注的节点初始化计数器
+        node: {k: int(counts.node_counts[i, column[k]]) if k in column else 0 for k in all_motifs}
+        for i, node in enumerate(core.labels)
     }
 
-    # 分层处理clique
-    prev_cliques = []
-    for k in range(3, max_k+1):
-        current_cliques = []
-        
-        if k == 3:
-            # 优化3-clique生成
-            for u in G:
-                if u not in counters:  # 跳过不关注的节点
-                    continue
-                    
-                neighbors = sorted([v for v in G[u] if v > u and v in counters])
-                for i, v in enumerate(neighbors):
-                    common = set(neighbors[i+1:]) & set(G[v])
-                    for w in common:
-                        if w > v and w in counters:
-                            clique = (u, v, w)
-                            current_cliques.append(clique)
-                            if 3 in all_motifs:
-                                for node in clique:
-                                    counters[node][3] += 1
-        else:
-            # 流式处理大尺寸clique
-            for clique in prev_cliques:
-                last_node = clique[-1]
-                common_neighbors = set(G[clique[0]])
-                for node in clique[1:]:
-                    common_neighbors &= set(G[node])
-                
-                for neighbor in common_neighbors:
-                    if neighbor > last_node and neighbor in counters:
-                        new_clique = (*clique, neighbor)
-                        current_cliques.append(new_clique)
-                        if k in all_motifs:
-                            for node in new_clique:
-                                counters[node][k] += 1
-        
-        # 仅保留必要数据
-        prev_cliques = current_cliques if k+1 <= max_k else []
-    
     # 分类统计结果
     key_counts = {
         node: {k: counters[node][k] for k in all_motifs} 
@@ -0,0 +1,111 @@
+import numpy as np
+from scipy.optimize import minimize
+
+
+def _log_terms(features, rank_type, eps=1e-12):
+    """计算得分对数中与参数无关的部分
+
+    CDR/CSR得分为 base * norm^theta * (1 + sum_k lambda_k * r_k) / Z，
+    归一化常数Z不影响排序，因此取对数后为
+    log(base) + theta * log(norm) + log(1 + r @ lambda)。
+    """
+    norm = features.norm_strength if rank_type == 'csr' else features.norm_degree
+    return np.log(np.maximum(features.base, eps)), np.log(np.maximum(norm, eps))
+
+
+def _sample_pairs(y_true, max_pairs, rng):
+    """生成(关键节点, 非关键节点)样本对的下标，数量超过max_pairs时随机抽样"""
+    pos = np.flatnonzero(y_true == 1)
+    neg = np.flatnonzero(y_true == 0)
+    if len(pos) * len(neg) <= max_pairs:
+        p, q = np.meshgrid(pos, neg, indexing='ij')
+        return p.ravel(), q.ravel()
+    return rng.choice(pos, size=max_pairs), rng.choice(neg, size=max_pairs)
+
+
+def surrogate_objective(x, log_base, log_norm, ratios, pairs, temperature=1.0):
+    """可微的排序代理损失及其解析梯度
+
+    对每个(关键节点p, 非关键节点q)样本对，用logistic函数松弛指示函数
+    1[s_p > s_q]，损失为 mean(softplus(-(f_p - f_q) / temperature))，
+    其中f为得分的对数，最小化该损失即最大化AUC的平滑下界。
+
+    参数:
+        x: 参数向量 [theta, lambda_3, ..., lambda_K]
+        log_base, log_norm: 参与评估节点的log(base)与log(norm)
+        ratios: 参与评估节点的团参与比例矩阵
+        pairs: (p, q) 样本对下标
+        temperature: logistic松弛的温度
+
+    返回:
+        损失值与梯度
+    """
+    theta, lambdas = x[0], x[1:]
+    correction = 1 + ratios @ lambdas
+    f = log_base + theta * log_norm + np.log(correction)
+    p, q = pairs
+    diff = (f[p] - f[q]) / temperature
+    loss = np.mean(np.logaddexp(0, -diff))
+
+    # d loss / d f_p = -sigmoid(-diff) / (temperature * n_pairs)，对f_q取相反数
+    w = -0.5 * (1 - np.tanh(diff / 2)) / (temperature * len(p))
+    n = len(f)
+    node_w = np.bincount(p, weights=w, minlength=n) - np.bincount(q, weights=w, minlength=n)
+    grad = np.empty_like(x)
+    grad[0] = node_w @ log_norm
+    grad[1:] = (node_w / correction) @ ratios
+    return loss, grad
+
+
+def fit_gradient(features, idx, y_true, rank_type='csr', evaluate=None, n_restarts=10,
+                 max_pairs=2000000, temperature=1.0, seed=None, verbose=True, initial=None,
+                 fixed=None):
+    """使用L-BFGS-B在[0, 1]边界内最大化排序代理指标
+
+    参数:
+        features: HigherOrderFeatures对象
+        idx: 参与评估的节点编号数组
+        y_true: 对应的标签数组
+        rank_type: 排名类型，可选 'csr'(默认) 或 'cdr'
+        evaluate: 函数 evaluate(params) -> 真实评估指标，用于在多次重启中选出最佳结果，
+                  None则按代理损失选择
+        n_restarts: 重启次数(没有initial时第一次从全1参数出发，其余为随机起点)
+        max_pairs: 样本对数量上限，超过时随机抽样
+        temperature: logistic松弛的温度
+        seed: 随机种子
+        verbose: 是否输出每次重启的结果
+        initial: 初始参数字典列表(如参数库给出的热启动参数)，依次作为前几次重启的起点
+        fixed: 固定取值的参数字典，这些参数的上下界都设为该取值
+
+    返回:
+        最佳参数字典、最佳得分以及所有目标函数调用次数
+    """
+    rng = np.random.default_rng(seed)
+    log_base, log_norm = _log_terms(features, rank_type)
+    log_base, log_norm = log_base[idx], log_norm[idx]
+    ratios = features.count_ratios[idx]
+    pairs = _sample_pairs(np.asarray(y_true), max_pairs, rng)
+    names = ['theta'] + [f'lambda_{size}' for size in features.sizes]
+    fixed = fixed or {}
+    bounds = [(fixed[name], fixed[name]) if name in fixed else (0.0, 1.0) for name in names]
+
+    starts = [np.array([p.get(name, 1.0) for name in names]) for p in (initial or [])]
+    if not starts:
+        starts.append(np.ones(len(names)))
+    lower, upper = np.array(bounds).T
+
+    best_params, best_value, n_evals = None, -np.inf, 0
+    for restart in range(max(n_restarts, len(starts))):
+        x0 = starts[restart] if restart < len(starts) else rng.uniform(0, 1, len(names))
+        x0 = np.clip(x0, lower, upper)
+        result = minimize(surrogate_objective, x0, jac=True, method='L-BFGS-B', bounds=bounds,
+                          args=(log_base, log_norm, ratios, pairs, temperature))
+        n_evals += result.nfev
+        params = {name: float(value) for name, value in zip(names, result.x)}
+        value = evaluate(params) if evaluate is not None else -float(result.fun)
+        if verbose:
+            print(f"Restart {restart} finished with value: {value} and parameters: {params} "
+                  f"(surrogate loss: {result.fun:.6f}, evaluations: {result.nfev})")
+        if value > best_value:
+            best_params, best_value = params, value
+    return best_params, best_value, n_evals
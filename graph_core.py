@@ -0,0 +1,430 @@
+import numpy as np
+import networkx as nx
+import profiling
+
+
+class GraphCore:
+    """整数索引的CSR图结构
+
+    节点标签按G.nodes()的顺序映射为int32编号，邻接关系保存为按编号排序的
+    CSR数组(indptr/indices)，并预先计算退化序(degeneracy order)及其对应的
+    前向邻接表，供团枚举与计数使用。自环不参与团的计算，仅单独记录个数。
+
+    属性:
+        labels: 节点标签列表，labels[i]为编号i对应的标签
+        index: 标签到编号的字典
+        indptr, indices: 无向图的CSR邻接数组(每行升序)
+        edge_ids: 与indices等长，CSR位置对应的无向边编号
+        edge_u, edge_v: 无向边编号对应的两个端点(edge_u < edge_v)
+        self_loops: 每个节点的自环个数
+        order: 退化序，core_number: 每个节点的核数，rank: 节点在退化序中的位置
+        fwd_indptr, fwd_indices: 按退化序定向后的前向邻接CSR(每行升序)
+    """
+
+    def __init__(self, labels, edge_u, edge_v, self_loops=None):
+        self.labels = list(labels)
+        self.index = {label: i for i, label in enumerate(self.labels)}
+        n = len(self.labels)
+        edge_u = np.asarray(edge_u, dtype=np.int32)
+        edge_v = np.asarray(edge_v, dtype=np.int32)
+        lo = np.minimum(edge_u, edge_v)
+        hi = np.maximum(edge_u, edge_v)
+        # 去重并按(lo, hi)排序，得到无向边编号
+        keys = np.unique(lo.astype(np.int64) * max(n, 1) + hi)
+        self.edge_u = (keys // max(n, 1)).astype(np.int32)
+        self.edge_v = (keys % max(n, 1)).astype(np.int32)
+        m = len(keys)
+
+        # 双向展开后构建CSR
+        src = np.concatenate([self.edge_u, self.edge_v])
+        dst = np.concatenate([self.edge_v, self.edge_u])
+        eid = np.concatenate([np.arange(m), np.arange(m)]).astype(np.int32)
+        perm = np.lexsort((dst, src))
+        self.indices = dst[perm]
+        self.edge_ids = eid[perm]
+        self.indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=n), out=self.indptr[1:])
+
+        if self_loops is None:
+            self_loops = np.zeros(n, dtype=np.int32)
+        self.self_loops = np.asarray(self_loops, dtype=np.int32)
+
+        self.order, self.core_number = degeneracy_ordering(self.indptr, self.indices)
+        self.rank = np.empty(n, dtype=np.int32)
+        self.rank[self.order] = np.arange(n, dtype=np.int32)
+
+        # 按退化序定向：仅保留rank更大的邻居
+        rows = np.repeat(np.arange(n, dtype=np.int32), np.diff(self.indptr))
+        forward = self.rank[self.indices] > self.rank[rows]
+        self.fwd_indices = self.indices[forward]
+        self.fwd_indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows[forward], minlength=n), out=self.fwd_indptr[1:])
+
+    @classmethod
+    def from_networkx(cls, G):
+        """由networkx图构建GraphCore
+
+        参数:
+            G: 网络图对象
+
+        返回:
+            GraphCore对象，节点编号与G.nodes()的顺序一致
+        """
+        labels = list(G.nodes())
+        index = {label: i for i, label in enumerate(labels)}
+        self_loops = np.zeros(len(labels), dtype=np.int32)
+        edge_u, edge_v = [], []
+        for u, v in G.edges():
+            if u == v:
+                self_loops[index[u]] += 1
+                continue
+            edge_u.append(index[u])
+            edge_v.append(index[v])
+        return cls(labels, edge_u, edge_v, self_loops)
+
+    @classmethod
+    def from_edges(cls, edges, nodes=None):
+        """由边列表构建GraphCore
+
+        参数:
+            edges: 边列表 [(u, v), ...]
+            nodes: 额外的节点列表(可包含孤立节点)，None则仅使用边中出现的节点
+
+        返回:
+            GraphCore对象
+        """
+        G = nx.Graph()
+        if nodes is not None:
+            G.add_nodes_from(nodes)
+        G.add_edges_from(edges)
+        return cls.from_networkx(G)
+
+    def number_of_nodes(self):
+        return len(self.labels)
+
+    def number_of_edges(self):
+        return len(self.edge_u)
+
+    def degree(self):
+        """返回每个节点的度数(不含自环)"""
+        return np.diff(self.indptr)
+
+    def neighbors(self, i):
+        """返回编号为i的节点的邻居编号数组(升序)"""
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+    def forward_neighbors(self, i):
+        """返回编号为i的节点在退化序下的前向邻居编号数组(升序)"""
+        return self.fwd_indices[self.fwd_indptr[i]:self.fwd_indptr[i + 1]]
+
+    def edge_lookup(self, i, targets):
+        """查询节点i与targets中各节点之间的无向边编号
+
+        参数:
+            i: 节点编号
+            targets: 与i相邻的节点编号数组(升序)
+
+        返回:
+            无向边编号数组
+        """
+        start = self.indptr[i]
+        row = self.indices[start:self.indptr[i + 1]]
+        return self.edge_ids[start + np.searchsorted(row, targets)]
+
+    def edge_index(self, u, v):
+        """批量查询节点对(u[i], v[i])之间的无向边编号，不相邻的节点对返回-1
+
+        参数:
+            u, v: 节点编号数组
+
+        返回:
+            无向边编号数组
+        """
+        n = max(self.number_of_nodes(), 1)
+        u = np.asarray(u, dtype=np.int64)
+        v = np.asarray(v, dtype=np.int64)
+        keys = self.edge_u.astype(np.int64) * n + self.edge_v
+        query = np.minimum(u, v) * n + np.maximum(u, v)
+        pos = np.searchsorted(keys, query)
+        pos = np.minimum(pos, max(len(keys) - 1, 0))
+        found = (keys[pos] == query) if len(keys) else np.zeros(len(query), dtype=bool)
+        return np.where(found, pos, -1)
+
+    def nbytes(self):
+        """返回CSR相关数组占用的字节数"""
+        arrays = [self.indptr, self.indices, self.edge_ids, self.edge_u, self.edge_v,
+                  self.self_loops, self.order, self.core_number, self.rank,
+                  self.fwd_indptr, self.fwd_indices]
+        return sum(a.nbytes for a in arrays)
+
+    def to_networkx(self):
+        """转换回networkx图对象"""
+        G = nx.Graph()
+        G.add_nodes_from(self.labels)
+        G.add_edges_from(zip((self.labels[u] for u in self.edge_u),
+                             (self.labels[v] for v in self.edge_v)))
+        for i in np.flatnonzero(self.self_loops):
+            G.add_edge(self.labels[i], self.labels[i])
+        return G
+
+    def to_dict(self, values):
+        """将按节点编号排列的数组转换为 {标签: 值} 字典"""
+        return {label: float(values[i]) for i, label in enumerate(self.labels)}
+
+    def from_dict(self, scores, default=0.0):
+        """将 {标签: 值} 字典转换为按节点编号排列的数组"""
+        return np.array([scores.get(label, default) for label in self.labels], dtype=float)
+
+
+def degeneracy_ordering(indptr, indices):
+    """计算退化序与核数(Batagelj-Zaversnik桶算法)
+
+    参数:
+        indptr, indices: 无向图的CSR邻接数组
+
+    返回:
+        order: 按删除先后排列的节点编号数组
+        core: 每个节点的核数
+    """
+    n = len(indptr) - 1
+    degree = np.diff(indptr).astype(np.int64)
+    if n == 0:
+        return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32)
+    max_degree = int(degree.max())
+    # 按度数对节点做桶排序
+    bin_start = np.zeros(max_degree + 2, dtype=np.int64)
+    np.cumsum(np.bincount(degree, minlength=max_degree + 1), out=bin_start[1:])
+    vert = np.argsort(degree, kind='stable').astype(np.int64)
+    pos = np.empty(n, dtype=np.int64)
+    pos[vert] = np.arange(n)
+
+    deg = degree.tolist()
+    vert = vert.tolist()
+    pos = pos.tolist()
+    bins = bin_start[:-1].tolist()
+    indptr_list = indptr.tolist()
+    indices_list = indices.tolist()
+    for i in range(n):
+        v = vert[i]
+        for j in range(indptr_list[v], indptr_list[v + 1]):
+            u = indices_list[j]
+            if deg[u] > deg[v]:
+                du = deg[u]
+                pu = pos[u]
+                pw = bins[du]
+                w = vert[pw]
+                if u != w:
+                    vert[pu], vert[pw] = w, u
+                    pos[u], pos[w] = pw, pu
+                bins[du] += 1
+                deg[u] -= 1
+    return np.array(vert, dtype=np.int32), np.array(deg, dtype=np.int32)
+
+
+def _extend_cliques(core, prefix, cand, max_clique, visit):
+    """在前缀prefix的公共前向邻居cand中递归扩展团
+
+    每一层把prefix与cand中任一节点组成的团批量交给visit处理，
+    从而避免逐个展开叶子层的团。
+    """
+    size = len(prefix) + 1
+    visit(prefix, cand, size)
+    if max_clique is not None and size >= max_clique:
+        return
+    for c in cand:
+        nxt = np.intersect1d(cand, core.forward_neighbors(c), assume_unique=True)
+        if len(nxt):
+            _extend_cliques(core, prefix + [int(c)], nxt, max_clique, visit)
+
+
+def iter_cliques(core, max_clique=None, min_size=3):
+    """逐个枚举网络中的团(每个团只出现一次)
+
+    参数:
+        core: GraphCore对象
+        max_clique: 最大团大小，None则不限制
+        min_size: 最小团大小，默认为3
+
+    返回:
+        生成器，每次给出一个由节点编号组成的元组
+    """
+    stack = []
+
+    def visit(prefix, cand, size):
+        profiling.check_memory(size)
+        if size >= min_size:
+            stack.append((tuple(prefix), cand))
+
+    for v in core.order:
+        cand = core.forward_neighbors(v)
+        if not len(cand):
+            continue
+        _extend_cliques(core, [int(v)], cand, max_clique, visit)
+        for prefix, members in stack:
+            for c in members:
+                yield prefix + (int(c),)
+        stack.clear()
+
+
+def clique_arrays(core, max_clique=None, min_size=3):
+    """按大小批量枚举网络中的全部团
+
+    参数:
+        core: GraphCore对象
+        max_clique: 最大团大小，None则不限制
+        min_size: 最小团大小，默认为3
+
+    返回:
+        {团大小: 形状为(团个数, 团大小)的节点编号数组}
+    """
+    blocks = {}
+
+    def visit(prefix, cand, size):
+        profiling.check_memory(size)
+        if size >= min_size:
+            block = np.empty((len(cand), size), dtype=np.int32)
+            block[:, :-1] = prefix
+            block[:, -1] = cand
+            blocks.setdefault(size, []).append(block)
+
+    for v in core.order:
+        cand = core.forward_neighbors(v)
+        if len(cand):
+            _extend_cliques(core, [int(v)], cand, max_clique, visit)
+    return {size: np.vstack(blocks[size]) for size in sorted(blocks)}
+
+
+class CliqueCounts:
+    """团计数结果
+
+    属性:
+        sizes: 团大小列表 [3, 4, ..., max_clique]
+        node_counts: 形状为(节点数, len(sizes))的数组，节点参与各大小团的次数
+        totals: 各大小团参与次数之和(即每种大小的团数乘以团大小)
+        clique_numbers: 各大小团的个数
+        edge_weights: 每条无向边的高阶权重，等于1加上包含该边的所有团的大小之和
+        variance: 抽样计数时各大小团个数估计量的方差，精确计数时为None
+        node_ci: 近似计数时节点计数置信区间的(下界, 上界)数组，否则为None
+    """
+
+    def __init__(self, sizes, node_counts, clique_numbers, edge_weights, variance=None, node_ci=None):
+        self.sizes = list(sizes)
+        self.node_counts = node_counts
+        self.totals = node_counts.sum(axis=0)
+        self.clique_numbers = clique_numbers
+        self.edge_weights = edge_weights
+        self.variance = variance
+        self.node_ci = node_ci
+
+
+class CliqueAccumulator:
+    """按根节点(或根边)累积团计数
+
+    每个团只在其退化序最小的节点(根)处被枚举一次，因此按根拆分的计数可以
+    直接相加；抽样计数时以权重(抽样概率的倒数)累加各根的贡献。
+
+    属性:
+        numbers: {团大小: 已累积的团个数}
+        n_visits: 已处理的前缀个数，可作为枚举工作量的度量
+        n_intersections: 已执行的候选集求交次数
+    """
+
+    def __init__(self, core, max_clique=None, dtype=np.int64):
+        self.core = core
+        self.max_clique = max_clique
+        self.dtype = dtype
+        self.per_size = {}
+        self.numbers = {}
+        self.edge_weights = np.ones(core.number_of_edges(), dtype=dtype)
+        self.n_visits = 0
+        self.n_intersections = 0
+        self._weight = 1
+        self._prefix_edges = {}
+
+    def _visit(self, prefix, cand, size):
+        # 超出内存上限时报告已达到的最大团大小(已出现的团大小从3开始连续)，尚未出现三角形时为None
+        reached = max(size, len(self.per_size) + 2)
+        profiling.check_memory(reached if reached >= 3 else None)
+        core = self.core
+        key = tuple(prefix)
+        self.n_visits += 1
+        # 前缀内部的边编号随递归逐层累积
+        if len(prefix) > 1:
+            parent = self._prefix_edges[key[:-1]]
+            last = prefix[-1]
+            inner = np.concatenate([parent] + [core.edge_lookup(p, [last]) for p in prefix[:-1]])
+        else:
+            inner = np.zeros(0, dtype=np.int32)
+        self._prefix_edges[key] = inner
+        if self.max_clique is None or size < self.max_clique:
+            # _extend_cliques 对cand中每个节点做一次求交
+            self.n_intersections += len(cand)
+        if size < 3:
+            return
+        if size not in self.per_size:
+            self.per_size[size] = np.zeros(core.number_of_nodes(), dtype=self.dtype)
+            self.numbers[size] = 0
+        k = len(cand)
+        w = self._weight
+        counts = self.per_size[size]
+        counts[prefix] += k * w
+        counts[cand] += w
+        self.numbers[size] += k * w
+        self.edge_weights[inner] += size * k * w
+        for p in prefix:
+            self.edge_weights[core.edge_lookup(p, cand)] += size * w
+
+    def add_root(self, v, weight=1):
+        """累积以节点v为根的全部团"""
+        cand = self.core.forward_neighbors(v)
+        if len(cand):
+            self._weight = weight
+            _extend_cliques(self.core, [int(v)], cand, self.max_clique, self._visit)
+            self._prefix_edges.clear()
+
+    def add_edge(self, u, c, weight=1):
+        """累积以u为根、c为退化序第二小节点的全部团(c须为u的前向邻居)"""
+        core = self.core
+        cand = np.intersect1d(core.forward_neighbors(u), core.forward_neighbors(c), assume_unique=True)
+        if len(cand) and (self.max_clique is None or self.max_clique >= 3):
+            self._weight = weight
+            self._prefix_edges[(int(u),)] = np.zeros(0, dtype=np.int32)
+            _extend_cliques(core, [int(u), int(c)], cand, self.max_clique, self._visit)
+            self._prefix_edges.clear()
+
+    def result(self, variance=None):
+        """整理为CliqueCounts对象
+
+        参数:
+            variance: {团大小: 团个数估计量的方差}，精确计数时为None
+        """
+        top = max(self.per_size) if self.per_size else 2
+        if self.max_clique is not None:
+            top = max(top, self.max_clique)
+        sizes = list(range(3, top + 1))
+        node_counts = np.zeros((self.core.number_of_nodes(), len(sizes)), dtype=self.dtype)
+        for j, size in enumerate(sizes):
+            if size in self.per_size:
+                node_counts[:, j] = self.per_size[size]
+        clique_numbers = np.array([self.numbers.get(size, 0) for size in sizes], dtype=self.dtype)
+        if variance is not None:
+            variance = np.array([variance.get(size, 0.0) for size in sizes], dtype=float)
+        return CliqueCounts(sizes, node_counts, clique_numbers, self.edge_weights, variance)
+
+
+def count_cliques(core, max_clique=None):
+    """统计每个节点参与各大小团的次数以及每条边的高阶权重
+
+    参数:
+        core: GraphCore对象
+        max_clique: 最大团大小，None则统计到网络中的最大团
+
+    返回:
+        CliqueCounts对象
+    """
+    accumulator = CliqueAccumulator(core, max_clique)
+    for v in core.order:
+        accumulator.add_root(v)
+    profiling.count('clique_prefixes', accumulator.n_visits)
+    profiling.count('intersections', accumulator.n_intersections)
+    return accumulator.result()
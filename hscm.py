@@ -0,0 +1,329 @@
+import argparse
+import json
+import sys
+from contextlib import nullcontext
+import numpy as np
+from graph_core import GraphCore, CliqueCounts
+from centrality_improvement import HigherOrderFeatures, compute_features, score_features
+from sweep import load_network, load_nodes
+import profiling
+import os
+
+# 保存文件的格式版本，数组布局改变时递增(2: 节点标签带类型标记，支持元组标签)
+FORMAT_VERSION = 2
+
+
+def _encode_label(label):
+    """将节点标签转换为可写入JSON的值：numpy标量转为Python标量，元组记为 {'tuple': [...]}"""
+    if isinstance(label, np.generic):
+        label = label.item()
+    if isinstance(label, tuple):
+        return {'tuple': [_encode_label(item) for item in label]}
+    if label is None or isinstance(label, (str, int, float)):
+        return label
+    raise TypeError(f"Cannot save node label {label!r} of type {type(label).__name__}; "
+                    f"node labels must be str, int, float or tuples of these")
+
+
+def _decode_label(value):
+    """_encode_label的逆变换"""
+    if isinstance(value, dict):
+        return tuple(_decode_label(item) for item in value['tuple'])
+    return value
+
+
+def _json_default(value):
+    """json.dumps的default钩子：numpy数组转为列表，numpy标量转为Python标量(用于保存count_report)"""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class HSCM:
+    """保存预计算特征和调参结果的HSCM模型
+
+    模型持有GraphCore、基础中心性得分、团计数(即HigherOrderFeatures)以及调参得到的
+    最佳参数，可以反复调参、打分，并保存为npz文件以便之后直接加载而无需重新枚举团。
+
+    属性:
+        features: HigherOrderFeatures对象
+        params: {'cdr' 或 'csr': 最佳参数字典}，尚未调参时为空字典
+        best_values: {'cdr' 或 'csr': 最佳得分}
+    """
+
+    def __init__(self, features, params=None, best_values=None):
+        self.features = features
+        self.params = dict(params or {})
+        self.best_values = dict(best_values or {})
+
+    @classmethod
+    def from_graph(cls, G, base_scores='dc', max_clique=None, time_budget=None, memory_budget=None,
+                   sample_rate=None, seed=None):
+        """由网络构建模型，参数同compute_features"""
+        return cls(compute_features(G, base_scores, max_clique, time_budget, memory_budget, sample_rate, seed))
+
+    def fit(self, key_nodes, non_key_nodes=None, rank_type='csr', **options):
+        """在关键节点上调参并保存最佳参数
+
+        参数:
+            key_nodes: 关键节点列表
+            non_key_nodes: 非关键节点列表，None则取其余全部节点
+            rank_type: 'csr'(默认)、'cdr' 或 'both'
+            options: 传给optimize_features的其他参数(如n_trials、metric、optimizer、seed)，
+                     不支持cv_folds
+
+        返回:
+            模型本身
+        """
+        # 调参依赖optuna和sklearn，只打分时无需导入
+        from bayesian_optimization import optimize_features
+
+        if options.get('cv_folds') is not None:
+            raise ValueError("HSCM.fit does not support cv_folds; use optimize_features directly")
+        options.setdefault('verbose', False)
+        best_params, best_value = optimize_features(self.features, key_nodes, non_key_nodes,
+                                                    rank_type=rank_type, **options)
+        if rank_type == 'both':
+            self.params.update(best_params)
+            self.best_values.update(best_value)
+        else:
+            self.params[rank_type] = best_params
+            self.best_values[rank_type] = best_value
+        return self
+
+    def score(self, params=None, rank_type='both'):
+        """计算CDR/CSR得分
+
+        参数:
+            params: 参数字典，None则使用调参得到的对应参数(未调参时所有参数取1)
+            rank_type: 'both'(默认，返回CDR和CSR两个字典)、'cdr' 或 'csr'
+
+        返回:
+            rank_type='both'时为CDR分数字典和CSR分数字典，否则为对应的分数字典
+        """
+        core = self.features.core
+        if rank_type == 'both':
+            cdr = score_features(self.features, params or self.params.get('cdr'))[0]
+            csr = score_features(self.features, params or self.params.get('csr'))[1]
+            return core.to_dict(cdr), core.to_dict(csr)
+        if rank_type not in ('cdr', 'csr'):
+            raise ValueError(f"Invalid rank_type '{rank_type}'. Choose from 'cdr', 'csr', 'both'")
+        scores = score_features(self.features, params or self.params.get(rank_type))
+        return core.to_dict(scores[0 if rank_type == 'cdr' else 1])
+
+    def save(self, path):
+        """保存为压缩的npz文件，计数方式说明(count_report)以JSON形式存入meta"""
+        features, core = self.features, self.features.core
+        arrays = {'edge_u': core.edge_u, 'edge_v': core.edge_v, 'self_loops': core.self_loops,
+                  'base': features.base, 'sizes': np.array(features.sizes, dtype=np.int64),
+                  'node_counts': features.node_counts, 'clique_numbers': features.clique_numbers,
+                  'edge_weights': features.edge_weights}
+        if features.clique_variance is not None:
+            arrays['clique_variance'] = features.clique_variance
+        if features.node_ci is not None:
+            arrays['node_ci_lower'], arrays['node_ci_upper'] = features.node_ci
+        meta = {'format_version': FORMAT_VERSION, 'labels': [_encode_label(label) for label in core.labels],
+                'base_name': features.base_name,
+                'params': self.params, 'best_values': self.best_values,
+                'count_report': features.count_report}
+        np.savez_compressed(path, meta=np.array(json.dumps(meta, default=_json_default)), **arrays)
+
+    @classmethod
+    def load(cls, path):
+        """从save保存的npz文件加载模型"""
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            if meta['format_version'] > FORMAT_VERSION:
+                raise ValueError(f"{path} was saved with format version {meta['format_version']}, "
+                                 f"newer than the supported version {FORMAT_VERSION}")
+            core = GraphCore([_decode_label(value) for value in meta['labels']], data['edge_u'], data['edge_v'], data['self_loops'])
+            counts = CliqueCounts(data['sizes'].tolist(), data['node_counts'], data['clique_numbers'],
+                                  data['edge_weights'],
+                                  data['clique_variance'] if 'clique_variance' in data else None,
+                                  (data['node_ci_lower'], data['node_ci_upper']) if 'node_ci_lower' in data else None)
+            # 旧文件没有count_report；其中的numpy数组以列表形式恢复
+            features = HigherOrderFeatures(core, data['base'], counts, meta['base_name'],
+                                           meta.get('count_report'))
+        return cls(features, meta['params'], meta['best_values'])
+
+
+def count_summary(features):
+    """团计数方式的说明(计数方式以及抽样计数时各大小团个数的估计值和标准差)
+
+    参数:
+        features: HigherOrderFeatures对象
+
+    返回:
+        说明文字的行列表，未设置预算的精确计数返回空列表
+    """
+    report = features.count_report
+    if report is None and features.clique_variance is None:
+        return []
+    report = report or {}
+    mode = report.get('mode', 'sampled')
+    details = []
+    if report.get('fraction') is not None and mode != 'exact':
+        details.append(f"抽样比例 {report['fraction']:.3f}")
+    if report.get('max_clique') is not None:
+        details.append(f"最大团大小 {report['max_clique']}")
+    if 'estimate' in report:
+        details.append(f"预估精确计数耗时 {report['estimate']['seconds']:.1f}s "
+                       f"(预估本身 {report['estimate_seconds']:.1f}s)")
+    lines = [f"团计数方式: {mode}" + (f" ({', '.join(details)})" if details else "")]
+    if features.clique_variance is not None:
+        for size, number, variance in zip(features.sizes, features.clique_numbers, features.clique_variance):
+            lines.append(f"  {size}团: 个数估计 {number:.1f}, 标准差 {np.sqrt(variance):.1f}")
+    return lines
+
+
+def write_count_ci(features, output_folder):
+    """近似团计数时将节点计数的置信区间写入 <output_folder>/count_ci.txt
+
+    每行为 ci_<团大小>: {节点: (下界, 上界)}，与output.txt的格式一致。
+
+    返回:
+        文件路径，没有置信区间(精确或按预算抽样计数)时为None
+    """
+    if features.node_ci is None:
+        return None
+    lower, upper = features.node_ci
+    labels = features.core.labels
+    ci_file_path = os.path.join(output_folder, 'count_ci.txt')
+    with open(ci_file_path, 'w') as f:
+        for j, size in enumerate(features.sizes):
+            intervals = {label: (float(lower[i, j]), float(upper[i, j])) for i, label in enumerate(labels)}
+            f.write(f"ci_{size}: {intervals}\n")
+    return ci_file_path
+
+
+def write_scores(model, output_folder, params=None):
+    """按main.py的格式将CDR/CSR得分写入 <output_folder>/output.txt(近似计数时另写出count_ci.txt)，返回文件路径"""
+    os.makedirs(output_folder, exist_ok=True)
+    cdr, csr = model.score(params)
+    output_file_path = os.path.join(output_folder, 'output.txt')
+    with open(output_file_path, 'w') as f:
+        f.write(f"cdr: {cdr}\n")
+        f.write(f"csr: {csr}\n")
+    write_count_ci(model.features, output_folder)
+    return output_file_path
+
+
+def precompute(args):
+    """precompute子命令：加载网络、计算特征并保存模型文件"""
+    with profiling.stage('load'):
+        G = load_network({'path': args.network, 'nodetype': args.nodetype})
+    model = HSCM.from_graph(G, args.base_scores, args.max_clique, args.time_budget,
+                            args.memory_budget * 2 ** 20 if args.memory_budget else None, args.sample_rate,
+                            args.seed)
+    for line in count_summary(model.features):
+        print(line)
+    with profiling.stage('save'):
+        model.save(args.output)
+    print(f"特征已保存至 {args.output}")
+
+
+def tune(args):
+    """tune子命令：在模型文件的特征上调参，最佳参数写入JSON文件(可选同时写出调参后的模型文件)"""
+    with profiling.stage('load'):
+        model = HSCM.load(args.model)
+    labels = model.features.core.labels
+    nodetype = type(labels[0]) if labels else str
+    model.fit(load_nodes(args.key_nodes, nodetype), load_nodes(args.non_key_nodes, nodetype),
+              rank_type=args.rank_type, n_trials=args.n_trials, metric=args.metric, seed=args.seed,
+              verbose=args.verbose)
+    with open(args.output, 'w') as f:
+        json.dump({'format_version': FORMAT_VERSION, 'params': model.params,
+                   'best_values': model.best_values}, f, indent=2)
+    if args.save:
+        model.save(args.save)
+    print(f"最佳参数已保存至 {args.output}")
+
+
+def score(args):
+    """score子命令：用模型文件中(或JSON文件给出)的参数打分并写出结果"""
+    with profiling.stage('load'):
+        model = HSCM.load(args.model)
+    params = None
+    if args.params:
+        with open(args.params, 'r') as f:
+            tuned = json.load(f)
+        model.params.update(tuned['params'])
+        if args.rank_type != 'both':
+            # CDR与CSR都使用对应调参对象的参数，同main.py
+            params = tuned['params'].get(args.rank_type)
+    elif args.rank_type != 'both':
+        params = model.params.get(args.rank_type)
+    output_file_path = write_scores(model, args.output, params)
+    print(f"结果已保存至 {output_file_path}")
+
+
+def parse_arguments():
+    """
+    解析命令行参数
+    """
+    parser = argparse.ArgumentParser(description="分阶段的HSCM流程：precompute计算特征，tune调参，score打分，"
+                                                 "各阶段之间通过模型文件和参数文件传递结果")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--profile', type=str, default=None,
+                        help="将各阶段耗时、内存峰值和计数器写入的 JSON 文件路径，默认不统计")
+    common.add_argument('--memory_limit', type=float, default=None,
+                        help="进程内存上限(MB)，团计数超出时降低所考虑的最大团大小重新计数，无法降低时报错退出，默认不限")
+
+    pre = subparsers.add_parser('precompute', parents=[common], help="计算网络的特征并保存为模型文件(.npz)")
+    pre.add_argument('-G', '--network', type=str, help="网络文件路径(edgelist、graphml或pkl)", required=True)
+    pre.add_argument('-b', '--base_scores', type=str, choices=['bc', 'cc', 'dc', 'ec', 'pr'], default='dc',
+                     help="基础中心性，默认为dc")
+    pre.add_argument('-o', '--output', type=str, help="模型文件路径", required=True)
+    pre.add_argument('-m', '--max_clique', type=int, default=None, help="所考虑的最大团的大小")
+    pre.add_argument('--nodetype', type=str, choices=['int', 'str'], default='str',
+                     help="edgelist中节点的类型，默认为str")
+    pre.add_argument('--time_budget', type=float, default=None, help="团计数的时间预算(秒)")
+    pre.add_argument('--memory_budget', type=float, default=None, help="团计数的内存预算(MB)")
+    pre.add_argument('--sample_rate', type=float, default=None, help="近似团计数的抽样比例，默认精确计数")
+    pre.add_argument('--seed', type=int, default=None, help="抽样计数和近似计数的随机种子")
+    pre.set_defaults(func=precompute)
+
+    tun = subparsers.add_parser('tune', parents=[common], help="在模型文件的特征上调参，最佳参数写入JSON文件")
+    tun.add_argument('-a', '--model', type=str, help="precompute生成的模型文件路径", required=True)
+    tun.add_argument('-k', '--key_nodes', type=str, help="关键节点 txt 文件路径", required=True)
+    tun.add_argument('-n', '--non_key_nodes', type=str, default=None, help="非关键节点 txt 文件路径")
+    tun.add_argument('-o', '--output', type=str, help="最佳参数 JSON 文件路径", required=True)
+    tun.add_argument('-r', '--rank_type', type=str, choices=['cdr', 'csr', 'both'], default='csr',
+                     help="调参对象，默认为csr")
+    tun.add_argument('--n_trials', type=int, default=50, help="试验次数，默认为50")
+    tun.add_argument('--metric', type=str, default='ap', help="评价指标，默认为ap")
+    tun.add_argument('--seed', type=int, default=None, help="随机种子")
+    tun.add_argument('--save', type=str, default=None, help="同时写出包含最佳参数的模型文件的路径")
+    tun.add_argument('-v', '--verbose', type=lambda x: (str(x).lower() == 'true'), default=False,
+                     help="是否输出调参日志 (True 或 False)")
+    tun.set_defaults(func=tune)
+
+    sco = subparsers.add_parser('score', parents=[common], help="计算CDR/CSR得分并写入 output.txt")
+    sco.add_argument('-a', '--model', type=str, help="模型文件路径", required=True)
+    sco.add_argument('-p', '--params', type=str, default=None,
+                     help="tune生成的参数 JSON 文件路径，默认使用模型文件中的参数(未调参时所有参数取1)")
+    sco.add_argument('-o', '--output', type=str, help="输出文件夹路径", required=True)
+    sco.add_argument('-r', '--rank_type', type=str, choices=['cdr', 'csr', 'both'], default='both',
+                     help="使用哪个调参对象的参数：cdr或csr表示两种得分都使用该参数，both(默认)表示各自使用对应参数")
+    sco.set_defaults(func=score)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    # 未指定--profile和--memory_limit时不开启统计
+    profiler = None
+    if args.profile or args.memory_limit:
+        profiler = profiling.Profiler(memory=True,
+                                      memory_limit=args.memory_limit * 2 ** 20 if args.memory_limit else None)
+    try:
+        with profiling.profile(profiler) if profiler else nullcontext():
+            args.func(args)
+    except profiling.MemoryLimitExceeded as e:
+        sys.exit(f"错误: {e}")
+    finally:
+        if args.profile:
+            profiler.write(args.profile, command=args.command)
@@ -0,0 +1,147 @@
+from concurrent.futures import ProcessPoolExecutor
+import networkx as nx
+import numpy as np
+from graph_core import GraphCore, iter_cliques
+from centrality_improvement import compute_base_scores, score_features
+import os
+
+# 删除节点后无需重新计算即可得到的基础中心性
+LOCAL_BASES = ('dc', 'custom')
+
+
+def _neighbor_cliques(core, x, max_clique=None):
+    """枚举包含节点x的全部团(不含x本身)，即x的邻居诱导子图中大小至少为2的团"""
+    nbrs = core.neighbors(x)
+    if len(nbrs) < 2:
+        return
+    position = np.full(core.number_of_nodes(), -1)
+    position[nbrs] = np.arange(len(nbrs))
+    edge_u, edge_v = [], []
+    for a, v in enumerate(nbrs):
+        inner = position[core.neighbors(v)]
+        inner = inner[inner > a]
+        edge_u.extend([a] * len(inner))
+        edge_v.extend(inner.tolist())
+    sub = GraphCore(range(len(nbrs)), edge_u, edge_v)
+    limit = max_clique - 1 if max_clique is not None else None
+    for clique in iter_cliques(sub, limit, min_size=2):
+        yield nbrs[list(clique)]
+
+
+def knockout_scores(features, x, params=None, G=None):
+    """删除编号为x的节点后的CDR和CSR得分
+
+    从缓存的团计数中减去包含x的团(在x的邻居诱导子图中枚举)，并相应减小
+    邻居的高阶度数和强度；基础中心性为'dc'或直接提供的得分时直接更新，
+    其余类型在删除节点后的网络上重新计算。
+
+    参数:
+        features: HigherOrderFeatures对象
+        x: 被删除节点的编号
+        params: 包含theta和lambda参数的字典，None则所有参数取1
+        G: 网络图对象，仅当基础中心性需要重新计算时使用，None则由features.core还原
+
+    返回:
+        两个数组: CDR得分, CSR得分(按节点编号排列，被删除节点为nan)，与对删除节点后的网络
+        调用improved_centrality的结果一致
+    """
+    core = features.core
+    n = core.number_of_nodes()
+    max_clique = features.sizes[-1] if features.sizes else 2
+    node_counts = features.node_counts.astype(float)
+    degree = features.motif_degree.astype(float)
+    strength = features.motif_strength.astype(float)
+
+    nbrs = core.neighbors(x)
+    degree[nbrs] -= 1
+    strength[nbrs] -= features.edge_weights[core.edge_lookup(x, nbrs)]
+    for clique in _neighbor_cliques(core, x, max_clique):
+        size = len(clique) + 1
+        node_counts[clique, size - 3] -= 1
+        # 团内除x以外的每条边权重减小size，每个成员关联其中len(clique)-1条
+        strength[clique] -= size * (len(clique) - 1)
+
+    keep = np.ones(n, dtype=bool)
+    keep[x] = False
+    if features.base_name == 'dc':
+        base = degree / max(n - 2, 1)
+    elif features.base_name == 'custom':
+        base = features.base
+    else:
+        if G is None:
+            G = core.to_networkx()
+        view = nx.restricted_view(G, [core.labels[x]], [])
+        base = core.from_dict(compute_base_scores(view, features.base_name))
+
+    if params is None:
+        params = features.default_params()
+    totals = node_counts[keep].sum(axis=0)
+    totals[totals == 0] = 1e-10
+    correction = 1 + (node_counts / totals) @ features.lambdas(params)
+    theta = params.get('theta', 1.0)
+
+    def _calculate_scores(motif_vals):
+        norm = motif_vals / (motif_vals[keep].sum() + 1e-10)
+        adjusted = np.where(keep, base * norm ** theta * correction, 0.0)
+        scores = adjusted / (adjusted.sum() + 1e-10)
+        scores[x] = np.nan
+        return scores
+
+    return _calculate_scores(degree), _calculate_scores(strength)
+
+
+def _knockout_chunk(features, nodes, params, rank_type, top_k, before):
+    """在子进程中依次处理一批被删除的节点"""
+    G = None if features.base_name in LOCAL_BASES else features.core.to_networkx()
+    column = 1 if rank_type == 'csr' else 0
+    order = np.argsort(-before, kind='stable')
+    old_rank = np.empty(len(order), dtype=np.int64)
+    old_rank[order] = np.arange(len(order))
+    results = {}
+    for x in nodes:
+        after = knockout_scores(features, x, params, G)[column]
+        if top_k is None:
+            results[x] = after - before
+            continue
+        new_order = np.argsort(-np.nan_to_num(after, nan=-np.inf), kind='stable')
+        new_rank = np.empty(len(new_order), dtype=np.int64)
+        new_rank[new_order] = np.arange(len(new_order))
+        top = [i for i in order[:top_k + 1] if i != x][:top_k]
+        results[x] = {features.core.labels[i]: int(new_rank[i] - old_rank[i]) for i in top}
+    return results
+
+
+def knockout(features, nodes, params=None, rank_type='csr', top_k=None, n_jobs=None):
+    """批量计算逐个删除节点(in-silico敲除)后CDR或CSR的变化
+
+    每次删除都只减去被删除节点所在的团，不重新枚举整个网络；各节点的删除
+    相互独立，分批由进程池并行执行。
+
+    参数:
+        features: HigherOrderFeatures对象
+        nodes: 被删除节点的标签列表
+        params: 包含theta和lambda参数的字典，None则所有参数取1
+        rank_type: 'csr'(默认) 或 'cdr'
+        top_k: None则返回每个节点的得分变化；否则返回删除前排名前top_k的节点
+               (不含被删除节点)的排名变化，正数表示排名下降
+        n_jobs: 进程数，None表示使用CPU核数，1表示在当前进程中执行
+
+    返回:
+        {被删除节点标签: 结果}。top_k为None时结果为按节点编号排列的得分变化数组
+        (删除后减删除前，被删除节点为nan)；否则为 {节点标签: 排名变化} 字典
+    """
+    core = features.core
+    before = score_features(features, params)[1 if rank_type == 'csr' else 0]
+    ids = [core.index[node] for node in nodes]
+    if n_jobs == 1:
+        results = _knockout_chunk(features, ids, params, rank_type, top_k, before)
+    else:
+        n_workers = n_jobs or os.cpu_count() or 1
+        chunks = [ids[i::4 * n_workers] for i in range(4 * n_workers) if ids[i::4 * n_workers]]
+        results = {}
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            futures = [pool.submit(_knockout_chunk, features, chunk, params, rank_type, top_k, before)
+                       for chunk in chunks]
+            for future in futures:
+                results.update(future.result())
+    return {core.labels[x]: results[x] for x in ids}
@@ -0,0 +1,96 @@
+import numpy as np
+from scipy.stats import qmc
+from centrality_improvement import score_nodes_batch
+from bayesian_optimization import label_indices, evaluate_rank_matrix
+
+
+def scan_landscape(features, key_nodes, non_key_nodes=None, rank_type='csr', metrics=('ap', 'auc'),
+                   n_samples=8192, batch_size=2048, seed=None):
+    """在参数空间的Sobol准随机设计上批量评估指标，并计算基于方差的敏感性指数
+
+    采用Saltelli设计：由2 * 维数维的Sobol序列得到矩阵A、B，以及把A的第i列替换为B的第i列
+    得到的AB_i，共评估 n_samples * (维数 + 2) 组参数。一阶指数用Saltelli(2010)估计量，
+    总效应指数用Jansen估计量。
+
+    参数:
+        features: HigherOrderFeatures对象
+        key_nodes: 关键节点列表
+        non_key_nodes: 非关键节点列表，None则取其余全部节点
+        rank_type: 'csr'(默认) 或 'cdr'
+        metrics: 评估指标列表，可选 'auc', 'ap', 'f1'
+        n_samples: Sobol基础样本数(建议为2的幂)
+        batch_size: 每批评估的参数组数
+        seed: 随机种子
+
+    返回:
+        字典 {metric: {'first_order': {参数名: 指数}, 'total': {参数名: 指数},
+                       'best_params': 参数字典, 'best_value': 得分, 'variance': 指标方差}}，
+        另有键 'n_evaluations' 记录评估的参数组数
+    """
+    if non_key_nodes is None:
+        non_key_nodes = list(set(features.core.labels) - set(key_nodes))
+    idx, y_true = label_indices(features, key_nodes, non_key_nodes)
+    names = ['theta'] + [f'lambda_{size}' for size in features.sizes]
+    dim = len(names)
+
+    sampler = qmc.Sobol(d=2 * dim, scramble=True, seed=seed)
+    base = sampler.random(n_samples)
+    A, B = base[:, :dim], base[:, dim:]
+    blocks = [A, B]
+    for i in range(dim):
+        AB = A.copy()
+        AB[:, i] = B[:, i]
+        blocks.append(AB)
+    design = np.vstack(blocks)
+
+    values = {metric: np.empty(len(design)) for metric in metrics}
+    for start in range(0, len(design), batch_size):
+        chunk = design[start:start + batch_size]
+        scores = score_nodes_batch(features, chunk, idx, rank_type)
+        for metric in metrics:
+            values[metric][start:start + batch_size] = evaluate_rank_matrix(scores, y_true, metric)[:, 0]
+
+    report = {'n_evaluations': len(design)}
+    for metric in metrics:
+        f = values[metric]
+        f_a, f_b = f[:n_samples], f[n_samples:2 * n_samples]
+        variance = np.var(np.concatenate([f_a, f_b]))
+        first_order, total = {}, {}
+        for i, name in enumerate(names):
+            f_ab = f[(2 + i) * n_samples:(3 + i) * n_samples]
+            if variance > 0:
+                first_order[name] = float(np.mean(f_b * (f_ab - f_a)) / variance)
+                total[name] = float(0.5 * np.mean((f_a - f_ab) ** 2) / variance)
+            else:
+                first_order[name] = total[name] = 0.0
+        best = int(np.argmax(f))
+        report[metric] = {'first_order': first_order, 'total': total,
+                          'best_params': {name: float(v) for name, v in zip(names, design[best])},
+                          'best_value': float(f[best]), 'variance': float(variance)}
+    return report
+
+
+def format_sensitivity(report, metric='ap'):
+    """将敏感性指数整理为按总效应降序排列的文本表格"""
+    result = report[metric]
+    lines = [f"{metric}: best value {result['best_value']:.6f} over {report['n_evaluations']} evaluations",
+             f"{'parameter':<12}{'first order':>14}{'total':>10}"]
+    for name in sorted(result['total'], key=result['total'].get, reverse=True):
+        lines.append(f"{name:<12}{result['first_order'][name]:>14.4f}{result['total'][name]:>10.4f}")
+    return '\n'.join(lines)
+
+
+def shrink_search_space(report, metric='ap', threshold=0.05):
+    """根据总效应指数缩小搜索空间
+
+    参数:
+        report: scan_landscape的结果
+        metric: 依据的评估指标
+        threshold: 总效应指数低于该值的参数视为不重要
+
+    返回:
+        不重要参数的固定取值字典(取扫描中的最佳取值)，可直接作为optimize_method的fixed_params
+    """
+    result = report[metric]
+    return {name: result['best_params'][name] for name, index in result['total'].items()
+            if index < threshold}
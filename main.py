@@ -1,9 +1,8 @@
 import argparse
 import os
 import ast
-import networkx as nx
-from centrality_improvement import improved_centrality
-from bayesian_optimization import optimize_method
+import sys
+from contextlib import nullcontext
 
 def parse_arguments():
     """
@@ -48,7 +47,20 @@ def parse_arguments():
     optional_args.add_argument('-n', '--non_key_nodes', type=node_list_type,
                                help="非关键节点列表，用逗号分隔（例如：4,5,6）或 txt 文件路径", default=None)
     required_args.add_argument('-m', '--max_clique', type=int, help="所考虑的最大团的大小，若为None则自动识别网络中最大的团", required=False)
-    required_args.add_argument('-r', '--rank_type', type=str, help="选择对CDR或CSR进行调参(输入cdr或csr)，若为None则默认为csr", required=False)
+    required_args.add_argument('-r', '--rank_type', type=str, choices=['cdr', 'csr', 'both'], default='csr',
+                               help="选择对CDR或CSR进行调参(输入cdr、csr或both，both表示在同一研究中同时调参)，默认为csr", required=False)
+    optional_args.add_argument('--time_budget', type=float, default=None,
+                               help="团计数的时间预算(秒)，预估的精确枚举耗时超出预算时改用抽样团计数，默认不限")
+    optional_args.add_argument('--memory_budget', type=float, default=None,
+                               help="团计数的内存预算(MB)，预估超出预算时降低所考虑的最大团大小，默认不限")
+    optional_args.add_argument('--sample_rate', type=float, default=None,
+                               help="使用边抽样的近似团计数，取值为期望枚举的工作量比例(如0.1)，适用于超大规模网络，默认精确计数")
+    optional_args.add_argument('--seed', type=int, default=None,
+                               help="随机种子，用于抽样或近似团计数以及调参，默认不固定")
+    optional_args.add_argument('--profile', type=str, default=None,
+                               help="将各阶段耗时、内存峰值和计数器写入的 JSON 文件路径，默认不统计")
+    optional_args.add_argument('--memory_limit', type=float, default=None,
+                               help="进程内存上限(MB)，团计数超出时降低所考虑的最大团大小重新计数，无法降低时报错退出，默认不限")
     optional_args.add_argument('-v', '--verbose', type=lambda x: (str(x).lower() == 'true'), help="是否输出调参日志 (True 或 False)", 
                                default=False)
 
@@ -58,26 +70,62 @@ def parse_arguments():
 
 if __name__ == "__main__":
     args = parse_arguments()
-    output_folder = args.output
-    if not os.path.exists(output_folder):
-        os.makedirs(output_folder)
-    output_file_path = os.path.join(output_folder, 'output.txt')
-    G = nx.read_edgelist(args.network)
-    if args.key_nodes:
-        best_params, _ = optimize_method(G, base_scores=args.base_scores, key_nodes=args.key_nodes, 
-                                         non_key_nodes=args.non_key_nodes, max_clique=args.max_clique,
-                                         rank_type=args.rank_type, verbose=args.verbose)
-        cdr1, csr1 = improved_centrality(G, base_scores=args.base_scores, max_clique=args.max_clique, 
-                                         params=best_params)
-        # 将结果保存到txt文件
-        with open(output_file_path, 'w') as f:
-            f.write(f"cdr: {cdr1}\n")
-            f.write(f"csr: {csr1}\n")
+    # 解析参数后再导入计算模块，--help 和参数错误时无需加载networkx等依赖
+    import networkx as nx
+    from centrality_improvement import compute_features, score_features
+    from hscm import HSCM, count_summary, write_count_ci
+    import profiling
+
+    # 未指定--profile和--memory_limit时不开启统计
+    profiler = None
+    if args.profile or args.memory_limit:
+        profiler = profiling.Profiler(memory=True,
+                                      memory_limit=args.memory_limit * 2 ** 20 if args.memory_limit else None)
+    try:
+        with profiling.profile(profiler) if profiler else nullcontext():
+            output_folder = args.output
+            if not os.path.exists(output_folder):
+                os.makedirs(output_folder)
+            output_file_path = os.path.join(output_folder, 'output.txt')
+            with profiling.stage('load'):
+                G = nx.read_edgelist(args.network)
+            budgets = {'time_budget': args.time_budget,
+                       'memory_budget': args.memory_budget * 2 ** 20 if args.memory_budget else None,
+                       'sample_rate': args.sample_rate, 'seed': args.seed}
+            if args.key_nodes:
+                # 特征只计算一次，调参与最终打分共用
+                model = HSCM.from_graph(G, base_scores=args.base_scores, max_clique=args.max_clique, **budgets)
+                features = model.features
+                model.fit(args.key_nodes, args.non_key_nodes, rank_type=args.rank_type, seed=args.seed,
+                          verbose=args.verbose)
+                # rank_type为both时CDR与CSR各自使用最佳参数，否则两者都使用该调参对象的参数
+                cdr1, csr1 = model.score(None if args.rank_type == 'both' else model.params[args.rank_type])
+                # 将结果保存到txt文件
+                with open(output_file_path, 'w') as f:
+                    f.write(f"cdr: {cdr1}\n")
+                    f.write(f"csr: {csr1}\n")
         
-    else:
-        cdr2, csr2 = improved_centrality(G, base_scores=args.base_scores, max_clique=args.max_clique,
-                                         params=None)
-        # 将结果保存到txt文件
-        with open(output_file_path, 'w') as f:
-            f.write(f"cdr: {cdr2}\n")
-            f.write(f"csr: {csr2}\n")
\ No newline at end of file
+            else:
+                features = compute_features(G, base_scores=args.base_scores, max_clique=args.max_clique, **budgets)
+                cdr2, csr2 = (features.core.to_dict(scores) for scores in score_features(features))
+                # 将结果保存到txt文件
+                with open(output_file_path, 'w') as f:
+                    f.write(f"cdr: {cdr2}\n")
+                    f.write(f"csr: {csr2}\n")
+            # 近似计数时节点计数的置信区间写在output.txt旁
+            ci_file_path = write_count_ci(features, output_folder)
+        # 按预算抽样或近似计数时输出计数方式和各大小团个数的方差
+        for line in count_summary(features):
+            print(line)
+        if ci_file_path:
+            print(f"节点团计数的置信区间已保存至 {ci_file_path}")
+        if profiler:
+            for event in profiler.memory_events:
+                size = f" (团大小 {event['clique_size']})" if event['clique_size'] is not None else ""
+                print(f"警告: 在阶段 {event['stage']}{size} 超出内存上限，{event['action']}")
+    except profiling.MemoryLimitExceeded as e:
+        sys.exit(f"错误: {e}")
+    finally:
+        if args.profile:
+            profiler.write(args.profile, network=args.network, base_scores=str(args.base_scores),
+                           max_clique=args.max_clique, tuned=bool(args.key_nodes))
@@ -0,0 +1,124 @@
+import hashlib
+import json
+import numpy as np
+import os
+
+# 指纹中团数量特征覆盖的团大小
+FINGERPRINT_SIZES = range(3, 13)
+
+
+def network_fingerprint(features):
+    """计算网络指纹
+
+    参数:
+        features: HigherOrderFeatures对象
+
+    返回:
+        字典，包含
+            id: 由度序列和各大小团数量得到的哈希值，同一网络的id相同
+            descriptor: 用于寻找相似网络的特征向量(节点数、边数、平均度、退化度和各大小团数量的对数)
+    """
+    core = features.core
+    degree = np.sort(core.degree())
+    numbers = dict(zip(features.sizes, features.clique_numbers.tolist()))
+    digest = hashlib.sha1()
+    digest.update(degree.astype(np.int64).tobytes())
+    digest.update(json.dumps(sorted(numbers.items())).encode())
+    n_nodes, n_edges = core.number_of_nodes(), core.number_of_edges()
+    descriptor = [np.log1p(n_nodes), np.log1p(n_edges), np.log1p(2 * n_edges / max(n_nodes, 1)),
+                  np.log1p(int(core.core_number.max()) if n_nodes else 0)]
+    descriptor += [np.log1p(numbers.get(size, 0)) / np.log1p(max(n_edges, 1)) for size in FINGERPRINT_SIZES]
+    return {'id': digest.hexdigest()[:16], 'descriptor': [float(x) for x in descriptor]}
+
+
+def project_params(params, sizes):
+    """将参数字典投影到给定的团大小上
+
+    缺失的lambda取已有lambda的均值，多余的lambda被丢弃，所有参数截断到[0, 1]。
+
+    参数:
+        params: 参数字典
+        sizes: 目标团大小列表
+
+    返回:
+        新的参数字典
+    """
+    lambdas = [v for k, v in params.items() if k.startswith('lambda_')]
+    fill = float(np.mean(lambdas)) if lambdas else 0.5
+    projected = {'theta': params.get('theta', 1.0)}
+    for size in sizes:
+        projected[f'lambda_{size}'] = params.get(f'lambda_{size}', fill)
+    return {k: float(np.clip(v, 0, 1)) for k, v in projected.items()}
+
+
+class ParameterLibrary:
+    """持久化的最佳参数库
+
+    以JSON文件保存历次调参得到的最佳参数，每条记录包含网络指纹、基础中心性、
+    排名类型和评估指标。新的调参可以用同一网络的最佳参数以及相似网络(指纹特征
+    最近邻)的参数作为初始试验，而不是从随机参数开始。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = []
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                self.entries = json.load(f)
+
+    def save(self):
+        """写回JSON文件"""
+        with open(self.path, 'w') as f:
+            json.dump(self.entries, f, indent=1)
+
+    def add(self, features, base, rank_type, metric, params, value, name=None):
+        """记录一次调参结果；同一键已有更好的结果时不覆盖
+
+        参数:
+            features: HigherOrderFeatures对象
+            base: 基础中心性名称
+            rank_type: 'cdr' 或 'csr'
+            metric: 评估指标
+            params: 最佳参数字典
+            value: 最佳得分
+            name: 网络名称(可选，仅用于查阅)
+        """
+        fingerprint = network_fingerprint(features)
+        key = (fingerprint['id'], base, rank_type, metric)
+        for entry in self.entries:
+            if (entry['fingerprint'], entry['base'], entry['rank_type'], entry['metric']) == key:
+                if value > entry['value']:
+                    entry.update(params=params, value=value, name=name or entry.get('name'))
+                return
+        self.entries.append({'fingerprint': fingerprint['id'], 'descriptor': fingerprint['descriptor'],
+                             'name': name, 'base': base, 'rank_type': rank_type, 'metric': metric,
+                             'params': params, 'value': value})
+
+    def warm_start(self, features, base, rank_type, metric, n_neighbors=3):
+        """给出用于热启动的参数列表
+
+        先取同一网络、同一设置下的最佳参数，再按指纹特征距离取其他网络中相同
+        rank_type和metric下最接近的n_neighbors组参数，全部投影到当前网络的团大小上。
+
+        参数:
+            features: HigherOrderFeatures对象
+            base, rank_type, metric: 同add
+            n_neighbors: 最近邻网络的参数组数
+
+        返回:
+            参数字典列表
+        """
+        fingerprint = network_fingerprint(features)
+        exact, others = [], []
+        for entry in self.entries:
+            if entry['rank_type'] != rank_type or entry['metric'] != metric:
+                continue
+            if entry['fingerprint'] == fingerprint['id'] and entry['base'] == base:
+                exact.append(entry)
+            else:
+                distance = np.linalg.norm(np.subtract(entry['descriptor'], fingerprint['descriptor']))
+                # 基础中心性不同的参数可迁移性较差，距离上加以惩罚
+                others.append((distance + (entry['base'] != base), entry))
+        others.sort(key=lambda item: item[0])
+        selected = sorted(exact, key=lambda e: -e['value']) + [e for _, e in others[:n_neighbors]]
+        return [project_params(entry['params'], features.sizes) for entry in selected]
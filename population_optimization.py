@@ -0,0 +1,135 @@
+import numpy as np
+from scipy.optimize import differential_evolution
+
+
+def cma_es(fun, x0, sigma0=0.3, popsize=None, n_generations=100, bounds=(0.0, 1.0), seed=None,
+           callback=None):
+    """带边界的(mu/mu_w, lambda)-CMA-ES，每一代的候选解整批交给fun评估
+
+    越界的候选解被截断到边界内再评估，并按越界距离的平方加罚，
+    使分布均值留在可行域内。
+
+    参数:
+        fun: 目标函数 fun(X) -> 每行的函数值数组(越小越好)，X形状为(popsize, 维数)
+        x0: 初始均值
+        sigma0: 初始步长
+        popsize: 每代候选解个数，None则取 4 + 3 * ln(维数)
+        n_generations: 代数
+        bounds: 各维共同的上下界
+        seed: 随机种子
+        callback: 每代结束时调用 callback(generation, best_x, best_f)
+
+    返回:
+        最优解、最优函数值
+    """
+    rng = np.random.default_rng(seed)
+    lo, hi = bounds
+    n = len(x0)
+    lam = popsize or 4 + int(3 * np.log(n))
+    mu = lam // 2
+    weights = np.log(mu + 0.5) - np.log(np.arange(1, mu + 1))
+    weights /= weights.sum()
+    mueff = 1 / np.sum(weights ** 2)
+
+    # 策略参数(Hansen的默认设置)
+    cc = (4 + mueff / n) / (n + 4 + 2 * mueff / n)
+    cs = (mueff + 2) / (n + mueff + 5)
+    c1 = 2 / ((n + 1.3) ** 2 + mueff)
+    cmu = min(1 - c1, 2 * (mueff - 2 + 1 / mueff) / ((n + 2) ** 2 + mueff))
+    damps = 1 + 2 * max(0, np.sqrt((mueff - 1) / (n + 1)) - 1) + cs
+    chi_n = np.sqrt(n) * (1 - 1 / (4 * n) + 1 / (21 * n ** 2))
+
+    mean = np.clip(np.asarray(x0, dtype=float), lo, hi)
+    sigma = sigma0
+    C = np.eye(n)
+    B, D = np.eye(n), np.ones(n)
+    pc, ps = np.zeros(n), np.zeros(n)
+    best_x, best_f = mean.copy(), np.inf
+
+    for generation in range(n_generations):
+        y = rng.standard_normal((lam, n)) * D @ B.T
+        x = mean + sigma * y
+        feasible = np.clip(x, lo, hi)
+        f = fun(feasible)
+        penalized = f + np.sum((x - feasible) ** 2, axis=1)
+        order = np.argsort(penalized)
+        if f[order[0]] < best_f:
+            best_x, best_f = feasible[order[0]].copy(), f[order[0]]
+
+        y_sel = y[order[:mu]]
+        y_w = weights @ y_sel
+        mean = mean + sigma * y_w
+        inv_sqrt_c_yw = B @ ((B.T @ y_w) / D)
+        ps = (1 - cs) * ps + np.sqrt(cs * (2 - cs) * mueff) * inv_sqrt_c_yw
+        hsig = (np.linalg.norm(ps) / np.sqrt(1 - (1 - cs) ** (2 * (generation + 1))) / chi_n
+                < 1.4 + 2 / (n + 1))
+        pc = (1 - cc) * pc + hsig * np.sqrt(cc * (2 - cc) * mueff) * y_w
+        C = ((1 - c1 - cmu) * C
+             + c1 * (np.outer(pc, pc) + (1 - hsig) * cc * (2 - cc) * C)
+             + cmu * (y_sel.T * weights) @ y_sel)
+        sigma *= np.exp((cs / damps) * (np.linalg.norm(ps) / chi_n - 1))
+        C = (C + C.T) / 2
+        eigenvalues, B = np.linalg.eigh(C)
+        D = np.sqrt(np.maximum(eigenvalues, 1e-20))
+
+        if callback is not None:
+            callback(generation, best_x, best_f)
+        if sigma * D.max() < 1e-8:
+            break
+    return best_x, best_f
+
+
+def fit_population(evaluate, names, optimizer='cmaes', n_trials=5000, popsize=None, seed=None,
+                   verbose=True, initial=None):
+    """使用种群优化方法(CMA-ES或差分进化)在[0, 1]边界内调参，每一代的候选参数整批评估
+
+    参数:
+        evaluate: 批量评估函数 evaluate(param_matrix) -> 每组参数的评估分数数组(越大越好)
+        names: 参数名列表，与param_matrix的列对应
+        optimizer: 'cmaes'(默认) 或 'de'
+        n_trials: 评估的参数组合总数(上限)，代数约为 n_trials // popsize；
+                  'de'每代至少5个候选解且至少两代，n_trials小于10时按10计
+        popsize: 每代候选解个数，None则使用各方法的默认值，不超过 n_trials // 2 以保证至少两代
+        seed: 随机种子
+        verbose: 是否输出每代的最佳结果
+        initial: 初始参数字典列表(如参数库给出的热启动参数)
+
+    返回:
+        最佳参数字典和最佳得分
+    """
+    dim = len(names)
+    starts = [np.array([p.get(name, 1.0) for name in names]) for p in (initial or [])]
+
+    def report(generation, best_x, best_f):
+        if verbose:
+            params = {name: float(v) for name, v in zip(names, best_x)}
+            print(f"Generation {generation} finished with best value: {-best_f} and parameters: {params}")
+
+    if optimizer == 'cmaes':
+        popsize = min(popsize or 4 + int(3 * np.log(dim)), max(2, n_trials // 2))
+        x0 = starts[0] if starts else np.full(dim, 0.5)
+        best_x, best_f = cma_es(lambda X: -evaluate(X), x0, popsize=popsize,
+                                n_generations=max(1, n_trials // popsize), seed=seed, callback=report)
+    elif optimizer == 'de':
+        popsize = max(min(popsize or 15 * dim, n_trials // 2), 5)
+        rng = np.random.default_rng(seed)
+        init = rng.uniform(0, 1, (popsize, dim))
+        for i, start in enumerate(starts[:len(init)]):
+            init[i] = np.clip(start, 0, 1)
+        generation = [0]
+
+        def de_callback(intermediate_result):
+            report(generation[0], intermediate_result.x, intermediate_result.fun)
+            generation[0] += 1
+
+        # vectorized=True时目标函数接收形状为(维数, 候选解个数)的矩阵；
+        # 初始种群和之后每代各评估popsize个候选解，共 popsize * (maxiter + 1) 次
+        result = differential_evolution(lambda X: -evaluate(X.T), [(0.0, 1.0)] * dim, init=init,
+                                        maxiter=max(1, n_trials // len(init) - 1), polish=False,
+                                        vectorized=True, updating='deferred', seed=seed,
+                                        callback=de_callback)
+        best_x, best_f = result.x, result.fun
+    else:
+        raise ValueError(f"Invalid optimizer '{optimizer}'. Choose from 'cmaes', 'de'")
+
+    return {name: float(v) for name, v in zip(names, best_x)}, float(-best_f)
@@ -0,0 +1,296 @@
+import gc
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+# 当前生效的Profiler，None表示未开启统计(此时stage/count几乎没有开销)
+_active = None
+_NULL_STAGE = nullcontext()
+MB = 2 ** 20
+
+
+class MemoryLimitExceeded(MemoryError):
+    """进程内存超出Profiler的memory_limit
+
+    属性:
+        stage: 超限时所在的阶段名(嵌套时为最内层阶段)
+        size: 超限时正在处理的团大小，无法确定时为None
+        rss: 超限时的进程常驻内存(字节)
+        limit: 内存上限(字节)
+    """
+
+    def __init__(self, stage, size, rss, limit):
+        self.stage, self.size, self.rss, self.limit = stage, size, rss, limit
+        where = f"stage '{stage}'" + (f" at clique size {size}" if size is not None else "")
+        super().__init__(f"Memory limit of {limit / MB:.0f} MB exceeded in {where} "
+                         f"(resident memory {rss / MB:.0f} MB)")
+
+    def info(self):
+        return {'stage': self.stage, 'clique_size': self.size, 'rss_mb': round(self.rss / MB, 1),
+                'limit_mb': round(self.limit / MB, 1)}
+
+
+def read_rss():
+    """当前进程的常驻内存(字节)；没有/proc时退回到历史峰值(ru_maxrss)"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class MemoryMonitor:
+    """后台线程按固定间隔采样进程常驻内存(RSS)，记录峰值并标记是否超出上限
+
+    属性:
+        peak: 当前统计区间内观察到的最大RSS(字节)，由Profiler在阶段开始时重置
+        max_rss: 整个运行期间观察到的最大RSS(字节)
+        limit: 内存上限(字节)，None表示不限
+        retry_base: 超限后重试期间为(阶段开始时的RSS, 重试开始时tracemalloc已跟踪的内存)，
+                    此时以阶段开始时的RSS加上重试中新分配的内存判定是否超限，否则为None
+        exceeded: 是否已观察到超出上限的内存用量
+    """
+
+    def __init__(self, limit=None, interval=0.005):
+        self.limit = limit
+        self.retry_base = None
+        self.interval = interval
+        self.exceeded = False
+        self.peak = 0
+        self.max_rss = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def sample(self):
+        rss = read_rss()
+        if rss > self.peak:
+            self.peak = rss
+        if rss > self.max_rss:
+            self.max_rss = rss
+        if self.limit is not None:
+            usage = rss
+            retry_base = self.retry_base
+            if retry_base is not None:
+                usage = retry_base[0] + tracemalloc.get_traced_memory()[0] - retry_base[1]
+            if usage > self.limit:
+                self.exceeded = True
+        return rss
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def start(self):
+        self.sample()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+class Profiler:
+    """流程各阶段的计时与计数
+
+    阶段可以嵌套，嵌套阶段的耗时同时计入外层阶段；同名阶段多次进入时累加耗时和次数。
+    开启内存统计时另有后台线程采样进程常驻内存，记录每个阶段的内存峰值；
+    设置memory_limit时，枚举团的循环通过check_memory在超限后抛出MemoryLimitExceeded。
+
+    属性:
+        stages: {阶段名: {'seconds': 累计耗时, 'calls': 进入次数}}，按首次进入的顺序排列，
+                开启内存统计时另有 'peak_mb'(阶段内RSS峰值) 和 'delta_mb'(峰值相对进入时的增量)
+        counters: {计数器名: 累计值}
+        hooks: 回调函数列表，每个事件调用 hook(event, name, value)：
+               event为'stage_start'(value为None)、'stage_end'(value为本次耗时)或'count'(value为增量)
+        monitor: MemoryMonitor对象，未开启内存统计时为None
+        memory_events: 内存超限事件列表，每个为MemoryLimitExceeded.info()加上所采取的处理(action)
+    """
+
+    def __init__(self, hooks=(), memory=False, memory_limit=None):
+        self.stages = {}
+        self.counters = {}
+        self.hooks = list(hooks)
+        self.monitor = MemoryMonitor(memory_limit) if memory or memory_limit is not None else None
+        self.memory_events = []
+        # 正在进行的阶段: [阶段名, 进入时RSS, 阶段内RSS峰值]
+        self._stack = []
+        self.start = time.perf_counter()
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def _emit(self, event, name, value):
+        for hook in self.hooks:
+            hook(event, name, value)
+
+    @contextmanager
+    def stage(self, name):
+        """计时一个阶段"""
+        record = self.stages.setdefault(name, {'seconds': 0.0, 'calls': 0})
+        self._emit('stage_start', name, None)
+        monitor = self.monitor
+        if monitor is not None:
+            # 超限标记只对本阶段内的采样有效，之前阶段的短暂超限在内存已回落时不应归到本阶段
+            monitor.exceeded = False
+            rss = monitor.sample()
+            if self._stack:
+                # 外层阶段的峰值先记下，再为本阶段重新统计峰值
+                self._stack[-1][2] = max(self._stack[-1][2], monitor.peak)
+            monitor.peak = rss
+        self._stack.append([name, monitor.peak if monitor else 0, monitor.peak if monitor else 0])
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            record['seconds'] += seconds
+            record['calls'] += 1
+            _, start_rss, peak = self._stack.pop()
+            if monitor is not None:
+                monitor.sample()
+                peak = max(peak, monitor.peak)
+                if self._stack:
+                    self._stack[-1][2] = max(self._stack[-1][2], peak)
+                monitor.peak = peak
+                record['peak_mb'] = max(record.get('peak_mb', 0.0), round(peak / MB, 1))
+                record['delta_mb'] = max(record.get('delta_mb', 0.0), round((peak - start_rss) / MB, 1))
+            self._emit('stage_end', name, seconds)
+
+    def check_memory(self, size=None):
+        """超出内存上限时抛出MemoryLimitExceeded"""
+        monitor = self.monitor
+        if monitor is not None and monitor.exceeded:
+            monitor.exceeded = False
+            stage = self._stack[-1][0] if self._stack else None
+            raise MemoryLimitExceeded(stage, size, monitor.peak, monitor.limit)
+
+    @contextmanager
+    def memory_retry(self):
+        """超出内存上限后在with块内重试
+
+        先回收垃圾、重新采样RSS并重置峰值。已释放的内存通常不会归还操作系统，回收后的RSS
+        往往仍高于上限，按RSS判定会使重试立即再次超限；因此with块内用tracemalloc跟踪重试中
+        新分配的内存，以当前阶段开始时的RSS加上这部分内存对照memory_limit判定，上限本身不放宽。
+        重试复用首次尝试已释放的内存，RSS不会超过首次尝试时的峰值。
+        """
+        monitor = self.monitor
+        if monitor is None or monitor.limit is None:
+            yield
+            return
+        gc.collect()
+        rss = read_rss()
+        start_rss = rss
+        if self._stack:
+            self._stack[-1][2] = max(self._stack[-1][2], monitor.peak)
+            start_rss = self._stack[-1][1]
+        tracing = tracemalloc.is_tracing()
+        if not tracing:
+            tracemalloc.start()
+        monitor.retry_base = (start_rss, tracemalloc.get_traced_memory()[0])
+        monitor.peak = rss
+        monitor.exceeded = False
+        try:
+            yield
+        finally:
+            monitor.retry_base = None
+            if not tracing:
+                tracemalloc.stop()
+
+    def memory_event(self, error, action):
+        """记录一次内存超限及所采取的处理"""
+        self.memory_events.append(dict(error.info(), action=action))
+
+    def count(self, name, value=1):
+        """计数器name增加value"""
+        self.counters[name] = self.counters.get(name, 0) + value
+        self._emit('count', name, value)
+
+    def report(self, **extra):
+        """返回可写为JSON的统计结果，extra中的键值一并写入"""
+        report = dict(extra)
+        report['total_seconds'] = round(time.perf_counter() - self.start, 6)
+        report['stages'] = {name: dict(r, seconds=round(r['seconds'], 6)) for name, r in self.stages.items()}
+        report['counters'] = dict(self.counters)
+        if self.monitor is not None:
+            self.monitor.sample()
+            report['memory'] = {'peak_rss_mb': round(self.monitor.max_rss / MB, 1),
+                                'limit_mb': round(self.monitor.limit / MB, 1) if self.monitor.limit else None,
+                                'events': list(self.memory_events)}
+        return report
+
+    def write(self, path, **extra):
+        """将report写入JSON文件"""
+        with open(path, 'w') as f:
+            json.dump(self.report(**extra), f, indent=2)
+
+
+@contextmanager
+def profile(profiler=None, hooks=(), memory=False, memory_limit=None):
+    """在with块内开启统计
+
+    参数:
+        profiler: Profiler对象，None则新建
+        hooks, memory, memory_limit: 新建Profiler时的参数，memory为是否统计各阶段的内存峰值，
+                                     memory_limit为进程常驻内存上限(字节)
+
+    用法:
+        with profile() as prof:
+            improved_centrality(G)
+        print(prof.report())
+    """
+    global _active
+    previous = _active
+    _active = profiler if profiler is not None else Profiler(hooks, memory, memory_limit)
+    if _active.monitor is not None:
+        _active.monitor.start()
+    try:
+        yield _active
+    finally:
+        if _active.monitor is not None:
+            _active.monitor.stop()
+        _active = previous
+
+
+def stage(name):
+    """当前Profiler的阶段计时上下文，未开启统计时返回空上下文"""
+    if _active is None:
+        return _NULL_STAGE
+    return _active.stage(name)
+
+
+def count(name, value=1):
+    """当前Profiler的计数器加value，未开启统计时不做任何事"""
+    if _active is not None:
+        _active.count(name, value)
+
+
+def check_memory(size=None):
+    """当前Profiler设置了内存上限且已超出时抛出MemoryLimitExceeded，size为正在处理的团大小"""
+    if _active is not None:
+        _active.check_memory(size)
+
+
+def memory_retry():
+    """当前Profiler的超限重试上下文(见Profiler.memory_retry)，未开启统计时返回空上下文"""
+    if _active is None:
+        return nullcontext()
+    return _active.memory_retry()
+
+
+def memory_event(error, action):
+    """在当前Profiler中记录内存超限事件"""
+    if _active is not None:
+        _active.memory_event(error, action)
+
+
+def enabled():
+    """是否开启了统计，用于跳过只为计数而做的额外计算"""
+    return _active is not None
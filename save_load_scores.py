@@ -1,9 +1,4 @@
 import json
-import os
-
-# 设置工作路径为当前文件所在的目录
-current_file_dir = os.path.dirname(os.path.abspath(__file__))
-os.chdir(current_file_dir)
 
 # 保存得分
 def save_scores(data_dict, file_path):
@@ -0,0 +1,301 @@
+import argparse
+import json
+import os
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+from graph_core import GraphCore, count_cliques
+from centrality_improvement import HigherOrderFeatures, compute_base_scores, score_features
+from bayesian_optimization import optimize_features
+from sweep import load_network
+
+# networkx图对象内存占用的粗略估计(字节)
+GRAPH_BYTES_PER_NODE = 400
+GRAPH_BYTES_PER_EDGE = 600
+# tune请求中允许传给optimize_features的参数；library(写文件)、cv_folds/n_jobs(启动进程)等不对外开放
+TUNE_OPTIONS = {'n_trials', 'metric', 'threshold', 'rank_type', 'optimizer', 'n_restarts', 'seed',
+                'fidelity', 'aggregate', 'fixed_params'}
+
+
+def _array_bytes(obj):
+    """对象中所有numpy数组属性占用的字节数"""
+    return sum(value.nbytes for value in vars(obj).values() if isinstance(value, np.ndarray))
+
+
+def _compute_once(lock, store, pending, key, compute):
+    """返回store[key]，尚未计算时在锁外调用compute()计算并存入store
+
+    同一key的并发请求只由第一个线程计算，其余线程等待pending中同一个Future的结果；
+    lock只在读写store和pending时持有，计算期间不阻塞其他key的请求。
+    """
+    with lock:
+        if key in store:
+            return store[key]
+        future = pending.get(key)
+        owner = future is None
+        if owner:
+            future = pending[key] = Future()
+    if not owner:
+        return future.result()
+    try:
+        value = compute()
+    except BaseException as e:
+        with lock:
+            del pending[key]
+        future.set_exception(e)
+        raise
+    with lock:
+        store[key] = value
+        del pending[key]
+    future.set_result(value)
+    return value
+
+
+class NetworkEntry:
+    """缓存中的一个网络：图对象、团计数和各基础中心性的特征
+
+    多个请求线程可以同时使用同一网络：counts和features只在lock内读写，
+    同一团计数或特征只计算一次。
+    """
+
+    def __init__(self, G):
+        self.G = G
+        self.core = GraphCore.from_networkx(G)
+        self.counts = {}
+        self.features = {}
+        self.lock = threading.Lock()
+        self._pending = {}
+
+    def get_features(self, base, max_clique=None):
+        """返回(并缓存)指定基础中心性和最大团大小的HigherOrderFeatures，团计数在不同base之间共享"""
+        def compute():
+            counts = _compute_once(self.lock, self.counts, self._pending, ('counts', max_clique),
+                                   lambda: count_cliques(self.core, max_clique))
+            base_scores = self.core.from_dict(compute_base_scores(self.G, base))
+            return HigherOrderFeatures(self.core, base_scores, counts, base)
+
+        return _compute_once(self.lock, self.features, self._pending, (base, max_clique), compute)
+
+    def nbytes(self):
+        """估计占用的内存字节数"""
+        with self.lock:
+            counts, features = list(self.counts.values()), list(self.features.values())
+        total = (self.G.number_of_nodes() * GRAPH_BYTES_PER_NODE
+                 + self.G.number_of_edges() * GRAPH_BYTES_PER_EDGE + self.core.nbytes())
+        total += sum(_array_bytes(c) for c in counts)
+        # 同一网络的各特征共享core和团计数，只计入各自独有的数组
+        total += sum(f.base.nbytes + f.count_ratios.nbytes + f.norm_degree.nbytes + f.norm_strength.nbytes
+                     for f in features)
+        return total
+
+
+def _network_path(spec):
+    """网络配置对应文件的绝对路径"""
+    path = spec if isinstance(spec, str) else spec['path']
+    return os.path.realpath(path)
+
+
+class NetworkCache:
+    """按最近使用顺序淘汰的网络缓存(LRU)，同时限制网络个数和估计的内存占用
+
+    加载网络在lock之外进行，冷启动加载大网络时不阻塞已缓存网络的请求。
+
+    属性:
+        allowed: 允许加载的网络文件的绝对路径集合，None表示不限制
+    """
+
+    def __init__(self, max_networks=8, memory_cap=None, allowed=None):
+        self.max_networks = max_networks
+        self.memory_cap = memory_cap
+        self.allowed = None if allowed is None else {_network_path(spec) for spec in allowed}
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self._pending = {}
+
+    def get(self, spec):
+        """返回网络的缓存项，未缓存时加载；spec同sweep.load_network，须在allowed中"""
+        if self.allowed is not None and _network_path(spec) not in self.allowed:
+            raise PermissionError(f"network {spec!r} is not served; start the server with --preload or --allow")
+        key = json.dumps(spec, sort_keys=True)
+        entry = _compute_once(self.lock, self.entries, self._pending, key,
+                              lambda: NetworkEntry(load_network(spec)))
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+        return entry
+
+    def evict(self):
+        """淘汰最久未使用的网络，直到满足个数和内存上限(至少保留最近使用的一个)"""
+        with self.lock:
+            while len(self.entries) > 1 and (
+                    len(self.entries) > self.max_networks
+                    or (self.memory_cap is not None and self.nbytes() > self.memory_cap)):
+                self.entries.popitem(last=False)
+
+    def nbytes(self):
+        return sum(entry.nbytes() for entry in self.entries.values())
+
+    def status(self):
+        return {'networks': list(self.entries), 'memory_bytes': self.nbytes(),
+                'memory_cap': self.memory_cap, 'max_networks': self.max_networks}
+
+
+def _top(features, scores, top_k):
+    """得分字典，或按得分降序的前top_k个 [节点, 得分] 列表"""
+    if top_k is None:
+        return {str(label): float(value) for label, value in zip(features.core.labels, scores)}
+    order = np.argsort(-scores, kind='stable')[:top_k]
+    return [[features.core.labels[i], float(scores[i])] for i in order]
+
+
+def handle_score(cache, request):
+    """score请求: {network, base='dc', params=None, top_k=None, max_clique=None}"""
+    entry = cache.get(request['network'])
+    features = entry.get_features(request.get('base', 'dc'), request.get('max_clique'))
+    cdr, csr = score_features(features, request.get('params'))
+    top_k = request.get('top_k')
+    return {'cdr': _top(features, cdr, top_k), 'csr': _top(features, csr, top_k)}
+
+
+def handle_tune(cache, request):
+    """tune请求: {network, key_nodes, non_key_nodes=None, base='dc', max_clique=None, 以及TUNE_OPTIONS中的参数}
+
+    key_nodes和non_key_nodes须为节点列表(不接受文件路径)。
+    """
+    request = dict(request)
+    unknown = set(request) - TUNE_OPTIONS - {'network', 'key_nodes', 'non_key_nodes', 'base', 'max_clique'}
+    if unknown:
+        raise ValueError(f"unsupported tune options {sorted(unknown)}; allowed: {sorted(TUNE_OPTIONS)}")
+    for name in ('key_nodes', 'non_key_nodes'):
+        if not isinstance(request.get(name, []), list):
+            raise ValueError(f"{name} must be a list of nodes")
+    entry = cache.get(request.pop('network'))
+    features = entry.get_features(request.pop('base', 'dc'), request.pop('max_clique', None))
+    nodetype = type(entry.core.labels[0]) if entry.core.labels else str
+    key_nodes = [nodetype(node) for node in request.pop('key_nodes')]
+    non_key_nodes = request.pop('non_key_nodes', None)
+    if non_key_nodes is not None:
+        non_key_nodes = [nodetype(node) for node in non_key_nodes]
+    best_params, best_value = optimize_features(features, key_nodes, non_key_nodes, verbose=False, **request)
+    return {'best_params': best_params, 'best_value': best_value}
+
+
+HANDLERS = {'/score': handle_score, '/tune': handle_tune}
+
+
+def make_handler(cache):
+    """生成绑定到给定缓存的请求处理类"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, status, body):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == '/status':
+                self._reply(200, cache.status())
+            else:
+                self._reply(404, {'error': f'unknown path {self.path}'})
+
+        def do_POST(self):
+            handler = HANDLERS.get(self.path)
+            if handler is None:
+                self._reply(404, {'error': f'unknown path {self.path}'})
+                return
+            # 只接受JSON请求：浏览器跨域发送的简单请求(text/plain等)不能携带该类型，因而被拒绝
+            if self.headers.get_content_type() != 'application/json':
+                self._reply(415, {'error': 'Content-Type must be application/json'})
+                return
+            start = time.perf_counter()
+            try:
+                request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                if not isinstance(request, dict):
+                    raise ValueError("request body must be a JSON object")
+                body = handler(cache, request)
+            except PermissionError as e:
+                self._reply(403, {'error': str(e)})
+                return
+            except Exception as e:
+                self._reply(400, {'error': f'{type(e).__name__}: {e}'})
+                return
+            finally:
+                cache.evict()
+            body['seconds'] = round(time.perf_counter() - start, 6)
+            self._reply(200, body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(host='127.0.0.1', port=8765, max_networks=8, memory_cap=None, preload=(), allow=()):
+    """启动本地打分服务(阻塞运行)
+
+    参数:
+        host: 监听地址，默认只监听本机
+        port: 端口
+        max_networks: 最多缓存的网络个数
+        memory_cap: 缓存的估计内存上限(字节)，None表示不限
+        preload: 启动时预先加载的网络文件路径列表
+        allow: 允许按需加载的其他网络文件路径列表；请求只能使用preload和allow中的网络
+    """
+    cache = NetworkCache(max_networks, memory_cap, allowed=list(preload) + list(allow))
+    for spec in preload:
+        cache.get(spec).get_features('dc')
+    cache.evict()
+    server = ThreadingHTTPServer((host, port), make_handler(cache))
+    print(f"HSCM scoring server listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+def request(path, payload=None, host='127.0.0.1', port=8765, timeout=None):
+    """向本地打分服务发送请求的客户端函数
+
+    参数:
+        path: '/score'、'/tune' 或 '/status'
+        payload: 请求内容字典，None表示GET请求
+
+    返回:
+        服务返回的字典
+    """
+    data = None if payload is None else json.dumps(payload).encode()
+    req = urllib.request.Request(f'http://{host}:{port}{path}', data=data,
+                                 headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return json.loads(e.read())
+
+
+def parse_arguments():
+    """
+    解析命令行参数
+    """
+    parser = argparse.ArgumentParser(description="本地打分服务")
+    parser.add_argument('--host', type=str, default='127.0.0.1', help="监听地址，默认为127.0.0.1")
+    parser.add_argument('-p', '--port', type=int, default=8765, help="端口，默认为8765")
+    parser.add_argument('--max_networks', type=int, default=8, help="最多缓存的网络个数，默认为8")
+    parser.add_argument('--memory_cap', type=float, default=None, help="缓存的内存上限(MB)，默认不限")
+    parser.add_argument('--preload', type=str, nargs='*', default=[], help="启动时预先加载的网络文件路径")
+    parser.add_argument('--allow', type=str, nargs='*', default=[],
+                        help="允许按需加载(不预先加载)的网络文件路径，请求只能使用--preload和--allow中的网络")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    serve(args.host, args.port, args.max_networks,
+          args.memory_cap * 2 ** 20 if args.memory_cap else None, args.preload, args.allow)
@@ -1,9 +1,3 @@
-import os
-
-# 设置工作路径为当前文件所在的目录
-current_file_dir = os.path.dirname(os.path.abspath(__file__))
-os.chdir(current_file_dir)
-
 # 选择排名前 top_n 个蛋白质
 def select_top_proteins(dicts, top_n=20):
     """
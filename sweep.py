@@ -0,0 +1,177 @@
+import argparse
+import csv
+import json
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import product
+import networkx as nx
+from graph_core import GraphCore, count_cliques
+from centrality_improvement import HigherOrderFeatures, compute_base_scores
+
+RESULT_FIELDS = ['network', 'base', 'rank_type', 'label_set', 'metric', 'best_value',
+                 'best_params', 'seconds']
+
+
+def load_network(spec):
+    """加载网络
+
+    参数:
+        spec: 网络文件路径，或 {'path': 路径, 'nodetype': 'int'|'str'} 字典。
+              支持 edgelist、graphml、带标题行且前两列为边两端的 csv(如 data/ec 中的E.coli PPI网络)，
+              以及保存了图对象或 {'G': 图对象} 的 pkl 文件
+
+    返回:
+        网络图对象
+    """
+    if isinstance(spec, str):
+        spec = {'path': spec}
+    path = spec['path']
+    nodetype = int if spec.get('nodetype') == 'int' else str
+    if path.endswith('.pkl'):
+        with open(path, 'rb') as f:
+            data = pickle.load(f)
+        return data['G'] if isinstance(data, dict) else data
+    if path.endswith('.graphml'):
+        return nx.read_graphml(path)
+    if path.endswith('.csv'):
+        with open(path, 'r', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            next(reader)  # 跳过标题行
+            G = nx.Graph()
+            G.add_edges_from((nodetype(row[0]), nodetype(row[1])) for row in reader if len(row) >= 2)
+        return G
+    return nx.read_edgelist(path, nodetype=nodetype)
+
+
+def load_nodes(value, nodetype=str):
+    """读取节点列表
+
+    参数:
+        value: 节点列表，或以逗号/空白分隔的 txt 文件路径，None 原样返回
+        nodetype: 节点类型转换函数
+
+    返回:
+        节点列表
+    """
+    if value is None or isinstance(value, list):
+        return value
+    with open(value, 'r') as f:
+        content = f.read().replace(',', ' ').split()
+    return [nodetype(item) for item in content]
+
+
+# 子进程内的特征表 {(网络名, 基础中心性): HigherOrderFeatures}，由进程池初始化函数设置
+_worker_features = {}
+
+
+def _init_worker(features_table):
+    """进程池初始化：每个子进程只接收一次全部特征，各研究任务按键查表"""
+    global _worker_features
+    _worker_features = features_table
+
+
+def _run_study(task, labels, options):
+    """在子进程中执行单个调参研究"""
+    from bayesian_optimization import optimize_features
+
+    start = time.perf_counter()
+    features = _worker_features[(task['network'], task['base'])]
+    key_nodes, non_key_nodes = labels
+    best_params, best_value = optimize_features(features, key_nodes, non_key_nodes,
+                                                metric=task['metric'], rank_type=task['rank_type'],
+                                                verbose=False, **options)
+    return dict(task, best_value=best_value, best_params=json.dumps(best_params),
+                seconds=round(time.perf_counter() - start, 3))
+
+
+def run_sweep(config):
+    """按配置批量调参：网络 x 基础中心性 x 排名类型 x 标签集 x 评估指标
+
+    团计数只与网络(和max_clique)有关，基础中心性只与网络和base有关，
+    二者在所有研究之间共享，只计算一次；特征表经进程池初始化函数
+    每个子进程只传递一次，任务本身只携带研究参数和标签。各研究由进程池
+    并行执行，结果在完成时逐行写入同一张结果表。
+
+    参数:
+        config: 配置字典，包含
+            networks: {网络名: 网络文件路径或 {'path', 'nodetype'}}
+            bases: 基础中心性列表，如 ['dc', 'cc']
+            rank_types: 排名类型列表，如 ['cdr', 'csr']
+            label_sets: {标签集名: {'key_nodes': 列表或路径, 'non_key_nodes': 列表、路径或None,
+                         'networks': 适用的网络名列表(可选，缺省为全部网络)}}
+            metrics: 评估指标列表，默认 ['ap']
+            max_clique: 最大团大小，默认None
+            output: 结果表(csv)路径，默认 'sweep_results.csv'
+            workers: 进程数，默认为CPU核数
+            其余键(n_trials、optimizer、seed等)原样传给optimize_features
+
+    返回:
+        结果字典列表，每个元素对应结果表中的一行
+    """
+    config = dict(config)
+    networks = config.pop('networks')
+    bases = config.pop('bases', ['dc'])
+    rank_types = config.pop('rank_types', ['csr'])
+    label_sets = config.pop('label_sets')
+    metrics = config.pop('metrics', ['ap'])
+    max_clique = config.pop('max_clique', None)
+    output = config.pop('output', 'sweep_results.csv')
+    workers = config.pop('workers', None)
+    options = config
+
+    features_table = {}
+    tasks = []
+    for name, spec in networks.items():
+        G = load_network(spec)
+        # 标签文件中的节点按网络中节点标签的类型解析
+        nodetype = type(next(iter(G.nodes()))) if G.number_of_nodes() else str
+        # 团计数在同一网络的所有研究之间共享
+        core = GraphCore.from_networkx(G)
+        counts = count_cliques(core, max_clique)
+        for base in bases:
+            features_table[(name, base)] = HigherOrderFeatures(
+                core, core.from_dict(compute_base_scores(G, base)), counts, base)
+            for (label_name, label_spec), rank_type, metric in product(label_sets.items(),
+                                                                       rank_types, metrics):
+                if name not in label_spec.get('networks', [name]):
+                    continue
+                labels = (load_nodes(label_spec['key_nodes'], nodetype),
+                          load_nodes(label_spec.get('non_key_nodes'), nodetype))
+                task = {'network': name, 'base': base, 'rank_type': rank_type,
+                        'label_set': label_name, 'metric': metric}
+                tasks.append((task, labels))
+
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(features_table,)) as pool, \
+            open(output, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
+        writer.writeheader()
+        futures = [pool.submit(_run_study, task, labels, options) for task, labels in tasks]
+        for future in as_completed(futures):
+            row = future.result()
+            writer.writerow(row)
+            f.flush()
+            rows.append(row)
+    return rows
+
+
+def parse_arguments():
+    """
+    解析命令行参数
+    """
+    parser = argparse.ArgumentParser(description="批量调参工具")
+    parser.add_argument('config', type=str, help="JSON 格式的配置文件路径")
+    parser.add_argument('-w', '--workers', type=int, help="进程数，默认使用配置文件中的值或CPU核数", default=None)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    with open(args.config, 'r') as f:
+        sweep_config = json.load(f)
+    if args.workers is not None:
+        sweep_config['workers'] = args.workers
+    results = run_sweep(sweep_config)
+    print(f"已完成 {len(results)} 个调参研究，结果保存至 {sweep_config.get('output', 'sweep_results.csv')}")
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# 仓库模块位于根目录(无包结构)，测试时将根目录加入导入路径
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
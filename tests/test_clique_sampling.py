@@ -0,0 +1,36 @@
+import time
+
+import networkx as nx
+
+from graph_core import GraphCore
+from clique_sampling import budgeted_clique_counts, estimate_clique_cost
+
+
+def dense_core(n):
+    """K_n加上每个节点一个悬挂点：全部团都以同一个根节点为首，精确枚举的耗时随n指数增长"""
+    G = nx.complete_graph(n)
+    G.add_edges_from((i, f"p{i}") for i in range(n))
+    return GraphCore.from_networkx(G)
+
+
+def test_estimate_stays_within_its_time_budget_on_dense_graph():
+    core = dense_core(20)
+    start = time.perf_counter()
+    estimate = estimate_clique_cost(core, seed=0, time_budget=0.2)
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 1.0
+    assert estimate['truncated']
+    # 精确枚举K20需要数分钟，外推的耗时不应把它判定为可以在预算内完成
+    assert estimate['seconds'] > 10
+
+
+def test_budgeted_counts_stay_within_small_multiple_of_budget_on_dense_graph():
+    core = dense_core(20)
+    time_budget = 1.0
+    start = time.perf_counter()
+    counts, report = budgeted_clique_counts(core, time_budget=time_budget, seed=0)
+    elapsed = time.perf_counter() - start
+
+    assert report['mode'] == 'sampled'
+    assert elapsed < 3 * time_budget
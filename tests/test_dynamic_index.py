@@ -0,0 +1,24 @@
+import networkx as nx
+import numpy as np
+import pytest
+
+from centrality_improvement import compute_features, score_features
+from dynamic_index import DynamicCliqueIndex
+from perturbation import perturb
+
+
+@pytest.mark.parametrize('base_scores', ['dc', 'cc', {0: 0.5, 3: 2.0}])
+@pytest.mark.parametrize('params', [None, {'theta': 0.7, 'lambda_3': 0.4, 'lambda_4': 1.5}])
+def test_score_arrays_match_recomputed_features_after_edits(base_scores, params):
+    G = nx.powerlaw_cluster_graph(120, 4, 0.6, seed=3)
+    G.add_edge(5, 5)
+    index = DynamicCliqueIndex(G, base_scores)
+    perturb(index, 'rewire', 0.1, np.random.default_rng(0))
+    perturb(index, 'remove', 0.1, np.random.default_rng(1))
+    index.add_edge(7, 'new')
+    index.add_edge(9, 9)
+
+    features = compute_features(index.G, base_scores)
+    for expected, actual in zip(score_features(features, params), index.score_arrays(params)):
+        expected = features.core.to_dict(expected)
+        np.testing.assert_allclose(actual, [expected[label] for label in index.labels], rtol=1e-12)
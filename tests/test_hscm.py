@@ -0,0 +1,34 @@
+import networkx as nx
+import numpy as np
+
+from hscm import HSCM, count_summary
+
+
+def test_save_load_keeps_count_report_for_approximate_counts(tmp_path):
+    G = nx.powerlaw_cluster_graph(200, 5, 0.5, seed=1)
+    model = HSCM.from_graph(G, sample_rate=0.3, seed=7)
+    assert model.features.count_report['mode'] == 'approximate'
+
+    path = tmp_path / 'model.npz'
+    model.save(path)
+    loaded = HSCM.load(path)
+
+    assert loaded.features.count_report == model.features.count_report
+    assert count_summary(loaded.features) == count_summary(model.features)
+    np.testing.assert_allclose(loaded.features.node_ci[0], model.features.node_ci[0])
+    np.testing.assert_allclose(loaded.features.node_ci[1], model.features.node_ci[1])
+
+
+def test_save_load_keeps_count_report_for_budgeted_counts(tmp_path):
+    G = nx.powerlaw_cluster_graph(200, 5, 0.5, seed=1)
+    model = HSCM.from_graph(G, time_budget=60, seed=7)
+    report = model.features.count_report
+
+    path = tmp_path / 'model.npz'
+    model.save(path)
+    loaded = HSCM.load(path).features.count_report
+
+    assert loaded['mode'] == report['mode']
+    assert loaded['estimate']['seconds'] == report['estimate']['seconds']
+    np.testing.assert_allclose(loaded['estimate']['clique_numbers'], report['estimate']['clique_numbers'])
+    assert count_summary(HSCM.load(path).features) == count_summary(model.features)
@@ -0,0 +1,37 @@
+import time
+
+import pytest
+
+import profiling
+from profiling import MB, read_rss
+
+
+def allocate(mb, keep):
+    """以64KB的小块分配内存(释放后通常不归还操作系统)，期间检查内存上限"""
+    for _ in range(int(mb * 16)):
+        keep.append(bytearray(64 * 1024))
+        time.sleep(0.0002)
+        profiling.check_memory()
+
+
+def test_memory_retry_keeps_the_hard_limit():
+    limit = read_rss() + 80 * MB
+    with profiling.profile(memory_limit=limit) as profiler, profiling.stage('counting'):
+        keep = []
+        with pytest.raises(profiling.MemoryLimitExceeded):
+            allocate(200, keep)
+        del keep
+
+        # 首次尝试释放的内存留在进程内，重试仍可在上限内完成
+        keep = []
+        with profiling.memory_retry():
+            allocate(40, keep)
+        del keep
+
+        # 重试新分配的内存不能超过首次尝试可用的额度
+        keep = []
+        with pytest.raises(profiling.MemoryLimitExceeded), profiling.memory_retry():
+            allocate(200, keep)
+        assert len(keep) * 64 * 1024 < 120 * MB
+        del keep
+    assert profiler.monitor.max_rss < limit + 40 * MB
@@ -0,0 +1,74 @@
+import networkx as nx
+from dynamic_index import DynamicCliqueIndex
+
+
+def threshold_edge_sets(G, thresholds, weight='weight'):
+    """按边得分阈值生成一组嵌套的边集合
+
+    参数:
+        G: 带边得分的网络图对象(如组织特异性网络的graphml文件)
+        thresholds: 阈值列表，得分不低于阈值的边被保留
+        weight: 边得分的属性名
+
+    返回:
+        阈值(从严格到宽松排序)列表，以及对应的边列表的列表；每个边列表按得分降序排列，
+        且包含前一个边列表的全部边
+    """
+    thresholds = sorted(thresholds, reverse=True)
+    edges = sorted(G.edges(data=weight, default=1.0), key=lambda e: e[2], reverse=True)
+    return thresholds, [[(u, v) for u, v, score in edges if score >= t] for t in thresholds]
+
+
+def nested_family_scores(edge_sets, base_scores='dc', max_clique=None, params=None, nodes=None):
+    """在一次扫描中计算一组嵌套网络的团计数与CDR/CSR
+
+    edge_sets中的每个边集合都包含前一个，按顺序只把新增的边加入动态团索引，
+    团计数在新增边的公共邻居中增量更新，而不是对每个网络独立调用improved_centrality。
+
+    参数:
+        edge_sets: 嵌套的边列表的列表，从最严格到最宽松
+        base_scores: 基础中心性类型或得分字典，同improved_centrality
+        max_clique: 最大团大小，None则自动计算网络中的最大团
+        params: 包含theta和lambda参数的字典，None则所有参数取1
+        nodes: 所有层级都包含的节点列表(可包含孤立节点)，None则只包含边中出现的节点
+
+    返回:
+        列表，每个元素对应一个层级，为包含 n_edges、sizes、clique_numbers、cdr、csr 的字典
+    """
+    G = nx.Graph()
+    if nodes is not None:
+        G.add_nodes_from(nodes)
+    index = DynamicCliqueIndex(G, base_scores, max_clique)
+    results = []
+    previous = set()
+    for level, edges in enumerate(edge_sets):
+        current = {frozenset(edge) for edge in edges}
+        if not previous <= current:
+            raise ValueError(f"Edge set {level} does not contain all edges of edge set {level - 1}")
+        for u, v in edges:
+            if frozenset((u, v)) not in previous:
+                index.add_edge(u, v)
+        previous = current
+        features = index.features()
+        cdr, csr = index.scores(params)
+        results.append({'n_edges': features.core.number_of_edges() + int(features.core.self_loops.sum()),
+                        'sizes': features.sizes, 'clique_numbers': features.clique_numbers.tolist(),
+                        'cdr': cdr, 'csr': csr})
+    return results
+
+
+def threshold_family(G, thresholds, base_scores='dc', max_clique=None, params=None, weight='weight'):
+    """计算按不同边得分阈值构建的一族网络的CDR/CSR
+
+    参数:
+        G: 带边得分的网络图对象
+        thresholds: 阈值列表
+        base_scores, max_clique, params: 同improved_centrality
+        weight: 边得分的属性名
+
+    返回:
+        {阈值: 该阈值下的结果字典}，结果字典同nested_family_scores
+    """
+    thresholds, edge_sets = threshold_edge_sets(G, thresholds, weight)
+    results = nested_family_scores(edge_sets, base_scores, max_clique, params)
+    return dict(zip(thresholds, results))
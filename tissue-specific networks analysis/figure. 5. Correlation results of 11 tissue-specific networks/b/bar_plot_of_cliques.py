@@ -1,7 +1,12 @@
 import networkx as nx
-from itertools import combinations
 import matplotlib.pyplot as plt
 import numpy as np
+import sys
+from pathlib import Path
+python_code_path = str(Path(__file__).parent.parent.parent.parent)
+if python_code_path not in sys.path:
+    sys.path.append(python_code_path)
+from clique_index import GlobalCliqueIndex
 import os
 
 # 设置工作路径为当前文件所在的目录
@@ -24,24 +29,12 @@ def plot_clique_sizes_by_tissue(tissue_networks, output_path="clique_sizes_compa
     # 定义要统计的团大小
     clique_sizes = [2, 3, 4, 5]
     
-    # 数据统计
+    # 数据统计：所有组织共用一次团枚举，各组织的团数由位图筛选得到
+    index = GlobalCliqueIndex(tissue_networks, max_clique=max(clique_sizes))
     tissue_data = {}
-    for tissue, G in tissue_networks.items():
-        clique_counts = {size: 0 for size in clique_sizes}
-        max_clique = max(len(c) for c in nx.find_cliques(G)) if G.nodes() else 0
-        
-        clique_counts[2] = G.number_of_edges()
-        for size in range(3, max_clique + 1):
-            if size not in clique_sizes:
-                continue
-            cliques = set()
-            for clique in nx.find_cliques(G):
-                if len(clique) >= size:
-                    for sub_clique in combinations(clique, size):
-                        if all(G.has_edge(u, v) for u, v in combinations(sub_clique, 2)):
-                            cliques.add(tuple(sorted(sub_clique)))
-            clique_counts[size] = len(cliques)
-        tissue_data[tissue] = clique_counts
+    for tissue in tissue_networks:
+        numbers = index.clique_numbers(tissue)
+        tissue_data[tissue] = {size: numbers.get(size, 0) for size in clique_sizes}
     
     # 准备绘图数据
     tissues = list(tissue_data.keys())